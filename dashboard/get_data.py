@@ -2,9 +2,16 @@ import pprint
 pp = pprint.PrettyPrinter(indent=4)
 import pdb
 
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+import contextlib
+import gzip
+import os
+import queue
+import threading
+import time
+import zlib
 
-from flask import Flask, request
+from flask import Flask, Response, abort, jsonify, request, stream_with_context
 from flask_cors import CORS
 
 import pandas as pd
@@ -18,6 +25,20 @@ ROOT_NAME = 'ALL'
 ANCHOR = 'Year'
 METRICS = ['SumOfSpend','UniqBrandCount','UniqRegionCount','UniqCountryCount','UniqAdvertiserCount']
 
+# Number of rows fetched from the database (and sent to the client) at a time
+BATCH_SIZE = 5000
+# Maximum number of idle database connections kept for reuse across requests
+POOL_SIZE = 4
+GZIP_LEVEL = 6
+
+# The dashboard data only changes after the monthly load, so query results
+# are cached (gzipped JSON) for this long unless /invalidate_cache is called
+CACHE_TTL_SECS = 24 * 60 * 60
+CACHE_MAX_BYTES = 256 * 1024**2
+# Set this environment variable to a folder to also cache results on disk
+# (so that they survive restarts and are shared by the app's processes)
+CACHE_DIR = os.environ.get('DASHBOARD_CACHE_DIR')
+
 def build_data_block(row, level, hierarchy, metrics=METRICS, label=None):
     name = ROOT_NAME if level==ROOT_LEVEL else row[level]
     d = {
@@ -71,8 +92,255 @@ def build_data_block(row, level, hierarchy, metrics=METRICS, label=None):
 #         if i > 14:
 #             break
 
+class ConnectionPool:
+    """
+    Keeps up to max_size idle database connections so that requests
+    don't have to open a new one each time. A connection that raised
+    an error (or whose request was cut off) is closed, not reused.
+    """
+    def __init__(self, connect, max_size=POOL_SIZE):
+        self.connect = connect
+        self._idle = queue.LifoQueue(maxsize=max_size)
+
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self.connect()
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+pool = ConnectionPool(lambda: pyodbc.connect(account_info.DM_1219))
+
+def iter_query_batches(sql, batch_size=BATCH_SIZE):
+    """
+    Yields the column names and batches of rows of the query's result
+    using a (server-side) cursor so that the whole result never has
+    to be in memory at once.
+    """
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql)
+            columns = [c[0] for c in cursor.description]
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                yield columns, rows
+                rows = cursor.fetchmany(batch_size)
+        finally:
+            cursor.close()
+
+def batch_to_json(columns, rows, ndjson=False):
+    # Serializing each batch with pandas gives us exactly what
+    # df.to_json(orient='records') used to give for the whole result
+    # (NaN as null, dates as epoch milliseconds, etc.)
+    df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    if ndjson:
+        return df.to_json(orient='records', lines=True) + '\n'
+    return df.to_json(orient='records')[1:-1]  # Without the brackets of the array
+
+def iter_json(sql, ndjson=False):
+    """
+    Yields the query's result as a JSON array of records (same as
+    df.to_json(orient='records')), or as newline-delimited JSON records
+    if ndjson is True, one batch of rows at a time.
+    """
+    is_first_batch = True
+    if not ndjson:
+        yield '['
+    for columns, rows in iter_query_batches(sql):
+        text = batch_to_json(columns, rows, ndjson=ndjson)
+        yield text if (ndjson or is_first_batch) else ',' + text
+        is_first_batch = False
+    if not ndjson:
+        yield ']'
+
+def gzip_stream(chunks, level=GZIP_LEVEL):
+    # Each chunk is flushed so that the client can start decompressing
+    # (and parsing) the first batch while the next one is being fetched
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+class ResultCache:
+    """
+    Caches the gzipped JSON of query results in memory (least recently
+    used ones are evicted beyond max_bytes) and, optionally, as files in
+    cache_dir. Entries expire ttl_secs after they were created.
+    Cache hits are served without touching the database or pandas.
+
+    Each qtype has a generation that invalidate bumps, so that a result
+    whose query started before the invalidation is not cached afterwards.
+    """
+    def __init__(self, ttl_secs=CACHE_TTL_SECS, max_bytes=CACHE_MAX_BYTES, cache_dir=CACHE_DIR):
+        self.ttl_secs = ttl_secs
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._entries = OrderedDict()  # key => (created time, gzipped bytes)
+        self._size = 0
+        # Bumped by invalidate(None) and invalidate(qtype), respectively
+        self._generation = 0
+        self._qtype_generations = defaultdict(int)
+        self._lock = threading.Lock()
+        self.stats = defaultdict(float)
+
+    def _file_path(self, key):
+        return os.path.join(self.cache_dir, '{}.{}.gz'.format(*key))
+
+    def _is_expired(self, created):
+        return time.time() - created > self.ttl_secs
+
+    def _pop(self, key):
+        created, data = self._entries.pop(key)
+        self._size -= len(data)
+
+    def _put_in_memory(self, key, created, data):
+        if len(data) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._pop(key)
+        self._entries[key] = (created, data)
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+
+    def get(self, key):
+        """Returns the gzipped bytes cached for the key or None."""
+        with self._lock:
+            if key in self._entries:
+                created, data = self._entries[key]
+                if not self._is_expired(created):
+                    self._entries.move_to_end(key)
+                    return data
+                self._pop(key)
+
+            if self.cache_dir:
+                file_path = self._file_path(key)
+                try:
+                    created = os.path.getmtime(file_path)
+                    if not self._is_expired(created):
+                        with open(file_path, 'rb') as f:
+                            data = f.read()
+                        self._put_in_memory(key, created, data)
+                        self.stats['disk_hits'] += 1
+                        return data
+                except OSError:  # Not cached on disk (or deleted meanwhile)
+                    pass
+        return None
+
+    def get_generation(self, qtype):
+        """Returns the generation to pass to put for a query of the qtype started now."""
+        with self._lock:
+            return self._generation, self._qtype_generations[qtype]
+
+    def put(self, key, data, generation):
+        """
+        Caches the gzipped bytes for the key unless the key's qtype was
+        invalidated since its generation was taken (the data is stale).
+        """
+        created = time.time()
+        temp_file_path = None
+        if self.cache_dir:
+            # Write to a temporary file first so that other processes
+            # never read a partially written file
+            file_path = self._file_path(key)
+            temp_file_path = '{}.{}.tmp'.format(file_path, threading.get_ident())
+            try:
+                with open(temp_file_path, 'wb') as f:
+                    f.write(data)
+            except OSError as e:  # The result is still cached in memory
+                print('Could not cache {} on disk: {}'.format(key, e))
+                temp_file_path = None
+
+        with self._lock:
+            if generation != (self._generation, self._qtype_generations[key[0]]):
+                self.stats['stale_puts'] += 1
+                if temp_file_path:
+                    try:
+                        os.remove(temp_file_path)
+                    except OSError:  # Already removed by invalidate
+                        pass
+                return
+            self._put_in_memory(key, created, data)
+            if temp_file_path:
+                try:
+                    os.replace(temp_file_path, file_path)
+                except OSError as e:
+                    print('Could not cache {} on disk: {}'.format(key, e))
+
+    def invalidate(self, qtype=None):
+        """Removes the cached results of the qtype (or of all qtypes if None)."""
+        with self._lock:
+            if qtype is None:
+                self._generation += 1
+            else:
+                self._qtype_generations[qtype] += 1
+            for key in [k for k in self._entries if qtype is None or k[0] == qtype]:
+                self._pop(key)
+            if self.cache_dir:
+                for file_name in os.listdir(self.cache_dir):
+                    if qtype is None or file_name.split('.')[0] == qtype:
+                        try:
+                            os.remove(os.path.join(self.cache_dir, file_name))
+                        except OSError:
+                            pass
+
+    def record(self, is_hit, secs):
+        with self._lock:
+            prefix = 'hit' if is_hit else 'miss'
+            self.stats['hits' if is_hit else 'misses'] += 1
+            self.stats[prefix + '_secs'] += secs
+            self.stats['max_' + prefix + '_secs'] = max(self.stats['max_' + prefix + '_secs'], secs)
+
+    def get_stats(self):
+        with self._lock:
+            hits, misses = self.stats['hits'], self.stats['misses']
+            return {
+                'hits': int(hits),
+                'disk_hits': int(self.stats['disk_hits']),
+                'misses': int(misses),
+                'hit_ratio': hits / (hits + misses) if hits + misses else None,
+                'avg_hit_ms': 1000 * self.stats['hit_secs'] / hits if hits else None,
+                'max_hit_ms': 1000 * self.stats['max_hit_secs'],
+                'avg_miss_ms': 1000 * self.stats['miss_secs'] / misses if misses else None,
+                'max_miss_ms': 1000 * self.stats['max_miss_secs'],
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'ttl_secs': self.ttl_secs,
+            }
+
+cache = ResultCache()
+
+def iter_and_cache(key, chunks, is_gzip, start_time, generation):
+    """
+    Yields the chunks of a response and caches the gzipped result once
+    all of them were sent (nothing is cached if the client went away,
+    the query failed in the middle or the cache was invalidated meanwhile).
+    """
+    sent_chunks = []
+    for chunk in chunks:
+        sent_chunks.append(chunk)
+        yield chunk
+    data = b''.join(sent_chunks)
+    cache.put(key, data if is_gzip else gzip.compress(data, GZIP_LEVEL), generation)
+    cache.record(False, time.perf_counter() - start_time)
+
 def run_sql(sql):
-    conn = pyodbc.connect(account_info.DM_1219)
     # build_data_tree_by_year(pd.read_sql(sql, conn), ['Year', 'Region', 'Country', 'Advertiser', 'Brand'])
     # 'Year': ['Region', 'Country', 'Advertiser', 'Brand']
     # 'Year': ['Country', 'Advertiser', 'Brand']
@@ -83,7 +351,8 @@ def run_sql(sql):
     # cursor = conn.cursor()
     # cursor.execute(sql)
     # return cursor.fetchall()
-    return pd.read_sql(sql, conn)
+    with pool.connection() as conn:
+        return pd.read_sql(sql, conn)
 
 QUERIES = {
     'full_data': queries.hierarchy_table,
@@ -98,11 +367,54 @@ def get_data():
     # REF: https://stackoverflow.com/q/11774265/1330974
     # user = request.args.get('user') # how to get url query ?user=something
     # to get the whole query string, do: request.query_string
+    # Add &format=ndjson to get newline-delimited JSON records instead of a JSON array
     qtype = request.args.get('qtype')
-    df = run_sql(QUERIES[qtype])
-    data = df.to_json(orient='records') # or use jsonify REF: https://stackoverflow.com/q/13081532/1330974
-    # pdb.set_trace()
-    return data
+    if qtype not in QUERIES:
+        abort(400, 'Unknown qtype: {}'.format(qtype))
+    ndjson = request.args.get('format') == 'ndjson'
+
+    start_time = time.perf_counter()
+    key = (qtype, 'ndjson' if ndjson else 'json')
+    is_gzip = 'gzip' in request.accept_encodings
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    headers = {'Vary': 'Accept-Encoding'}
+    if is_gzip:
+        headers['Content-Encoding'] = 'gzip'
+
+    data = cache.get(key)
+    if data is not None:
+        response = Response(data if is_gzip else gzip.decompress(data), mimetype=mimetype, headers=headers)
+        cache.record(True, time.perf_counter() - start_time)
+        return response
+
+    # Taken before the query runs so that the result is not cached
+    # if the cache is invalidated (e.g., after a load) while it streams
+    generation = cache.get_generation(qtype)
+    # Rows are sent in batches as they are fetched instead of after the whole
+    # result is loaded into a dataframe and serialized with df.to_json
+    # REF: https://flask.palletsprojects.com/en/1.1.x/patterns/streaming/
+    chunks = iter_json(QUERIES[qtype], ndjson=ndjson)
+    if is_gzip:
+        chunks = gzip_stream(chunks)
+    else:
+        chunks = (chunk.encode('utf-8') for chunk in chunks)
+    chunks = iter_and_cache(key, chunks, is_gzip, start_time, generation)
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+@app.route('/invalidate_cache', methods=['POST'])
+def invalidate_cache():
+    # Call this after the monthly load, e.g.:
+    # >> curl -X POST http://localhost:5000/invalidate_cache?qtype=full_data
+    # Without qtype, the cached results of all queries are removed
+    qtype = request.args.get('qtype')
+    if qtype is not None and qtype not in QUERIES:
+        abort(400, 'Unknown qtype: {}'.format(qtype))
+    cache.invalidate(qtype)
+    return jsonify(invalidated=qtype or 'all')
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(cache.get_stats())
 
 if __name__ == '__main__':
     app.debug = True
@@ -0,0 +1,147 @@
+"""
+Compares the /get_data endpoint (pooled connection, rows streamed in
+batches) against how it used to work (new connection per request and
+the whole result loaded with pd.read_sql and serialized with to_json)
+on a local SQLite database that stands in for the Datamart tables.
+
+For each approach it reports the time to the first byte, the total time
+and the peak memory allocated (by Python) while serving one request.
+The memory is measured in a separate request because tracemalloc slows
+everything down. The streamed requests are measured both as cache misses
+(the result cache is invalidated before each request) and as cache hits
+(the result is cached before each request).
+
+Run it from the dashboard folder like below:
+>> python get_data_benchmark.py --rows 500000
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import pandas as pd
+
+# The benchmark doesn't need the Datamart credentials
+try:
+    import account_info
+except ImportError:
+    sys.modules['account_info'] = types.ModuleType('account_info')
+
+import get_data
+
+SQLITE_QUERY = """
+SELECT [Year], [Region], [Country], [Advertiser], [Brand],
+       [SumOfSpend], [UniqBrandCount], [UniqRegionCount], [UniqCountryCount], [UniqAdvertiserCount]
+FROM hierarchy
+ORDER BY 1,2,3,4,5
+"""
+
+
+def create_database(db_file, row_count, seed=0):
+    rng = random.Random(seed)
+    regions = ['LATAM', 'EU', 'APAC', 'AED', 'NA']
+    with sqlite3.connect(db_file) as conn:
+        conn.execute('CREATE TABLE hierarchy (Year INT, Region TEXT, Country TEXT, Advertiser TEXT, Brand TEXT, '
+                     'SumOfSpend REAL, UniqBrandCount INT, UniqRegionCount INT, UniqCountryCount INT, '
+                     'UniqAdvertiserCount INT)')
+        # None in a hierarchy column means the row is a subtotal of the levels above it
+        rows = ((rng.randint(2013, 2019), rng.choice(regions), 'Country {}'.format(rng.randint(1, 60)),
+                 'Advertiser {}'.format(rng.randint(1, 500)),
+                 None if rng.random() < 0.1 else 'Brand {}'.format(rng.randint(1, 5000)),
+                 round(rng.random() * 1e6, 2), rng.randint(1, 100), 1, 1, 1)
+                for _ in range(row_count))
+        conn.executemany('INSERT INTO hierarchy VALUES (?,?,?,?,?,?,?,?,?,?)', rows)
+
+
+def old_get_data(db_file):
+    # What the endpoint used to do
+    conn = sqlite3.connect(db_file)
+    data = pd.read_sql(SQLITE_QUERY, conn).to_json(orient='records')
+    conn.close()
+    yield data.encode('utf-8')
+
+
+def new_get_data(client, accept_encoding):
+    response = client.get('/get_data?qtype=full_data', headers={'Accept-Encoding': accept_encoding})
+    for chunk in response.response:
+        yield chunk
+
+
+def consume(chunks):
+    for _ in chunks:
+        pass
+
+
+def measure(label, get_chunks, prepare=None):
+    # prepare is called before each of the two requests measured
+    if prepare:
+        prepare()
+    start = time.perf_counter()
+    first_byte_secs = None
+    body = []
+    for chunk in get_chunks():
+        if first_byte_secs is None:
+            first_byte_secs = time.perf_counter() - start
+        body.append(chunk)
+    total_secs = time.perf_counter() - start
+    body = b''.join(body)
+
+    if prepare:
+        prepare()
+    tracemalloc.start()
+    consume(get_chunks())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:<28} {:>10.3f} {:>10.3f} {:>12.1f} {:>12.1f}'.format(
+        label, first_byte_secs, total_secs, peak / 1024**2, len(body) / 1024**2))
+    return body
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'dashboard.db')
+        create_database(db_file, args.rows)
+
+        get_data.QUERIES['full_data'] = SQLITE_QUERY
+        get_data.pool = get_data.ConnectionPool(lambda: sqlite3.connect(db_file, check_same_thread=False))
+        client = get_data.app.test_client()
+        # In memory only, so that DASHBOARD_CACHE_DIR does not turn misses into disk hits
+        get_data.cache = get_data.ResultCache(cache_dir=None)
+
+        def clear_cache():
+            get_data.cache.invalidate()
+
+        def fill_cache():
+            # Either encoding caches the (gzipped) result for both
+            clear_cache()
+            consume(new_get_data(client, 'identity'))
+
+        print('{:<28} {:>10} {:>10} {:>12} {:>12}'.format(
+            'APPROACH', 'TTFB SECS', 'TOTAL SECS', 'PEAK MEM MB', 'BODY MB'))
+        old_body = measure('read_sql + to_json', lambda: old_get_data(db_file))
+        new_body = measure('streamed (miss)', lambda: new_get_data(client, 'identity'), clear_cache)
+        new_gzip_body = measure('streamed + gzip (miss)', lambda: new_get_data(client, 'gzip'), clear_cache)
+        cached_body = measure('cached (hit)', lambda: new_get_data(client, 'identity'), fill_cache)
+        cached_gzip_body = measure('cached + gzip (hit)', lambda: new_get_data(client, 'gzip'), fill_cache)
+        get_data.pool.close_all()
+        stats = get_data.cache.get_stats()
+        print('Cache hits: {}, misses: {}'.format(stats['hits'], stats['misses']))
+        # 2 requests per row measured, and each hit needs a miss to fill the cache
+        assert (stats['hits'], stats['misses']) == (4, 8), 'Requests were not measured as intended'
+
+    expected = json.loads(old_body)
+    assert json.loads(new_body) == expected, 'Streamed JSON is different'
+    assert json.loads(gzip.decompress(new_gzip_body)) == expected, 'Streamed (gzip) JSON is different'
+    assert json.loads(cached_body) == expected, 'Cached JSON is different'
+    assert json.loads(gzip.decompress(cached_gzip_body)) == expected, 'Cached (gzip) JSON is different'
@@ -0,0 +1,92 @@
+"""
+Builds the nested tree that ECharts treemaps/sunbursts expect, i.e.:
+{'name': 'ALL', 'level': 'ROOT', 'value': [...], 'children': [
+    {'name': 2013, 'level': 'Year', 'value': [...], 'children': [...]}, ...]}
+from the flat rollup rows of the dashboard queries in one pass.
+
+In the rollup rows, None in a hierarchy column means that the row is a
+subtotal of the levels before it. For example, with the hierarchy
+['Year', 'Region', 'Country', 'Advertiser', 'Brand']:
+{'Year': None, 'Region': None, ...} is the grand total (the 'ALL' root),
+{'Year': 2013, 'Region': 'LTM', 'Country': None, ...} is the total of the
+LTM region in 2013, and so on.
+
+Nodes are looked up in a dict keyed by their path (e.g. (2013, 'LTM'))
+instead of searching the children lists, so building the tree takes
+linear time in the number of rows (in any order). Which level each row
+belongs to is worked out for all rows at once with numpy.
+
+Usage example:
+>> tree = build_tree(get_data.run_sql(queries.hierarchy_table), ['Year', 'Region', 'Country'])
+"""
+import numpy as np
+import pandas as pd
+
+ROOT_LEVEL = 'ROOT'
+ROOT_NAME = 'ALL'
+HIERARCHY = ['Year', 'Region', 'Country', 'Advertiser', 'Brand']
+METRICS = ['SumOfSpend', 'UniqBrandCount', 'UniqRegionCount', 'UniqCountryCount', 'UniqAdvertiserCount']
+
+
+def _to_names(column):
+    """Returns the values of the column as a list of node names."""
+    if column.dtype.kind == 'f':
+        # Years become 2013.0 in a float column if the column has NaN
+        return [int(v) if v == v and v.is_integer() else v for v in column.tolist()]
+    return column.tolist()
+
+
+def build_tree(rows, hierarchy=HIERARCHY, metrics=METRICS, all_levels=HIERARCHY):
+    """
+    Returns the root node of the tree built from the rows (a dataframe
+    or dicts) for the hierarchy, which is all_levels (the hierarchy
+    columns of the rows) or some of them, e.g. ['Year', 'Country'].
+    Rows that are not a node of the hierarchy (e.g. ones with a Region
+    when the hierarchy doesn't have it) are skipped.
+    Nodes without a row for them (e.g. if the query filtered out
+    subtotals) are still created, with None values.
+    Leaves (nodes of the last level) don't have 'children'.
+    """
+    if not set(hierarchy) <= set(all_levels):
+        raise ValueError('Hierarchy {} has levels not in {}'.format(hierarchy, all_levels))
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows), columns=all_levels + metrics)
+
+    # A row is the node of depth d if the levels of the path to it (the
+    # first d levels of the hierarchy) are the only non-None levels in it.
+    # Each row gets a bit mask of its non-None levels, e.g. 0b00011 for
+    # (2013, 'LTM', None, None, None), which we map to its depth (or -1).
+    level_bits = {level: 1 << i for i, level in enumerate(all_levels)}
+    depth_by_mask = np.full(1 << len(all_levels), -1)
+    for depth in range(len(hierarchy) + 1):
+        depth_by_mask[sum(level_bits[level] for level in hierarchy[:depth])] = depth
+    masks = df[all_levels].notna().values.dot(np.array([level_bits[l] for l in all_levels]))
+    depths = depth_by_mask[masks]
+    df = df[depths >= 0]
+    depths = depths[depths >= 0].tolist()
+
+    root = {'name': ROOT_NAME, 'level': ROOT_LEVEL, 'value': None, 'children': []}
+    nodes = {(): root}  # path => node
+    names = zip(*[_to_names(df[level]) for level in hierarchy])
+    values = zip(*[df[m].tolist() for m in metrics])  # tolist keeps ints as ints
+    for depth, row_names, row_values in zip(depths, names, values):
+        path = row_names[:depth]
+        node = nodes.get(path)
+        if node is None:
+            node = _add_node(nodes, path, hierarchy)
+        node['value'] = list(row_values)
+    return root
+
+
+def _add_node(nodes, path, hierarchy):
+    """Adds the node for the path (and its ancestors if they are not in the tree yet)."""
+    parent = nodes.get(path[:-1])
+    if parent is None:
+        parent = _add_node(nodes, path[:-1], hierarchy)
+
+    level = hierarchy[len(path) - 1]
+    node = {'name': path[-1], 'level': level, 'value': None}
+    if level != hierarchy[-1]:
+        node['children'] = []
+    parent['children'].append(node)
+    nodes[path] = node
+    return node
@@ -0,0 +1,88 @@
+"""
+Measures hierarchy_tree.build_tree on generated rollup rows (like the ones
+of queries.hierarchy_table) given as dicts and as a dataframe, and compares
+it against searching the children lists for each row (like the prototypes
+in build_tree.py and iter.py do) on a smaller sample, checking that both
+build the same tree.
+
+Run it from the dashboard folder like below:
+>> python hierarchy_tree_benchmark.py --rows 1000000
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from hierarchy_tree import HIERARCHY, METRICS, ROOT_LEVEL, ROOT_NAME, build_tree
+
+
+def make_rollup_rows(row_count, seed=0):
+    """
+    Returns about row_count rows: the (Year, Region, Country, Advertiser,
+    Brand) leaves and the subtotal rows of all of their prefixes, sorted
+    like the query sorts them (subtotals first).
+    """
+    rng = random.Random(seed)
+    regions = ['LATAM', 'EU', 'APAC', 'AED', 'NA']
+    paths = set()
+    while len(paths) < row_count:
+        country = rng.randint(1, 40)
+        advertiser = rng.randint(1, 5000)
+        leaf = (rng.randint(2013, 2019), regions[country % len(regions)], 'Country {}'.format(country),
+                'Advertiser {}'.format(advertiser), 'Brand {}-{}'.format(advertiser, rng.randint(1, 20)))
+        paths.update(leaf[:depth] for depth in range(len(leaf) + 1))
+    rows = []
+    for path in sorted(paths):  # A path sorts before the longer paths that start with it
+        row = dict(zip(HIERARCHY, path + (None,) * (len(HIERARCHY) - len(path))))
+        row.update(zip(METRICS, [round(rng.random() * 1e6, 2), rng.randint(1, 100), 1, 1, 1]))
+        rows.append(row)
+    return rows
+
+
+def build_tree_with_list_search(rows, hierarchy=HIERARCHY, metrics=METRICS):
+    """Builds the same tree by searching the children lists at each level."""
+    root = {'name': ROOT_NAME, 'level': ROOT_LEVEL, 'value': None, 'children': []}
+    for row in rows:
+        path = [row[level] for level in hierarchy]
+        depth = sum(v is not None for v in path)
+        node = root
+        for i, level in enumerate(hierarchy[:depth]):
+            child = [n for n in node['children'] if n['name'] == path[i]]
+            if child:
+                node = child[0]
+            else:
+                child = {'name': path[i], 'level': level, 'value': None}
+                if level != hierarchy[-1]:
+                    child['children'] = []
+                node['children'].append(child)
+                node = child
+        node['value'] = [row[m] for m in metrics]
+    return root
+
+
+def measure(label, build, rows):
+    start = time.perf_counter()
+    tree = build(rows)
+    secs = time.perf_counter() - start
+    print('{:<36} {:>10,} {:>8.2f} {:>12,.0f}'.format(label, len(rows), secs, len(rows) / secs))
+    return tree
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--list_search_rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    rows = make_rollup_rows(args.rows)
+    df = pd.DataFrame(rows)
+    print('{:<36} {:>10} {:>8} {:>12}'.format('BUILDER', 'ROWS', 'SECONDS', 'ROWS/SEC'))
+    tree = measure('build_tree (dicts)', build_tree, rows)
+    assert measure('build_tree (dataframe)', build_tree, df) == tree, 'Trees are different'
+    shuffled_rows = random.Random(1).sample(rows, len(rows))
+    measure('build_tree (dicts in any order)', build_tree, shuffled_rows)
+
+    sample = make_rollup_rows(args.list_search_rows)
+    expected = measure('list search (sample)', build_tree_with_list_search, sample)
+    assert measure('build_tree (sample)', build_tree, sample) == expected, 'Trees are different'
@@ -6,7 +6,17 @@ Desc:
 import os
 import sys
 import csv
+import datetime
+import decimal
+import gzip
+import io
+import json
+import math
+import queue
+import tempfile
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from .FileUtilities import *
 import pandas as pd
 from pandas.io.sql import DatabaseError
@@ -71,6 +81,29 @@ class SQLConnection:
                 chunk.to_csv(f, index=False, header=False, sep=delimiter, quoting=csv.QUOTE_ALL)
         return
 
+    def query_in_batches(self, query):
+        '''
+        Returns the description of the query's columns (cursor.description)
+        and a generator of batches of chunk_size rows (cursor.fetchmany) so
+        that the result never has to be in memory (or on disk) all at once.
+        '''
+        cursor = self.__connection.cursor()
+        cursor.execute(query)
+
+        def batches():
+            try:
+                rows = cursor.fetchmany(self.chunk_size)
+                while rows:
+                    yield rows
+                    rows = cursor.fetchmany(self.chunk_size)
+            finally:
+                cursor.close()
+
+        return cursor.description, batches()
+
+    def close(self):
+        self.__connection.close()
+
     def export_table(self, table, output_file, delimiter=','):
         query = 'select * from {}'.format(table)
         self.export_query(query=query, output_file=output_file, delimiter=delimiter)
@@ -138,15 +171,37 @@ class S3Connection:
         response = self.__s3client.list_objects_v2(Bucket=bucket, Prefix=key)
         return [each['Size'] for each in [obj for obj in response['Contents']] if each['Key'] == key][0]
 
-    def upload_file(self, file_path, key, bucket=None, prefix=None):
+    def upload_file(self, file_path, key, bucket=None, prefix=None, config=None, raise_error=False):
         bucket = bucket if bucket else self.bucket
         prefix = prefix if prefix else self.prefix
         key = prefix + key if prefix else key
         try:
-            config = TransferConfig(multipart_threshold=1024**3, multipart_chunksize=1024**2, max_concurrency=10)
+            config = config if config else TransferConfig(multipart_threshold=1024**3, multipart_chunksize=1024**2,
+                                                          max_concurrency=10)
             self.__s3client.upload_file(file_path, bucket, key, Config=config)
         except ClientError as e:
             print('Could not upload file:', e)
+            if raise_error:
+                raise
+        return
+
+    def upload_fileobj(self, fileobj, key, bucket=None, prefix=None, config=None, raise_error=False):
+        bucket = bucket if bucket else self.bucket
+        prefix = prefix if prefix else self.prefix
+        key = prefix + key if prefix else key
+        try:
+            self.__s3client.upload_fileobj(fileobj, bucket, key, Config=config)
+        except ClientError as e:
+            print('Could not upload file object:', e)
+            if raise_error:
+                raise
+        return
+
+    def write_object(self, key, body, bucket=None, prefix=None):
+        bucket = bucket if bucket else self.bucket
+        prefix = prefix if prefix else self.prefix
+        key = prefix + key if prefix else key
+        self.__s3client.put_object(Bucket=bucket, Key=key, Body=body)
         return
 
     # def write_file(self, df, filename, delimiter=',', index=False, bucket=False, prefix=False):
@@ -178,10 +233,31 @@ class S3Connection:
         self.__s3client.delete_object(Bucket=bucket, Key=key)
         return
 
+    def delete_files(self, keys, bucket=False, prefix=False):
+        bucket = bucket if bucket else self.bucket
+        prefix = prefix if prefix else self.prefix
+        keys = [prefix + key if prefix else key for key in keys]
+        for i in range(0, len(keys), 1000):  # delete_objects takes up to 1,000 keys at a time
+            self.__s3client.delete_objects(Bucket=bucket,
+                                           Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]],
+                                                   'Quiet': True})
+        return
+
 
 class RedshiftConnection:
 
     slice_count = None
+    # Size of each part (before compression) when loading files in parallel. AWS recommends
+    # 1 MB to 1 GB compressed files and a number of files that is a multiple of the slice count.
+    # https://docs.aws.amazon.com/redshift/latest/dg/t_splitting-data-files.html
+    part_size = 256 * 1024**2
+    upload_workers = 8
+    upload_config = TransferConfig(multipart_threshold=64 * 1024**2, multipart_chunksize=16 * 1024**2,
+                                   max_concurrency=4)
+    # Compressed size of each in-memory part when streaming query results into Redshift,
+    # and how many finished parts can wait for the uploader before we stop fetching rows
+    stream_part_size = 32 * 1024**2
+    stream_max_pending_parts = 4
 
     def __init__(self, host, port, database, username, password, **kwargs):
         try:
@@ -235,17 +311,27 @@ class RedshiftConnection:
         self.exec_commit(query)
         return
 
-    def copy_to_redshift(self, table, s3_address, s3_credentials, delimiter=',', quote_char='"',
-                         date_format='auto', time_format='auto'):
-        query = f"""copy {table}
+    @staticmethod
+    def get_copy_query(table, s3_address, s3_credentials, delimiter=',', quote_char='"',
+                       date_format='auto', time_format='auto', manifest=False, gzip=False):
+        # s3_address is the address of the manifest file when manifest is True
+        options = ''.join(['\n                    manifest' if manifest else '',
+                           '\n                    gzip' if gzip else ''])
+        return f"""copy {table}
                     from '{s3_address}'
                     delimiter '{delimiter}'
                     ignoreheader 1
                     csv quote as '{quote_char}'
                     dateformat '{date_format}'
-                    timeformat '{time_format}'
+                    timeformat '{time_format}'{options}
                     access_key_id '{s3_credentials["access_key"]}'
                     secret_access_key '{s3_credentials["secret_access_key"]}';"""
+
+    def copy_to_redshift(self, table, s3_address, s3_credentials, delimiter=',', quote_char='"',
+                         date_format='auto', time_format='auto', manifest=False, gzip=False):
+        query = self.get_copy_query(table=table, s3_address=s3_address, s3_credentials=s3_credentials,
+                                    delimiter=delimiter, quote_char=quote_char, date_format=date_format,
+                                    time_format=time_format, manifest=manifest, gzip=gzip)
         try:
             self.exec_commit(query)
         except psycopg2.Error as e:
@@ -254,8 +340,204 @@ class RedshiftConnection:
             self.__connection.rollback()
             raise
 
+    def get_part_count(self, file_size):
+        # Multiple of the slice count so that every slice loads the same number of files
+        slice_count = self.slice_count if self.slice_count else 1
+        return slice_count * max(1, math.ceil(file_size / (slice_count * self.part_size)))
+
+    def stage_file_in_parts(self, s3, file_path, table, quote_char='"'):
+        '''
+        Splits the file into gzip-compressed parts (see get_part_count), uploads
+        them to S3 in parallel (each part as soon as it is compressed) and writes
+        a manifest listing them. Returns the S3 keys of the parts and the manifest
+        (without S3Connection's prefix) so that they can be deleted after COPY.
+        If anything fails, the parts (and the manifest) uploaded so far are deleted.
+        '''
+        part_count = self.get_part_count(os.path.getsize(file_path))
+        keys = []
+        try:
+            # Leaving the executor's block waits for all submitted uploads
+            # to finish, so that none of them is left behind in S3
+            with tempfile.TemporaryDirectory() as output_folder, \
+                    ThreadPoolExecutor(max_workers=self.upload_workers) as executor:
+                uploads = []
+                for part_path in iter_gzip_parts(file_path=file_path, part_count=part_count,
+                                                 output_folder=output_folder, quote_char=quote_char):
+                    key = '{0}/{1}'.format(table, os.path.basename(part_path))
+                    keys.append(key)
+                    uploads.append(executor.submit(s3.upload_file, file_path=part_path, key=key,
+                                                   config=self.upload_config, raise_error=True))
+                for upload in uploads:
+                    upload.result()
+
+            keys.append(self.write_manifest(s3=s3, table=table, keys=keys))
+        except BaseException:
+            if keys:
+                s3.delete_files(keys=keys)
+            raise
+        return keys
+
+    @staticmethod
+    def write_manifest(s3, table, keys):
+        manifest = {'entries': [{'url': 's3://{0}/{1}'.format(s3.bucket, s3.prefix + key), 'mandatory': True}
+                                for key in keys]}
+        manifest_key = '{0}/manifest'.format(table)
+        s3.write_object(key=manifest_key, body=json.dumps(manifest).encode('utf-8'))
+        return manifest_key
+
+    @staticmethod
+    def get_redshift_dtypes_from_cursor_description(description):
+        '''
+        Maps the Python types pyodbc uses for the query's columns (and their
+        sizes) to Redshift data types. Decimals become float, like they do
+        when we infer the data types from exported files.
+        '''
+        dtypes = []
+        for _, type_code, _, internal_size, _, _, _ in description:
+            if type_code is bool:
+                dtypes.append('boolean')
+            elif type_code is int:
+                dtypes.append('bigint')
+            elif type_code in (float, decimal.Decimal):
+                dtypes.append('float')
+            elif type_code is datetime.datetime:
+                dtypes.append('timestamp')
+            elif type_code is datetime.date:
+                dtypes.append('date')
+            else:
+                # SQL Server's lengths are in (UTF-16) characters, Redshift's are in (UTF-8) bytes
+                # and (n)varchar(max) columns have no length
+                length = internal_size * 3 if internal_size and internal_size > 0 else 65535
+                dtypes.append('varchar({})'.format(min(length, 65535)))
+        return dtypes
+
+    @classmethod
+    def stream_rows_in_parts(cls, s3, columns, batches, table, keys, delimiter='\t', quote_char='"'):
+        '''
+        Writes the batches of rows into gzip-compressed CSV parts in memory
+        and hands each finished part to an uploader thread while the next
+        batches are being fetched. At most stream_max_pending_parts parts
+        wait for the uploader, so memory use stays bounded. The S3 keys of
+        the parts (without S3Connection's prefix) are appended to keys as
+        they are uploaded (so that they can be deleted even if this fails).
+        Returns the number of rows written.
+        '''
+        pending_parts = queue.Queue(maxsize=cls.stream_max_pending_parts)
+        upload_errors = []
+
+        def upload_parts():
+            while True:
+                item = pending_parts.get()
+                if item is None:
+                    return
+                key, buffer = item
+                try:
+                    if not upload_errors:
+                        s3.upload_fileobj(fileobj=buffer, key=key, config=cls.upload_config, raise_error=True)
+                except Exception as e:
+                    upload_errors.append(e)
+
+        def new_part():
+            buffer = io.BytesIO()
+            text = io.TextIOWrapper(gzip.GzipFile(fileobj=buffer, mode='wb'), encoding='utf-8', newline='')
+            writer = csv.writer(text, delimiter=delimiter, quotechar=quote_char, quoting=csv.QUOTE_ALL)
+            writer.writerow(columns)  # COPY's ignoreheader skips the first line of each part
+            return buffer, text, writer
+
+        def finish_part(buffer, text):
+            text.close()  # Closes the gzip stream too, but not the buffer under it
+            key = '{0}/{0}.{1:04d}.gz'.format(table, len(keys))
+            keys.append(key)
+            buffer.seek(0)
+            pending_parts.put((key, buffer))
+
+        row_count = 0
+        uploader = threading.Thread(target=upload_parts, daemon=True)
+        uploader.start()
+        try:
+            buffer, text, writer = new_part()
+            for rows in batches:
+                if upload_errors:
+                    break
+                writer.writerows(rows)
+                row_count += len(rows)
+                text.flush()
+                if buffer.tell() >= cls.stream_part_size:
+                    finish_part(buffer, text)
+                    buffer, text, writer = new_part()
+            finish_part(buffer, text)
+        finally:
+            pending_parts.put(None)
+            uploader.join()
+        if upload_errors:
+            raise upload_errors[0]
+        return row_count
+
+    @classmethod
+    def stage_query_in_parts(cls, s3, sql, query, table, delimiter='\t', quote_char='"'):
+        '''
+        Streams the result of the SQL Server query into gzip-compressed parts
+        in S3 (see stream_rows_in_parts) listed in a manifest. This only needs
+        the SQL Server connection, so that it can run separately from (and
+        with a different concurrency than) load_staged_parts.
+        Returns the column names, their Redshift data types, the S3 keys of
+        the parts with the manifest as the last one and the row count.
+        '''
+        description, batches = sql.query_in_batches(query)
+        columns = [column[0] for column in description]
+        cls.check_headers_for_reserved_words(headers=columns)
+        dtypes = cls.get_redshift_dtypes_from_cursor_description(description)
+
+        keys = []
+        try:
+            row_count = cls.stream_rows_in_parts(s3=s3, columns=columns, batches=batches, table=table, keys=keys,
+                                                 delimiter=delimiter, quote_char=quote_char)
+            keys.append(cls.write_manifest(s3=s3, table=table, keys=keys))
+        except BaseException:
+            if keys:
+                s3.delete_files(keys=keys)
+            raise
+        return columns, dtypes, keys, row_count
+
+    def load_staged_parts(self, s3, table, columns, dtypes, keys, delimiter='\t', quote_char='"',
+                          date_format='auto', time_format='auto', grant_user_access=None, delete_staged_parts=True):
+        '''
+        (Re)creates the table and loads the parts staged by stage_query_in_parts
+        into it with one manifest-based COPY. The staged parts are deleted
+        afterwards (even if COPY fails) unless delete_staged_parts is False.
+        '''
+        try:
+            self.create_table(table=table, columns=columns, drop_if_exists=True, dtype=dtypes)
+            s3_address = 's3://{0}/{1}'.format(s3.bucket, s3.prefix + keys[-1])
+            self.copy_to_redshift(table=table, s3_address=s3_address, s3_credentials=s3_temp,
+                                  delimiter=delimiter, quote_char=quote_char, date_format=date_format,
+                                  time_format=time_format, manifest=True, gzip=True)
+        finally:
+            if delete_staged_parts:
+                s3.delete_files(keys=keys)
+        if grant_user_access:
+            self.exec_commit(f'grant select on public.{table} to {grant_user_access}')
+        return
+
+    def query_to_redshift(self, sql, query, table, delimiter='\t', quote_char='"', date_format='auto',
+                          time_format='auto', grant_user_access=None):
+        '''
+        Streams the result of the SQL Server query into a new Redshift table
+        (created from the query's column types) without writing it to a
+        local file: rows are fetched, compressed and uploaded to S3 in parts
+        at the same time and then loaded with one manifest-based COPY.
+        Returns the number of rows exported from SQL Server.
+        '''
+        s3 = S3Connection(**s3_temp)
+        columns, dtypes, keys, row_count = self.stage_query_in_parts(s3=s3, sql=sql, query=query, table=table,
+                                                                     delimiter=delimiter, quote_char=quote_char)
+        self.load_staged_parts(s3=s3, table=table, columns=columns, dtypes=dtypes, keys=keys, delimiter=delimiter,
+                               quote_char=quote_char, date_format=date_format, time_format=time_format,
+                               grant_user_access=grant_user_access)
+        return row_count
+
     def file_to_redshift(self, file_path, table, replace_table, delimiter=',', quote_char='"',
-                         date_format='auto', time_format='auto', grant_user_access=None):
+                         date_format='auto', time_format='auto', grant_user_access=None, parallel_load=True):
         s3 = S3Connection(**s3_temp)
         if replace_table:
             columns, dtypes = get_columns_and_redshift_dtypes(file_path=file_path, delimiter=delimiter)
@@ -263,12 +545,20 @@ class RedshiftConnection:
         else:
             columns = get_headers(file_path=file_path, delimiter=delimiter)
         if self.check_headers_for_reserved_words(headers=columns):
-            file_name = table + os.path.splitext(file_path)[1]
-            s3_address = 's3://{0}/{1}'.format(s3_temp['bucket'], s3_temp['prefix'] + file_name)
-            s3.upload_file(file_path=file_path, key=file_name)
-            self.copy_to_redshift(table=table, s3_address=s3_address, s3_credentials=s3_temp, delimiter=delimiter,
-                                  quote_char=quote_char, date_format=date_format, time_format=time_format)
-            s3.delete_file(key=file_name)
+            if parallel_load:
+                # Compressed parts listed in a manifest are loaded by all slices in parallel
+                keys = self.stage_file_in_parts(s3=s3, file_path=file_path, table=table, quote_char=quote_char)
+                s3_address = 's3://{0}/{1}'.format(s3_temp['bucket'], s3_temp['prefix'] + keys[-1])
+            else:
+                keys = [table + os.path.splitext(file_path)[1]]
+                s3_address = 's3://{0}/{1}'.format(s3_temp['bucket'], s3_temp['prefix'] + keys[0])
+                s3.upload_file(file_path=file_path, key=keys[0])
+            try:
+                self.copy_to_redshift(table=table, s3_address=s3_address, s3_credentials=s3_temp,
+                                      delimiter=delimiter, quote_char=quote_char, date_format=date_format,
+                                      time_format=time_format, manifest=parallel_load, gzip=parallel_load)
+            finally:
+                s3.delete_files(keys=keys)
             if grant_user_access:
                 self.exec_commit(f'grant select on public.{table} to {grant_user_access}')
         return
@@ -3,6 +3,8 @@ Author: Hamza Ahmad
 Desc:
 '''
 
+import gzip
+import os
 import pandas as pd
 from pandas.api.types import infer_dtype
 import filecmp
@@ -29,20 +31,156 @@ def get_redshift_dtype(values):
         return 'varchar(4000)'
 
 
-def get_columns_and_redshift_dtypes(file_path, delimiter=','):
+# Patterns of the values that pandas' CSV parser reads as integers, floats and booleans
+INT_PATTERN = r'\s*[-+]?\d+\s*$'
+FLOAT_PATTERN = r'(?i)\s*[-+]?(\d+\.?\d*(e[-+]?\d+)?|\.\d+(e[-+]?\d+)?|inf|infinity)\s*$'
+BOOLEAN_VALUES = ['True', 'TRUE', 'true', 'False', 'FALSE', 'false']
+DATE_PATTERN = r'\d{4}-\d{2}-\d{2}$'
+MAX_VARCHAR_LENGTH = 65535
+
+
+def get_redshift_dtype_of_values(values, infer_dates=False):
+    """
+    Returns the Redshift data type (without the varchar length) that fits
+    all the values (non-empty strings read from a CSV file), or None if
+    there are no values.
+    """
+    if values.empty:
+        return None
+    elif values.str.match(INT_PATTERN).all():
+        return 'bigint'
+    elif values.str.match(FLOAT_PATTERN).all():
+        return 'float'
+    elif values.isin(BOOLEAN_VALUES).all():
+        return 'boolean'
+    elif infer_dates and values.str.match(DATE_PATTERN).all() \
+            and pd.to_datetime(values, format='%Y-%m-%d', errors='coerce').notna().all():
+        return 'date'
+    return 'varchar'
+
+
+def merge_redshift_dtypes(dtype1, dtype2):
+    """Returns the Redshift data type that fits the values of both data types."""
+    if dtype1 is None or dtype1 == dtype2:
+        return dtype2
+    elif dtype2 is None:
+        return dtype1
+    elif {dtype1, dtype2} == {'bigint', 'float'}:
+        return 'float'
+    return 'varchar'
+
+
+def get_columns_and_redshift_dtypes(file_path, delimiter=',', chunk_size=10000, sample_rows=None, infer_dates=False):
+    """
+    Reads the file ONCE (chunk by chunk) and returns the column names
+    and the Redshift data types of the columns. Each column's data type
+    starts as unknown and can only move up along bigint -> float -> varchar
+    (or boolean/date -> varchar) as we see more values.
+
+    Varchar columns are sized to the longest value (in bytes) in them.
+    Integer columns with empty values become float, which is what pandas
+    did when we used to infer the data types with it.
+
+    Args:
+        file_path: Path of the CSV file.
+        delimiter: Delimiter of the CSV file.
+        chunk_size: Number of rows to read at a time.
+        sample_rows: If given, stop after reading (at least) this many rows.
+        The rest of the file may have longer or other kinds of values, so if
+        we stop before the end of the file, varchar columns get the maximum
+        length and bigint columns become float. Boolean, date and float
+        columns still come from the sample only and COPY fails if the rest of
+        the file has values that do not fit them (read the whole file if it
+        must not fail).
+        infer_dates: If True, columns with only 'YYYY-MM-DD' values become date
+        (they are varchar by default, like they used to be).
+    """
     columns = get_headers(file_path=file_path, delimiter=delimiter)
-    dtypes = []
-    for column in columns:
-        values = pd.DataFrame()
-        reader = pd.read_csv(file_path, sep=delimiter, chunksize=10000, usecols=[column], infer_datetime_format=True, low_memory=False)
-        for chunk in reader:
-            chunk.dropna(axis=0, inplace=True)
-            values = pd.concat([values, chunk], ignore_index=True)
-            values.drop_duplicates(inplace=True)
-        dtypes.extend([get_redshift_dtype(values[column])])
+    dtypes = [None] * len(columns)
+    has_missing_values = [False] * len(columns)
+    max_lengths = [0] * len(columns)
+
+    rows_read = 0
+    stopped_early = False
+    reader = pd.read_csv(file_path, sep=delimiter, chunksize=chunk_size, dtype=str, low_memory=False)
+    for chunk in reader:
+        for i, column in enumerate(chunk.columns):
+            values = chunk[column]
+            non_empty_values = values.dropna()
+            has_missing_values[i] = has_missing_values[i] or len(non_empty_values) < len(values)
+            if non_empty_values.empty:
+                continue
+
+            dtype = get_redshift_dtype_of_values(non_empty_values, infer_dates=infer_dates)
+            if dtype == 'varchar':
+                # Redshift's varchar length is in bytes, not characters
+                length = non_empty_values.str.encode('utf-8').str.len().max()
+            else:
+                length = non_empty_values.str.len().max()
+            max_lengths[i] = max(max_lengths[i], int(length))
+            dtypes[i] = merge_redshift_dtypes(dtypes[i], dtype)
+
+        rows_read += chunk.shape[0]
+        if sample_rows is not None and rows_read >= sample_rows:
+            stopped_early = True
+            break
+
+    for i, dtype in enumerate(dtypes):
+        if dtype is None or (dtype == 'bigint' and (has_missing_values[i] or stopped_early)):
+            dtypes[i] = 'float'
+        elif dtype == 'varchar' and stopped_early:
+            dtypes[i] = 'varchar({})'.format(MAX_VARCHAR_LENGTH)
+        elif dtype == 'varchar':
+            dtypes[i] = 'varchar({})'.format(min(max(max_lengths[i], 1), MAX_VARCHAR_LENGTH))
     return columns, dtypes
 
 
+def iter_gzip_parts(file_path, part_count, output_folder, quote_char='"', compress_level=6):
+    """
+    Splits the file into (at most) part_count gzip-compressed parts of about
+    the same size in output_folder and yields the path of each part as soon
+    as it is written. Every part starts with the header line of the file
+    (COPY's ignoreheader skips the first line of each file). A part never ends
+    in the middle of a quoted value that has line breaks in it.
+    """
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    bytes_per_part = max(1, os.path.getsize(file_path) // part_count)
+    quote = quote_char.encode()
+
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        part_idx = 0
+        part_path = None
+        part = None
+        part_bytes = 0
+        in_quotes = False
+        for line in f:
+            if part is None:
+                part_path = os.path.join(output_folder, '{}.{:04d}.gz'.format(file_name, part_idx))
+                part = gzip.open(part_path, 'wb', compresslevel=compress_level)
+                part.write(header)
+                part_bytes = 0
+            part.write(line)
+            part_bytes += len(line)
+            # An odd number of quote characters means the line ends inside a quoted value
+            if line.count(quote) % 2:
+                in_quotes = not in_quotes
+            if part_bytes >= bytes_per_part and not in_quotes and part_idx < part_count - 1:
+                part.close()
+                part = None
+                part_idx += 1
+                yield part_path
+
+        if part is None and part_idx == 0:
+            # Header-only file
+            part_path = os.path.join(output_folder, '{}.{:04d}.gz'.format(file_name, part_idx))
+            part = gzip.open(part_path, 'wb', compresslevel=compress_level)
+            part.write(header)
+        if part is not None:
+            part.close()
+            yield part_path
+
+
 def compare_files(file1, file2, compare_bytes=False):
     if compare_bytes:
         with open(file1, 'rb') as f1, open(file2, 'rb') as f2:
@@ -56,7 +194,11 @@ def compare_files(file1, file2, compare_bytes=False):
 from time import time
 
 def s2hms(t):
-    sec = int(round(time() - t, 0))
+    return seconds_to_hms(time() - t)
+
+
+def seconds_to_hms(seconds):
+    sec = int(round(seconds, 0))
     hrs, mins, sec = sec // 3600, (sec % 3600) // 60, (sec % 3600) % 60
     if hrs > 0:
         return str('{:01}:{:02}:{:02}'.format(hrs, mins, sec) + ' hrs')
@@ -1,56 +1,217 @@
 '''
 Author: Hamza Ahmad
-Desc:
+Desc: Migrates all Datamart (SQL Server) tables into Redshift.
+
+Tables are scheduled largest first so that the biggest ones don't start
+last and hold up the end of the run. Each table is first staged (streamed
+from SQL Server into compressed parts in S3) by a pool of
+MAX_SQL_SERVER_CONNECTIONS processes and then loaded (COPY) into Redshift by
+a pool of MAX_REDSHIFT_CONNECTIONS threads, so that the number of connections
+to each database is capped separately. Every process/thread reuses its
+connection for all the tables it works on, and failed tables are retried.
 '''
 
-import os
+import threading
 import time
 import multiprocessing
-from .Connections import SQLConnection, RedshiftConnection
-from .account_info import local_temp_folder, cred_sql, cred_rs
-from FileUtilities import s2hms
+from concurrent.futures import ThreadPoolExecutor
+from .Connections import SQLConnection, RedshiftConnection, S3Connection
+from .account_info import cred_sql, cred_rs, s3_temp
+from FileUtilities import s2hms, seconds_to_hms
+
+MAX_SQL_SERVER_CONNECTIONS = 8
+MAX_REDSHIFT_CONNECTIONS = 4
+MAX_ATTEMPTS = 3
+RETRY_WAIT_SECONDS = 30  # Doubles after each failed attempt
+DELIMITER = '\t'
+
+# Row count of each table from its heap (index_id 0) or clustered index (index_id 1), largest first
+TABLES_QUERY = """SELECT [Schema] = s.[Name],
+                         [Table] = t.[Name],
+                         [RowCount] = SUM(p.[Rows])
+                  FROM sys.tables t
+                  INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
+                  INNER JOIN sys.partitions p ON t.OBJECT_ID = p.OBJECT_ID
+                                             AND p.index_id IN (0, 1)
+                  -- WHERE s.[Name] = 'dbo'
+                  GROUP BY s.[Name], t.[Name]
+                  ORDER BY [RowCount] DESC"""
+
+# Connections reused by all the tables staged in a worker process
+_sql_connection = None
+_s3_connection = None
+
+# Connection reused by all the tables loaded in a thread
+_redshift = threading.local()
+
+
+def get_sql_connection():
+    global _sql_connection
+    if _sql_connection is None:
+        _sql_connection = SQLConnection(**cred_sql)
+    return _sql_connection
+
+
+def reset_sql_connection():
+    global _sql_connection
+    try:
+        if _sql_connection is not None:
+            _sql_connection.close()
+    except Exception:
+        pass
+    _sql_connection = None
+
+
+def get_s3_connection():
+    global _s3_connection
+    if _s3_connection is None:
+        _s3_connection = S3Connection(**s3_temp)
+    return _s3_connection
+
+
+def get_redshift_connection():
+    if getattr(_redshift, 'connection', None) is None:
+        _redshift.connection = RedshiftConnection(**cred_rs)
+    return _redshift.connection
+
+
+def reset_redshift_connection():
+    try:
+        if getattr(_redshift, 'connection', None) is not None:
+            _redshift.connection.close()
+    except Exception:
+        pass
+    _redshift.connection = None
 
 
-def migrate(table_info):
+def with_retries(func, reset_connection, table, step):
+    # SQLConnection and RedshiftConnection call exit() when they can't connect
+    wait_seconds = RETRY_WAIT_SECONDS
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return func()
+        except (Exception, SystemExit) as e:
+            reset_connection()
+            if attempt == MAX_ATTEMPTS:
+                raise
+            print('Attempt {} of {} to {} [{}] failed: {!r}. Retrying in {} secs.'
+                  .format(attempt, MAX_ATTEMPTS, step, table, e, wait_seconds))
+            time.sleep(wait_seconds)
+            wait_seconds *= 2
+
+
+def stage_table(table_info):
+    '''Runs in the process pool. Streams the table from SQL Server into compressed parts in S3.'''
     t = time.time()
     [_, table, row_count] = table_info
+    result = {'table': table, 'row_count': row_count, 'error': None}
 
-    # Export SQL table from Datamart into a tab-delimited text file in a temporary folder
-    output_file = '{}.txt'.format(table.replace(' ', '_'))
-    output_path = os.path.join(local_temp_folder, output_file)
-    sql = SQLConnection(**cred_sql)
-    sql.export_table(table=table, output_file=output_path, delimiter='\t')
+    def stage():
+        return RedshiftConnection.stage_query_in_parts(s3=get_s3_connection(), sql=get_sql_connection(),
+                                                       query='select * from {}'.format(table), table=table,
+                                                       delimiter=DELIMITER)
+
+    try:
+        result['columns'], result['dtypes'], result['keys'], result['staged_row_count'] = \
+            with_retries(stage, reset_sql_connection, table, 'stage')
+    except (Exception, SystemExit) as e:
+        result['error'] = 'Staging failed: {!r}'.format(e)
+    result['seconds'] = time.time() - t
+    return result
+
+
+def load_table(s3, result, progress):
+    '''Runs in the thread pool. Loads the parts staged by stage_table into Redshift.'''
+    t = time.time()
+    table = result['table']
+
+    def load():
+        rs = get_redshift_connection()
+        rs.load_staged_parts(s3=s3, table=table, columns=result['columns'], dtypes=result['dtypes'],
+                             keys=result['keys'], delimiter=DELIMITER, delete_staged_parts=False)
+        cur = rs.exec_commit(query='select count(*) from {}'.format(table), commit=False, return_cursor=True)
+        return cur.fetchone()[0]
 
-    # Upload local file to S3 and COPY into Redshift
-    rs = RedshiftConnection(**cred_rs)
-    rs.file_to_redshift(file_path=output_path, table=table, replace_table=True, delimiter='\t')
+    if result['error'] is None:
+        try:
+            result['rs_row_count'] = with_retries(load, reset_redshift_connection, table, 'load')
+        except (Exception, SystemExit) as e:
+            result['error'] = 'Loading failed: {!r}'.format(e)
+        finally:
+            s3.delete_files(keys=result['keys'])
+    result['seconds'] += time.time() - t
+    progress.table_done(result)
+    return result
 
-    # Get row count of Redshift table
-    cur = rs.exec_commit(query='select count(*) from {}'.format(table), commit=False, return_cursor=True)
-    rs_row_count = cur.fetchone()[0]
-    rs.close()
 
-    if row_count == rs_row_count:
-        os.remove(output_path)
-        print('Transferred {:,} rows into [{}] in {}.'.format(row_count, table, s2hms(t)))
-    else:
-        print('\n\nERROR TRANSFERRING DATAMART TABLE: [{}]. #RowsInDataMart: {:,}\t#RowsInRedshift: {:,}'
-              .format(table, row_count, rs_row_count))
+class Progress:
+    '''Prints rows/sec of each table and overall ETA (based on row counts) as tables finish.'''
+
+    def __init__(self, tables):
+        self.start_time = time.time()
+        self.table_count = len(tables)
+        self.total_rows = sum(row_count for _, _, row_count in tables)
+        self.done_tables = 0
+        self.done_rows = 0
+        self.lock = threading.Lock()
+
+    def table_done(self, result):
+        with self.lock:
+            self.done_tables += 1
+            self.done_rows += result['row_count']
+            if result['error']:
+                message = 'FAILED [{}]: {}'.format(result['table'], result['error'])
+            else:
+                message = 'Transferred {:,} rows into [{}] in {} ({:,.0f} rows/sec).'.format(
+                    result['rs_row_count'], result['table'], seconds_to_hms(result['seconds']),
+                    result['staged_row_count'] / max(result['seconds'], 1e-6))
+            elapsed = time.time() - self.start_time
+            if self.done_rows and self.done_rows < self.total_rows:
+                eta = seconds_to_hms(elapsed / self.done_rows * (self.total_rows - self.done_rows))
+            else:
+                eta = '-'
+            print('[{}/{} tables, {:.1%} of rows, ETA {}] {}'.format(
+                self.done_tables, self.table_count,
+                self.done_rows / self.total_rows if self.total_rows else 1, eta, message))
+
+
+def print_summary(results):
+    failed = [r for r in results if r['error']]
+    mismatched = [r for r in results if not r['error']
+                  and not r['row_count'] == r['staged_row_count'] == r['rs_row_count']]
+    print('\n\nTransferred {} of {} tables.'.format(len(results) - len(failed), len(results)))
+    if mismatched:
+        print('\nTABLES WITH MISMATCHED ROW COUNTS:')
+        print('{:<60} {:>15} {:>15} {:>15}'.format('TABLE', '#RowsInDataMart', '#RowsExported', '#RowsInRedshift'))
+        for r in mismatched:
+            print('{:<60} {:>15,} {:>15,} {:>15,}'.format(r['table'], r['row_count'], r['staged_row_count'],
+                                                          r['rs_row_count']))
+    if failed:
+        print('\nFAILED TABLES:')
+        for r in failed:
+            print('[{}]: {}'.format(r['table'], r['error']))
+
+
+def migrate(tables):
+    t = time.time()
+    progress = Progress(tables)
+    s3 = S3Connection(**s3_temp)
+    with multiprocessing.Pool(MAX_SQL_SERVER_CONNECTIONS) as pool, \
+            ThreadPoolExecutor(max_workers=MAX_REDSHIFT_CONNECTIONS) as executor:
+        # imap_unordered hands out the tables in the given (largest first) order and each
+        # table is queued for loading as soon as it is staged
+        loads = [executor.submit(load_table, s3, result, progress)
+                 for result in pool.imap_unordered(stage_table, tables)]
+        results = [load.result() for load in loads]
+    print_summary(results)
+    print('\nFinished in {}.'.format(s2hms(t)))
+    return results
 
 
 if __name__ == '__main__':
     # Get a list of SQL tables that need to be migrated to Redshift
     sql = SQLConnection(**cred_sql)
-    tables_to_transfer = sql.query("""SELECT DISTINCT [Schema] = s.[Name],
-                                                      [Table] = t.[Name],
-                                                      [RowCount] = p.[Rows]
-                                      FROM sys.tables t
-                                      INNER JOIN sys.indexes i ON t.OBJECT_ID = i.object_id
-                                      INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
-                                      INNER JOIN sys.partitions p ON i.object_id = p.OBJECT_ID
-                                                                 AND i.index_id = p.index_id
-                                      -- WHERE s.[Name] = 'dbo'
-                                      ORDER BY p.[Rows]""")
-    p = multiprocessing.Pool()
-    p.map(migrate, tables_to_transfer.values.tolist())
-    p.close()
+    tables_to_transfer = sql.query(TABLES_QUERY).values.tolist()
+    sql.close()
+    tables_to_transfer.sort(key=lambda table_info: table_info[2], reverse=True)
+    migrate(tables_to_transfer)
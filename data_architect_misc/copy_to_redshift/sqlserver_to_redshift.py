@@ -3,11 +3,10 @@ Author: Hamza Ahmad
 Desc:
 '''
 
-import os
 from time import time
 import multiprocessing
 from .Connections import SQLConnection, RedshiftConnection
-from .account_info import cred_sql, cred_rs, local_temp_folder
+from .account_info import cred_sql, cred_rs
 from FileUtilities import s2hms
 
 
@@ -15,17 +14,13 @@ def main(input_val):
     rs_table_name = input_val[0]
     ss_table_name = input_val[1]
     t = time()
-    file_name = f'{rs_table_name}.txt'
-    file_path = os.path.join(local_temp_folder, file_name)
     delimiter = '\t'
 
+    # Rows are streamed from SQL Server to S3 (in compressed parts) and loaded
+    # into Redshift without writing the whole table to a local file first
     sql = SQLConnection(**cred_sql)
-    sql.export_table(table=ss_table_name, output_file=file_path, delimiter=delimiter)
-
     rs = RedshiftConnection(**cred_rs)
-    rs.file_to_redshift(file_path=file_path, table=rs_table_name, replace_table=True, delimiter=delimiter)
-
-    os.remove(file_path)
+    rs.query_to_redshift(sql=sql, query=f'select * from {ss_table_name}', table=rs_table_name, delimiter=delimiter)
 
     print(f'COMPLETED PUSHING {rs_table_name} TO REDSHIFT IN {s2hms(t)}.')
     return
@@ -0,0 +1,382 @@
+'''
+Tests for loading files into Redshift as gzip parts listed in a manifest
+(RedshiftConnection.file_to_redshift with parallel_load=True) and for
+streaming SQL Server query results into such parts
+(RedshiftConnection.query_to_redshift).
+
+S3 runs on moto and the Redshift connection is a stand-in for psycopg2's
+connection that records the queries sent to it (Postgres does not know
+Redshift's COPY options, so the COPY statement is checked as text).
+
+Run it from the copy_to_redshift folder like below:
+>> python -m pytest test_redshift_parallel_load.py
+'''
+
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import sys
+import types
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+
+for module_name in ('pandas', 'pyodbc', 'psycopg2', 'boto3'):
+    pytest.importorskip(module_name)
+moto = pytest.importorskip('moto')
+
+import boto3
+import psycopg2
+
+# account_info.py (with the real credentials) is not in the repo
+account_info = types.ModuleType('copy_to_redshift.account_info')
+account_info.s3_temp = {}
+sys.modules.setdefault('copy_to_redshift.account_info', account_info)
+
+from copy_to_redshift import Connections
+from copy_to_redshift.FileUtilities import iter_gzip_parts
+
+BUCKET = 'test-bucket'
+PREFIX = 'staging/'
+REGION = 'us-east-1'
+SLICE_COUNT = 4
+S3_TEMP = {'access_key': 'testing', 'secret_access_key': 'testing', 'region_name': REGION,
+           'bucket': BUCKET, 'prefix': PREFIX}
+HEADER = ['id', 'name', 'comment', 'spend']
+
+
+class RecordingCursor:
+    '''Stand-in for psycopg2's cursor that records the queries executed.'''
+
+    def __init__(self):
+        self.queries = []
+        self.fail_on = None
+
+    def execute(self, query):
+        self.queries.append(query)
+        if self.fail_on and query.lstrip().startswith(self.fail_on):
+            raise psycopg2.Error('Stand-in failure for: {}'.format(self.fail_on))
+
+    def fetchone(self):
+        # Only used by get_slice_count
+        return (SLICE_COUNT,)
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    '''Stand-in for psycopg2's connection.'''
+
+    def __init__(self):
+        self.recording_cursor = RecordingCursor()
+        self.rollback_count = 0
+
+    def cursor(self):
+        return self.recording_cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollback_count += 1
+
+    def close(self):
+        pass
+
+
+class StandInSQLConnection:
+    '''Stand-in for SQLServerConnection that returns the rows in batches.'''
+
+    def __init__(self, description, rows, batch_size=100):
+        self.description = description
+        self.rows = rows
+        self.batch_size = batch_size
+
+    def query_in_batches(self, query):
+        def batches():
+            for i in range(0, len(self.rows), self.batch_size):
+                yield self.rows[i:i + self.batch_size]
+        return self.description, batches()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for key in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SECURITY_TOKEN', 'AWS_SESSION_TOKEN'):
+        monkeypatch.setenv(key, 'testing')
+    mock_s3 = getattr(moto, 'mock_aws', None) or moto.mock_s3
+    with mock_s3():
+        boto3.client('s3', region_name=REGION).create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(Connections, 's3_temp', S3_TEMP)
+        yield Connections.S3Connection(**S3_TEMP)
+
+
+@pytest.fixture
+def redshift(monkeypatch):
+    connection = RecordingConnection()
+    monkeypatch.setattr(Connections.psycopg2, 'connect', lambda **kwargs: connection)
+    # redshift_reserved_words.txt is not in the repo
+    monkeypatch.setattr(Connections.RedshiftConnection, 'check_headers_for_reserved_words',
+                        staticmethod(lambda headers: True))
+    # Small parts so that a small file (or query result) is split into several of them
+    monkeypatch.setattr(Connections.RedshiftConnection, 'part_size', 4096)
+    monkeypatch.setattr(Connections.RedshiftConnection, 'stream_part_size', 4096)
+    rs = Connections.RedshiftConnection(host='localhost', port=5439, database='dev',
+                                        username='user', password='password')
+    return rs, connection
+
+
+def make_rows(row_count):
+    # Values with delimiters, quotes and line breaks in them
+    comments = ['plain', 'has\ttab', 'has "quotes"', 'multi\nline\nvalue', 'ends with newline\n', '']
+    return [[str(i), 'name {}'.format(i), comments[i % len(comments)], '{:.2f}'.format(i * 1.25)]
+            for i in range(row_count)]
+
+
+def write_file(file_path, rows):
+    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter='\t', quoting=csv.QUOTE_ALL)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def read_rows(data):
+    return list(csv.reader(io.StringIO(data.decode('utf-8'), newline=''), delimiter='\t'))
+
+
+def get_bucket_keys():
+    response = boto3.client('s3', region_name=REGION).list_objects_v2(Bucket=BUCKET)
+    return sorted(obj['Key'] for obj in response.get('Contents', []))
+
+
+def get_object(key):
+    return boto3.client('s3', region_name=REGION).get_object(Bucket=BUCKET, Key=key)['Body'].read()
+
+
+def assert_parts_have_rows(parts_data, rows):
+    part_rows = []
+    for data in parts_data:
+        rows_in_part = read_rows(gzip.decompress(data))
+        # COPY's ignoreheader skips the first line of each part
+        assert rows_in_part[0] == HEADER
+        part_rows.extend(rows_in_part[1:])
+    assert part_rows == rows
+
+
+def test_iter_gzip_parts_splits_file_without_breaking_quoted_values(tmp_path):
+    rows = make_rows(3000)
+    file_path = str(tmp_path / 'data.txt')
+    write_file(file_path, rows)
+    output_folder = tmp_path / 'parts'
+    output_folder.mkdir()
+
+    part_paths = list(iter_gzip_parts(file_path=file_path, part_count=8,
+                                      output_folder=str(output_folder)))
+
+    assert len(part_paths) == 8
+    assert [os.path.basename(p) for p in part_paths] == ['data.{:04d}.gz'.format(i) for i in range(8)]
+    parts_data = []
+    for part_path in part_paths:
+        with open(part_path, 'rb') as f:
+            parts_data.append(f.read())
+    assert_parts_have_rows(parts_data, rows)
+
+
+def test_iter_gzip_parts_writes_header_only_file_as_one_part(tmp_path):
+    file_path = str(tmp_path / 'empty.txt')
+    write_file(file_path, [])
+
+    part_paths = list(iter_gzip_parts(file_path=file_path, part_count=4, output_folder=str(tmp_path)))
+
+    assert len(part_paths) == 1
+    with gzip.open(part_paths[0], 'rb') as f:
+        assert read_rows(f.read()) == [HEADER]
+
+
+def test_stage_file_in_parts_uploads_parts_and_manifest(tmp_path, s3, redshift):
+    rs, _ = redshift
+    rows = make_rows(3000)
+    file_path = str(tmp_path / 'data.txt')
+    write_file(file_path, rows)
+
+    keys = rs.stage_file_in_parts(s3=s3, file_path=file_path, table='my_table')
+
+    part_keys, manifest_key = keys[:-1], keys[-1]
+    assert manifest_key == 'my_table/manifest'
+    # The number of parts is a multiple of the slice count
+    assert len(part_keys) == rs.get_part_count(os.path.getsize(file_path))
+    assert len(part_keys) % SLICE_COUNT == 0
+    assert get_bucket_keys() == sorted(PREFIX + key for key in keys)
+
+    manifest = json.loads(get_object(PREFIX + manifest_key).decode('utf-8'))
+    assert manifest == {'entries': [{'url': 's3://{0}/{1}{2}'.format(BUCKET, PREFIX, key), 'mandatory': True}
+                                    for key in part_keys]}
+    assert_parts_have_rows([get_object(PREFIX + key) for key in part_keys], rows)
+
+
+def test_stage_file_in_parts_deletes_uploaded_parts_if_an_upload_fails(tmp_path, s3, redshift, monkeypatch):
+    rs, _ = redshift
+    file_path = str(tmp_path / 'data.txt')
+    write_file(file_path, make_rows(3000))
+    upload_file = Connections.S3Connection.upload_file
+
+    def fail_third_part(self, file_path, key, **kwargs):
+        if key.endswith('.0002.gz'):
+            raise RuntimeError('Upload failed')
+        return upload_file(self, file_path, key, **kwargs)
+
+    monkeypatch.setattr(Connections.S3Connection, 'upload_file', fail_third_part)
+
+    with pytest.raises(RuntimeError, match='Upload failed'):
+        rs.stage_file_in_parts(s3=s3, file_path=file_path, table='my_table')
+    assert get_bucket_keys() == []
+
+
+def test_get_copy_query_with_manifest_and_gzip():
+    query = Connections.RedshiftConnection.get_copy_query(
+        table='my_table', s3_address='s3://{0}/{1}my_table/manifest'.format(BUCKET, PREFIX),
+        s3_credentials={'access_key': 'AKEY', 'secret_access_key': 'SKEY'},
+        delimiter='|', manifest=True, gzip=True)
+
+    assert ' '.join(query.split()) == (
+        "copy my_table from 's3://test-bucket/staging/my_table/manifest' delimiter '|' "
+        "ignoreheader 1 csv quote as '\"' dateformat 'auto' timeformat 'auto' manifest gzip "
+        "access_key_id 'AKEY' secret_access_key 'SKEY';")
+
+
+def test_get_copy_query_without_manifest_and_gzip():
+    query = Connections.RedshiftConnection.get_copy_query(
+        table='my_table', s3_address='s3://test-bucket/staging/my_table.txt',
+        s3_credentials={'access_key': 'AKEY', 'secret_access_key': 'SKEY'}, delimiter='|')
+
+    assert 'manifest' not in query
+    assert 'gzip' not in query
+
+
+def test_file_to_redshift_copies_parts_with_manifest_and_deletes_them(tmp_path, s3, redshift):
+    rs, connection = redshift
+    file_path = str(tmp_path / 'data.txt')
+    write_file(file_path, make_rows(3000))
+
+    rs.file_to_redshift(file_path=file_path, table='my_table', replace_table=True, delimiter='\t')
+
+    queries = connection.recording_cursor.queries
+    assert 'drop table if exists my_table' in queries
+    assert any(q.startswith('create table my_table (id ') for q in queries)
+    copy_queries = [q for q in queries if q.startswith('copy my_table')]
+    assert len(copy_queries) == 1
+    copy_query = copy_queries[0]
+    assert "from 's3://{0}/{1}my_table/manifest'".format(BUCKET, PREFIX) in copy_query
+    assert "delimiter '\t'" in copy_query
+    assert [line.strip() for line in copy_query.splitlines()][-4:-2] == ['manifest', 'gzip']
+    assert get_bucket_keys() == []
+
+
+def test_file_to_redshift_deletes_parts_if_copy_fails(tmp_path, s3, redshift):
+    rs, connection = redshift
+    connection.recording_cursor.fail_on = 'copy'
+    file_path = str(tmp_path / 'data.txt')
+    write_file(file_path, make_rows(3000))
+
+    with pytest.raises(psycopg2.Error):
+        rs.file_to_redshift(file_path=file_path, table='my_table', replace_table=False, delimiter='\t')
+    assert connection.rollback_count == 1
+    assert get_bucket_keys() == []
+
+
+# pyodbc's cursor.description: (name, type_code, display_size, internal_size, precision, scale, null_ok)
+QUERY_DESCRIPTION = [('id', int, None, 10, 10, 0, False),
+                     ('name', str, None, 50, 50, 0, True),
+                     ('comment', str, None, 0, 0, 0, True),
+                     ('spend', decimal.Decimal, None, 18, 18, 2, True)]
+
+
+def test_get_redshift_dtypes_from_cursor_description():
+    description = QUERY_DESCRIPTION + [('active', bool, None, 1, 1, 0, True),
+                                       ('rate', float, None, 53, 53, 0, True),
+                                       ('updated_at', datetime.datetime, None, 23, 23, 3, True),
+                                       ('start_date', datetime.date, None, 10, 10, 0, True),
+                                       ('long_name', str, None, 30000, 30000, 0, True)]
+
+    dtypes = Connections.RedshiftConnection.get_redshift_dtypes_from_cursor_description(description)
+
+    assert dtypes == ['bigint', 'varchar(150)', 'varchar(65535)', 'float', 'boolean', 'float',
+                      'timestamp', 'date', 'varchar(65535)']
+
+
+def test_stage_query_in_parts_streams_rows_into_parts_with_header(s3, redshift):
+    rs, _ = redshift
+    rows = make_rows(3000)
+    sql = StandInSQLConnection(QUERY_DESCRIPTION, rows)
+
+    columns, dtypes, keys, row_count = rs.stage_query_in_parts(s3=s3, sql=sql, query='select 1', table='my_table')
+
+    assert columns == HEADER
+    assert dtypes == ['bigint', 'varchar(150)', 'varchar(65535)', 'float']
+    assert row_count == len(rows)
+    part_keys, manifest_key = keys[:-1], keys[-1]
+    assert manifest_key == 'my_table/manifest'
+    # Parts are cut at stream_part_size, so this result needs several of them
+    assert len(part_keys) > 1
+    assert part_keys == ['my_table/my_table.{:04d}.gz'.format(i) for i in range(len(part_keys))]
+    assert get_bucket_keys() == sorted(PREFIX + key for key in keys)
+
+    manifest = json.loads(get_object(PREFIX + manifest_key).decode('utf-8'))
+    assert manifest == {'entries': [{'url': 's3://{0}/{1}{2}'.format(BUCKET, PREFIX, key), 'mandatory': True}
+                                    for key in part_keys]}
+    # Every part starts with the header and the parts have all the rows in order
+    assert_parts_have_rows([get_object(PREFIX + key) for key in part_keys], rows)
+
+
+def test_stage_query_in_parts_writes_header_only_part_for_empty_result(s3, redshift):
+    rs, _ = redshift
+    sql = StandInSQLConnection(QUERY_DESCRIPTION, [])
+
+    _, _, keys, row_count = rs.stage_query_in_parts(s3=s3, sql=sql, query='select 1', table='my_table')
+
+    assert row_count == 0
+    assert keys == ['my_table/my_table.0000.gz', 'my_table/manifest']
+    assert read_rows(gzip.decompress(get_object(PREFIX + keys[0]))) == [HEADER]
+
+
+def test_stage_query_in_parts_deletes_staged_parts_if_an_upload_fails(s3, redshift, monkeypatch):
+    rs, _ = redshift
+    sql = StandInSQLConnection(QUERY_DESCRIPTION, make_rows(3000))
+    upload_fileobj = Connections.S3Connection.upload_fileobj
+
+    def fail_third_part(self, fileobj, key, **kwargs):
+        if key.endswith('.0002.gz'):
+            raise RuntimeError('Upload failed')
+        return upload_fileobj(self, fileobj, key, **kwargs)
+
+    monkeypatch.setattr(Connections.S3Connection, 'upload_fileobj', fail_third_part)
+
+    with pytest.raises(RuntimeError, match='Upload failed'):
+        rs.stage_query_in_parts(s3=s3, sql=sql, query='select 1', table='my_table')
+    # Neither the parts uploaded before the failure nor a manifest are left behind
+    assert get_bucket_keys() == []
+
+
+def test_query_to_redshift_creates_table_from_query_types_and_returns_row_count(s3, redshift):
+    rs, connection = redshift
+    rows = make_rows(3000)
+    sql = StandInSQLConnection(QUERY_DESCRIPTION, rows)
+
+    row_count = rs.query_to_redshift(sql=sql, query='select 1', table='my_table')
+
+    assert row_count == len(rows)
+    queries = connection.recording_cursor.queries
+    assert 'drop table if exists my_table' in queries
+    create_queries = [' '.join(q.split()) for q in queries if q.startswith('create table my_table')]
+    assert len(create_queries) == 1
+    assert 'spend float' in create_queries[0]
+    copy_queries = [q for q in queries if q.startswith('copy my_table')]
+    assert len(copy_queries) == 1
+    assert "from 's3://{0}/{1}my_table/manifest'".format(BUCKET, PREFIX) in copy_queries[0]
+    assert get_bucket_keys() == []
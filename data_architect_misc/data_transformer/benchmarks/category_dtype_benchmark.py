@@ -0,0 +1,173 @@
+"""
+Compares the memory used by each transformed chunk and the
+throughput (rows per second) of transforming a raw comp. harm.
+file with and without the 'categorical_columns' mode, in which
+low-cardinality string columns are held as category dtype (see
+category_dtype.py). Also checks that both modes give the same data
+(every row of every chunk, compared by their hashes).
+
+The raw CSV file (5 million rows by default) is generated in a
+temporary folder and read in chunks of 'rows_per_read' rows by
+PandasCSVDataReader in streaming mode like transform.py would.
+
+Run it from the data_transformer folder like below:
+>> python -m benchmarks.category_dtype_benchmark --rows 5000000
+>> python -m benchmarks.category_dtype_benchmark --rows 1000000 --trace_memory
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import category_dtype
+from constants.transform_constants import KEY_FUNCTIONS_TO_APPLY, KEY_FUNC_NAME, \
+    KEY_FUNC_ARGS, KEY_CATEGORICAL_COLUMNS, CATEGORICAL_COLUMNS_AUTO
+from data_readers.file_data_reader import FileDataReader
+from data_readers.pandas_file_data_reader import PandasFileDataReader
+from transform_functions.latam_brazil_transform_functions import LatamBrazilTransformFunctions
+from transform_pipeline import TransformPipeline
+
+# Raw values that look like what we get in Brazil's investment data
+MEDIA = ['TV ABERTA', 'TV PAGA', 'RADIO', 'JORNAL', 'REVISTA', 'OUTDOOR', 'CINEMA', 'INTERNET']
+CATEGORIES = ['CREMA DENTAL', 'CEPILLO DENTAL', 'DETERGENTE', 'LIMPIADOR', 'SUAVIZANTE',
+              'JABON DE TOCADOR', 'DESODORANTE', 'SHAMPOO', 'ALIMENTO PARA MASCOTAS', 'INDEFINIDO']
+ADVERTISERS = ['COLGATE PALMOLIVE', 'PROCTER & GAMBLE', 'UNILEVER BRASIL', 'HENKEL',
+               'RECKITT BENCKISER', 'JOHNSON & JOHNSON', 'BEIERSDORF', 'NESTLE PURINA'] + \
+              [f"ANUNCIANTE LOCAL {i}" for i in range(1500)]
+
+FUNCTIONS_TO_APPLY = [
+    {KEY_FUNC_NAME: 'add_PROCESSED_DATE_column_with_current_date'},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_YEAR_column_by_renaming_existing_column', KEY_FUNC_ARGS: ['ANO']},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_MONTH_column_by_renaming_existing_column', KEY_FUNC_ARGS: ['MES']},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_DATE_column_using_existing_YEAR_and_MONTH_columns_with_integer_values'},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_REGION_column', KEY_FUNC_ARGS: ['Latin America']},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_COUNTRY_column_using_fixed_str_value', KEY_FUNC_ARGS: ['Brazil']},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_ADVERTISER_column_using_existing_advertiser_column',
+     KEY_FUNC_ARGS: ['ANUNCIANTE']},
+    {KEY_FUNC_NAME: 'replace_empty_string_values_with_NOT_AVAILABLE', KEY_FUNC_ARGS: ['HARMONIZED_ADVERTISER']},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_MEDIA_TYPE_column_using_existing_media_type_column', KEY_FUNC_ARGS: ['MEIO']},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_CURRENCY_column', KEY_FUNC_ARGS: ['BRL']},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_GROSS_SPEND_column', KEY_FUNC_ARGS: ['INVESTIMENTO']},
+    {KEY_FUNC_NAME: 'add_HARMONIZED_CATEGORY_column_by_applying_category_mappings_to_existing_column',
+     KEY_FUNC_ARGS: ['CATEGORIA', True]},
+    {KEY_FUNC_NAME: 'add_RAW_CATEGORY_column_by_renaming_existing_column', KEY_FUNC_ARGS: ['CATEGORIA']},
+    {KEY_FUNC_NAME: 'update_str_values_in_columns',
+     KEY_FUNC_ARGS: [['MARCA'], [{'MARCA 1': 'MARCA UNO', 'MARCA 2': 'MARCA DOS'}]]},
+    {KEY_FUNC_NAME: 'assert_REGION_values_are_valid'},
+    {KEY_FUNC_NAME: 'assert_COUNTRY_values_are_valid'},
+    {KEY_FUNC_NAME: 'assert_MEDIA_TYPE_values_are_valid'},
+    {KEY_FUNC_NAME: 'assert_no_null_value_in_essential_columns'},
+]
+
+
+def write_raw_comp_harm_file(file_path, row_count, rows_per_write=1000000, seed=0):
+    rng = np.random.RandomState(seed)
+    for start in range(0, row_count, rows_per_write):
+        n = min(rows_per_write, row_count - start)
+        pd.DataFrame({
+            'ANO': rng.randint(2018, 2021, n),
+            'MES': rng.randint(1, 13, n),
+            'ANUNCIANTE': rng.choice(ADVERTISERS, n),
+            'MARCA': np.char.add('MARCA ', rng.randint(0, 5000, n).astype(str)),
+            'MEIO': rng.choice(MEDIA, n),
+            'CATEGORIA': rng.choice(CATEGORIES, n),
+            'VEICULO': np.char.add('VEICULO ', rng.randint(0, 800, n).astype(str)),
+            'INVESTIMENTO': np.round(rng.rand(n) * 50000, 2),
+        }).to_csv(file_path, mode='a', header=(start == 0), index=False)
+
+
+def run(input_file, categorical_columns, rows_per_read, trace_memory):
+    config = {
+        PandasFileDataReader.KEY_HEADER: 0,
+        PandasFileDataReader.KEY_ROWS_PER_READ: rows_per_read,
+        PandasFileDataReader.KEY_STREAM_INPUT: True,
+        KEY_FUNCTIONS_TO_APPLY: FUNCTIONS_TO_APPLY,
+        KEY_CATEGORICAL_COLUMNS: categorical_columns,
+    }
+    transform_funcs = LatamBrazilTransformFunctions(config)
+    pipeline = TransformPipeline(config, transform_funcs)
+    reader = FileDataReader(input_file, config).get_data_reader()
+
+    if trace_memory:
+        tracemalloc.start()
+    chunk_bytes, row_count, chunk_digests, category_col_names = [], 0, [], set()
+    # Only reading and transforming the chunks is timed
+    secs = 0.0
+    start = time.perf_counter()
+    df = reader.read_next_dataframe()
+    while not df.empty:
+        df = pipeline.apply(df)
+        secs += time.perf_counter() - start
+        chunk_bytes.append(int(df.memory_usage(deep=True).sum()))
+        row_count += df.shape[0]
+        chunk_digests.append(get_digest(df))
+        category_col_names.update(c for c in df.columns if category_dtype.is_category(df[c]))
+        start = time.perf_counter()
+        df = reader.read_next_dataframe()
+    secs += time.perf_counter() - start
+
+    peak_bytes = None
+    if trace_memory:
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return chunk_digests, category_col_names, row_count, secs, max(chunk_bytes), peak_bytes
+
+
+def to_object_columns(df):
+    """Converts category columns back to object columns to compare the results."""
+    return pd.DataFrame({c: df[c].astype(object) if category_dtype.is_category(df[c]) else df[c]
+                         for c in df.columns})
+
+
+def get_digest(df):
+    """
+    Returns the column names, dtypes (with category columns as object
+    columns) and the hash of each row of the transformed chunk, so that
+    we can compare all the chunks of both modes without keeping them.
+    """
+    df = to_object_columns(df)
+    return (list(df.columns), [str(t) for t in df.dtypes],
+            pd.util.hash_pandas_object(df, index=True).values)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--rows_per_read', type=int, default=PandasFileDataReader.DEFAULT_ROWS_PER_READ)
+    parser.add_argument('--trace_memory', action='store_true',
+                        help='Also measure the peak memory allocated (slower)')
+    args = parser.parse_args()
+
+    # Readers log every chunk they read
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, 'raw_brazil_investment.csv')
+        start = time.perf_counter()
+        write_raw_comp_harm_file(input_file, args.rows)
+        print(f"Wrote {args.rows} rows ({os.path.getsize(input_file) / 2 ** 20:.0f} MB) "
+              f"in {time.perf_counter() - start:.1f} seconds\n")
+
+        print(f"{'MODE':<22} {'SECS':>8} {'ROWS/SEC':>10} {'CHUNK MB':>9} {'PEAK MB':>8}")
+        results = {}
+        for label, categorical_columns in [('object (default)', None),
+                                           ('categorical: auto', CATEGORICAL_COLUMNS_AUTO)]:
+            chunk_digests, category_col_names, row_count, secs, chunk_bytes, peak_bytes = run(
+                input_file, categorical_columns, args.rows_per_read, args.trace_memory)
+            results[label] = chunk_digests
+            peak = f"{peak_bytes / 2 ** 20:>8.0f}" if peak_bytes else f"{'-':>8}"
+            print(f"{label:<22} {secs:>8.1f} {row_count / secs:>10.0f} "
+                  f"{chunk_bytes / 2 ** 20:>9.1f} {peak}")
+
+        object_digests, category_digests = results.values()
+        assert len(object_digests) == len(category_digests), 'Different number of chunks'
+        for i, (object_digest, category_digest) in enumerate(zip(object_digests, category_digests)):
+            assert object_digest[:2] == category_digest[:2], f"Different columns or dtypes in chunk {i}"
+            assert np.array_equal(object_digest[2], category_digest[2]), f"Different rows in chunk {i}"
+        print(f"\nSame data in all {len(object_digests)} chunks. "
+              f"Category columns: {sorted(category_col_names)}")
@@ -0,0 +1,89 @@
+"""
+Compares the size of the output file written by each file data
+writer (CSV, Excel, Parquet and Feather) and the time it takes
+to read it back, chunk by chunk, through FileDataReader like a
+later step or QA config would. Also checks that Parquet and
+Feather files give back exactly the same data.
+
+Run it from the data_transformer folder like below:
+>> python -m benchmarks.columnar_file_benchmark --rows 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.mssql_data_writer_benchmark import make_comp_harm_like_dataframe
+from data_readers.arrow_file_data_reader import ArrowFileDataReader
+from data_readers.file_data_reader import FileDataReader
+from data_readers.pandas_csv_data_reader import PandasCSVDataReader
+from data_readers.pandas_file_data_reader import PandasFileDataReader
+from data_writers.arrow_file_data_writer import ArrowFileDataWriter
+from data_writers.csv_data_writer import CSVDataWriter
+from data_writers.excel_data_writer import ExcelDataWriter
+from data_writers.feather_data_writer import FeatherDataWriter
+from data_writers.parquet_data_writer import ParquetDataWriter
+
+
+def read_all(input_file, config):
+    reader = FileDataReader(input_file, config).get_data_reader()
+    dfs = []
+    cur_df = reader.read_next_dataframe()
+    while not cur_df.empty:
+        dfs.append(cur_df)
+        cur_df = reader.read_next_dataframe()
+    return pd.concat(dfs, ignore_index=True)
+
+
+def run(writer_kls, df, config, out_file):
+    start = time.perf_counter()
+    writer_kls(config).write_data(df, out_file)
+    write_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    read_df = read_all(out_file, config)
+    read_secs = time.perf_counter() - start
+
+    assert read_df.shape == df.shape, f"{out_file}: {read_df.shape} != {df.shape}"
+    if issubclass(writer_kls, ArrowFileDataWriter):
+        pd.testing.assert_frame_equal(read_df, df)
+    return write_secs, read_secs, os.path.getsize(out_file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--rows_per_read', type=int, default=50000)
+    parser.add_argument('--skip_excel', action='store_true')
+    args = parser.parse_args()
+
+    df = make_comp_harm_like_dataframe(args.rows)
+    config = {
+        PandasFileDataReader.KEY_HEADER: 0,
+        PandasFileDataReader.KEY_ROWS_PER_READ: args.rows_per_read,
+        PandasFileDataReader.KEY_STREAM_INPUT: True,
+        PandasCSVDataReader.KEY_INPUT_CSV_DELIMITER: CSVDataWriter.DEFAULT_OUTPUT_DELIMITER,
+        ArrowFileDataWriter.KEY_OUTPUT_ROWS_PER_GROUP: args.rows_per_read,
+    }
+    projected_config = dict(config, **{
+        ArrowFileDataReader.KEY_INPUT_COLUMNS: ['HARMONIZED_COUNTRY', 'HARMONIZED_GROSS_SPEND']})
+
+    runs = [('csv', CSVDataWriter), ('excel', ExcelDataWriter),
+            ('parquet', ParquetDataWriter), ('feather', FeatherDataWriter)]
+    if args.skip_excel:
+        runs = [r for r in runs if r[0] != 'excel']
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'FORMAT':<10} {'WRITE SECS':>10} {'READ SECS':>10} {'MB':>8}")
+        for label, writer_kls in runs:
+            out_file = os.path.join(tmp_dir, label + writer_kls.OUTPUT_FILE_EXTENSION)
+            write_secs, read_secs, size = run(writer_kls, df, config, out_file)
+            print(f"{label:<10} {write_secs:>10.2f} {read_secs:>10.2f} {size / 2 ** 20:>8.1f}")
+
+            if issubclass(writer_kls, ArrowFileDataWriter):
+                # Reading back only the columns a QA check needs
+                start = time.perf_counter()
+                read_all(out_file, projected_config)
+                print(f"{label + ' (2 cols)':<10} {'':>10} {time.perf_counter() - start:>10.2f}")
@@ -0,0 +1,204 @@
+"""
+Checks that the vectorized versions of the functions below in
+CommonTransformFunctions give exactly the same values (or raise
+the same errors) as the row-wise versions they replaced, on
+randomized inputs, and compares how long each version takes:
+- join_str_values_in_several_columns_to_create_a_new_column
+- capitalize_first_letter_of_each_word_in_columns
+- capitalize_all_letters_of_each_word_in_columns
+- convert_date_column_to_a_different_format
+- update_int_values_in_columns_to_str_values
+
+Run it from the data_transformer folder like below:
+>> python -m benchmarks.common_transform_functions_benchmark --rows 200000 --seeds 20
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from transform_functions.common_transform_functions import CommonTransformFunctions
+
+WORDS = ['oral care', 'Home Care', 'GDN Video', 'YouTube', 'pet  nutrition', ' leading space',
+         'trailing space ', 'tab\tseparated', 'new\nline', 'élan vital', 'straße', 'ÁRBOL verde',
+         "l'oreal paris", 'x', '', '3m company', 'a-b c_d']
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%d%b%Y', '%Y%m%d', '%B %Y']
+NON_CONFORMING_DATE_STRS = {
+    '%Y-%m-%d': ['2020-01-05 10:30:00', '20200105', '2020-01', '2020', '2020-1-5',
+                 ' 2020-01-05', '2020-01-05T00:00:00', '2020/01/05'],
+    '%Y%m%d': ['2020-01-05', '2020015', '202001', '20200105 00:00'],
+    '%m/%d/%Y': ['1/5/2020', '01/05/20', '2020-01-05', '01/05/2020 10:30'],
+    '%d%b%Y': ['05JAN2020', '5jan2020', '05January2020'],
+    '%Y-%m-%d %H:%M:%S': ['2020-01-05', '2020-01-05 1:2:3', '2020-01-05T10:30:00',
+                          '2020-01-05 10:30:00.5', '2020-01-05 10:30:00+01:00'],
+}
+
+
+# Row-wise versions of the functions as they were implemented before
+def old_join_str_values_in_several_columns_to_create_a_new_column(df, list_of_col_names, new_col_name):
+    df[new_col_name] = df[list_of_col_names].apply(lambda x: ''.join(str(y) for y in x.values), axis=1)
+    return df
+
+
+def old_capitalize_first_letter_of_each_word_in_columns(funcs, df, list_of_col_names):
+    for col_name in list_of_col_names:
+        df[col_name] = df[col_name].apply(lambda s: funcs._cap_sentence(s))
+    return df
+
+
+def old_capitalize_all_letters_of_each_word_in_columns(df, list_of_col_names):
+    for col_name in list_of_col_names:
+        df[col_name] = df[col_name].apply(lambda s: s.upper())
+    return df
+
+
+def old_convert_date_column_to_a_different_format(df, date_col_name, format_str):
+    df.loc[:, date_col_name] = df[date_col_name].apply(
+        lambda x: datetime.datetime.strptime(str(x), format_str))
+    return df
+
+
+def old_update_int_values_in_columns_to_str_values(df, list_of_col_names, list_of_dictionary_of_value_mappings):
+    for i, col in enumerate(list_of_col_names):
+        df[col] = df[col].apply(str)
+        df[col] = df[col].map(list_of_dictionary_of_value_mappings[i]).fillna(df[col])
+    return df
+
+
+def make_phrases(rng, row_count, distinct_count):
+    phrases = np.array([' '.join(rng.choice(WORDS, rng.randint(1, 4)))
+                        for _ in range(distinct_count)], dtype=object)
+    return phrases[rng.randint(0, distinct_count, row_count)]
+
+
+def make_dataframe(rng, row_count):
+    dates = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.randint(0, 2500, row_count), unit='D')
+    mixed = make_phrases(rng, row_count, 50)
+    mixed[rng.rand(row_count) < 0.1] = 7
+    mixed[rng.rand(row_count) < 0.05] = np.nan
+    return pd.DataFrame({
+        'str1': make_phrases(rng, row_count, rng.randint(1, 500)),
+        'str2': make_phrases(rng, row_count, row_count),
+        'int': rng.randint(-5, 2021, row_count),
+        'float': np.round(rng.rand(row_count) * 1000, rng.randint(0, 4)),
+        'bool': rng.rand(row_count) < 0.5,
+        'date': dates,
+        'mixed': mixed,
+    })
+
+
+def make_date_strings(rng, row_count, format_str):
+    dates = pd.Timestamp('1990-01-01') + pd.to_timedelta(rng.randint(0, 15000, 200), unit='D')
+    return pd.Series(dates.strftime(format_str)).values[rng.randint(0, 200, row_count)]
+
+
+def outcome(func, df, *args):
+    """Returns the resulting dataframe or the type and message of the error raised."""
+    try:
+        return func(df.copy(), *args)
+    except Exception as e:
+        return type(e), str(e)
+
+
+def assert_same_outcome(label, old, new):
+    if isinstance(old, tuple) or isinstance(new, tuple):
+        assert isinstance(old, tuple) and isinstance(new, tuple) and (old[0] is new[0]), \
+            f"{label}: {old} != {new}"
+        return
+    pd.testing.assert_frame_equal(new, old, obj=label)
+
+
+def get_cases(funcs, rng, row_count):
+    """Yields (label, old function, new function, dataframe, args) to compare."""
+    df = make_dataframe(rng, row_count)
+    for cols in [['str1', 'str2'], ['str1', 'int', 'float'], ['int', 'float'], ['int'],
+                 ['bool', 'int'], ['date', 'str1'], ['mixed', 'str1', 'bool'], ['float', 'float']]:
+        yield (f"join {cols}",
+               old_join_str_values_in_several_columns_to_create_a_new_column,
+               funcs.join_str_values_in_several_columns_to_create_a_new_column,
+               df, (cols, 'NEW'))
+
+    for cols in [['str1'], ['str1', 'str2'], ['mixed']]:
+        yield (f"capitalize first letters {cols}",
+               lambda df, *args: old_capitalize_first_letter_of_each_word_in_columns(funcs, df, *args),
+               funcs.capitalize_first_letter_of_each_word_in_columns,
+               df, (cols,))
+        yield (f"capitalize all letters {cols}",
+               old_capitalize_all_letters_of_each_word_in_columns,
+               funcs.capitalize_all_letters_of_each_word_in_columns,
+               df, (cols,))
+
+    for format_str in DATE_FORMATS:
+        date_df = pd.DataFrame({'d': make_date_strings(rng, row_count, format_str)})
+        yield (f"convert date '{format_str}'",
+               old_convert_date_column_to_a_different_format,
+               funcs.convert_date_column_to_a_different_format,
+               date_df, ('d', format_str))
+    # Values that should make both versions raise the same error
+    date_df = pd.DataFrame({'d': make_date_strings(rng, row_count, '%Y-%m-%d')})
+    date_df.loc[rng.randint(0, row_count), 'd'] = rng.choice(['nan', 'NaT', '', '2020-13-01'])
+    yield ("convert date with invalid value",
+           old_convert_date_column_to_a_different_format,
+           funcs.convert_date_column_to_a_different_format,
+           date_df, ('d', '%Y-%m-%d'))
+    # Strings that do not match the format exactly: pandas accepts some of
+    # them (e.g., ISO-like strings), strptime accepts some others (e.g., no
+    # zero-padding) and both versions must agree on each of them
+    for format_str, odd_values in NON_CONFORMING_DATE_STRS.items():
+        date_df = pd.DataFrame({'d': make_date_strings(rng, row_count, format_str)})
+        date_df.loc[rng.randint(0, row_count), 'd'] = rng.choice(odd_values)
+        yield (f"convert date '{format_str}' with non-conforming value",
+               old_convert_date_column_to_a_different_format,
+               funcs.convert_date_column_to_a_different_format,
+               date_df, ('d', format_str))
+    yield ("convert date from int column", old_convert_date_column_to_a_different_format,
+           funcs.convert_date_column_to_a_different_format,
+           pd.DataFrame({'d': pd.Series(make_date_strings(rng, row_count, '%Y%m%d')).astype(int)}),
+           ('d', '%Y%m%d'))
+    yield ("convert date from datetime column", old_convert_date_column_to_a_different_format,
+           funcs.convert_date_column_to_a_different_format,
+           df[['date']].rename(columns={'date': 'd'}), ('d', '%Y-%m-%d %H:%M:%S'))
+
+    for cols in [['int'], ['float'], ['mixed'], ['date'], ['int', 'bool']]:
+        mappings = [{'2020': '2020 YTD', '2019': '2019 LE', '7': 'seven', 'True': 'yes',
+                     'nan': 'missing'} for _ in cols]
+        yield (f"update int values {cols}",
+               old_update_int_values_in_columns_to_str_values,
+               funcs.update_int_values_in_columns_to_str_values,
+               df, (cols, mappings))
+
+
+def timed(func, df, *args):
+    df = df.copy()
+    start = time.perf_counter()
+    outcome(func, df, *args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000, help='Rows used for timing')
+    parser.add_argument('--seeds', type=int, default=20, help='Number of randomized parity runs')
+    parser.add_argument('--parity_rows', type=int, default=2000, help='Rows used for parity runs')
+    args = parser.parse_args()
+
+    funcs = CommonTransformFunctions()
+
+    case_count = 0
+    for seed in range(args.seeds):
+        rng = np.random.RandomState(seed)
+        for label, old_func, new_func, df, func_args in get_cases(funcs, rng, args.parity_rows):
+            assert_same_outcome(f"{label} (seed {seed})",
+                                outcome(old_func, df, *func_args),
+                                outcome(new_func, df, *func_args))
+            case_count += 1
+    print(f"Old and new versions gave the same results in {case_count} randomized cases.\n")
+
+    print(f"{'FUNCTION':<58} {'OLD SECS':>9} {'NEW SECS':>9} {'SPEEDUP':>8}")
+    for label, old_func, new_func, df, func_args in get_cases(
+            funcs, np.random.RandomState(0), args.rows):
+        old_secs = timed(old_func, df, *func_args)
+        new_secs = timed(new_func, df, *func_args)
+        print(f"{label:<58} {old_secs:>9.3f} {new_secs:>9.3f} {old_secs / new_secs:>7.1f}x")
@@ -0,0 +1,102 @@
+"""
+Compares the throughput of different insert methods of
+MSSQLDataWriter against a local SQLite database that stands
+in for SQL Server (so that we don't need SQL Server or ODBC
+drivers to run this).
+
+Note: SQLite does not have pyodbc's fast_executemany, so
+'fast_executemany' here measures batched executemany via the
+pooled engine; the gap against SQL Server will be bigger.
+'bulk_insert' is SQL Server specific and not measured here.
+
+Run it from the data_transformer folder like below:
+>> python -m benchmarks.mssql_data_writer_benchmark --rows 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from data_writers.mssql_data_writer import MSSQLDataWriter
+
+
+class SQLiteStandInDataWriter(MSSQLDataWriter):
+    """MSSQLDataWriter that writes to a local SQLite file instead."""
+
+    def _get_sqlalchemy_engine(self):
+        return create_engine(f"sqlite:///{self.database}", echo=False)
+
+
+class OldSQLiteStandInDataWriter(SQLiteStandInDataWriter):
+    """
+    Mimics how MSSQLDataWriter used to write data: a new engine
+    for every chunk and all rows of the chunk in one to_sql call.
+    (It used if_exists='fail', which made every chunk after the
+    first one fail; we append here so that it can be measured.)
+    """
+
+    def write_data(self, df):
+        df.to_sql(name=self.output_sql_table_name,
+                  con=self._get_sqlalchemy_engine(),
+                  schema=self.db_schema,
+                  if_exists=self.APPEND_IF_EXISTS,
+                  index=self.include_index)
+
+
+def make_comp_harm_like_dataframe(row_count, seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'HARMONIZED_YEAR': rng.randint(2015, 2021, row_count),
+        'HARMONIZED_MONTH': rng.randint(1, 13, row_count),
+        'HARMONIZED_REGION': rng.choice(['LATAM', 'EU', 'APAC', 'AED', 'NA'], row_count),
+        'HARMONIZED_COUNTRY': rng.choice(['Brazil', 'Mexico', 'France', 'India'], row_count),
+        'HARMONIZED_ADVERTISER': rng.choice([f"Advertiser {i}" for i in range(300)], row_count),
+        'HARMONIZED_MEDIA_TYPE': rng.choice(['TV', 'Radio', 'Print', 'Digital'], row_count),
+        'HARMONIZED_CATEGORY': rng.choice(['Toothpaste', 'Pet Food', 'Soap'], row_count),
+        'RAW_BRAND': rng.choice([f"Brand {i}" for i in range(2000)], row_count),
+        'HARMONIZED_GROSS_SPEND': np.round(rng.rand(row_count) * 10000, 2),
+    })
+
+
+def run(label, writer_kls, insert_method, df, rows_per_chunk, db_file):
+    config = {
+        MSSQLDataWriter.KEY_DATABASE_SCHEMA: 'main',
+        MSSQLDataWriter.KEY_OUTPUT_TABLE_NAME: f"benchmark_{label}",
+        MSSQLDataWriter.KEY_INSERT_METHOD: insert_method,
+    }
+    sql_server_info = {'driver': 'SQLite', 'server': 'localhost', 'port': '',
+                       'database': db_file, 'user_id': '', 'password': ''}
+    writer = writer_kls(config, sql_server_info=sql_server_info)
+
+    start = time.perf_counter()
+    for i in range(0, df.shape[0], rows_per_chunk):
+        writer.write_data(df.iloc[i:i + rows_per_chunk])
+    secs = time.perf_counter() - start
+
+    row_count = pd.read_sql(f"SELECT COUNT(*) AS c FROM benchmark_{label}",
+                            writer.engine)['c'][0]
+    assert row_count == df.shape[0], f"{label}: {row_count} != {df.shape[0]} rows"
+    return secs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--rows_per_chunk', type=int, default=25000)
+    args = parser.parse_args()
+
+    df = make_comp_harm_like_dataframe(args.rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'benchmark.db')
+        print(f"{'METHOD':<20} {'SECONDS':>8} {'ROWS/SEC':>10}")
+        for label, kls, insert_method in [
+            ('old', OldSQLiteStandInDataWriter, MSSQLDataWriter.INSERT_METHOD_FAST_EXECUTEMANY),
+            ('fast_executemany', SQLiteStandInDataWriter, MSSQLDataWriter.INSERT_METHOD_FAST_EXECUTEMANY),
+            ('multi', SQLiteStandInDataWriter, MSSQLDataWriter.INSERT_METHOD_MULTI_VALUES),
+        ]:
+            secs = run(label, kls, insert_method, df, args.rows_per_chunk, db_file)
+            print(f"{label:<20} {secs:>8.2f} {args.rows / secs:>10,.0f}")
@@ -0,0 +1,166 @@
+"""
+Checks that the vectorized QA checks below in CommonCompHarmQAFunctions
+pass or raise the same errors as the versions they replaced, on
+randomized inputs, and compares how long each version takes on a
+chunk of comp. harm. like data:
+- assert_if_year_values_are_within_valid_range
+- assert_if_month_values_are_within_valid_range
+- assert_float_values_in_columns_have_either_one_or_two_decimals
+- check_possible_duplicates_in_columns
+
+Run it from the data_transformer folder like below:
+>> python -m benchmarks.qa_functions_benchmark --rows 1000000 --seeds 50
+"""
+import argparse
+import datetime
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.mssql_data_writer_benchmark import make_comp_harm_like_dataframe
+from constants import comp_harm_constants
+from qa_functions import qa_errors
+from qa_functions.common_comp_harm_qa_functions import CommonCompHarmQAFunctions
+
+
+# Versions of the QA checks as they were implemented before
+def old_assert_if_year_values_are_within_valid_range(qa_funcs, df):
+    years = sorted(df[comp_harm_constants.YEAR_COLUMN].unique())
+    cur_year = datetime.datetime.now().year
+    if not all([(y >= qa_funcs.MIN_YEAR) and (y <= cur_year) for y in years]):
+        raise qa_errors.InvalidValueFoundError(f"{years}")
+    return df
+
+
+def old_assert_if_month_values_are_within_valid_range(qa_funcs, df):
+    months = sorted(df[comp_harm_constants.MONTH_COLUMN].unique())
+    if not all([(y >= qa_funcs.MIN_MONTH) and (y <= qa_funcs.MAX_MONTH) for y in months]):
+        raise qa_errors.InvalidValueFoundError(f"{months}")
+    return df
+
+
+def old_assert_float_values_in_columns_have_either_one_or_two_decimals(qa_funcs, df, list_of_col_names):
+    for col_name in list_of_col_names:
+        df1 = df[col_name].astype(str) \
+            .map(lambda x: [x, '0'] if len(x.split('.')) == 1 else x.split('.'))
+        if any([len(x) > 2 for x in df1.values]):
+            raise qa_errors.InvalidValueFoundError("more than two decimal characters")
+        if any([len(x[1]) > 2 for x in df1.values]):
+            raise qa_errors.InvalidValueFoundError("more than two decimal digits")
+    return df
+
+
+def old_check_possible_duplicates_in_columns(qa_funcs, df, list_of_col_names):
+    non_alpha_numerical_chars_pattern = re.compile(r'\W', re.UNICODE)
+    for col_name in list_of_col_names:
+        orig_values = set(df[col_name].values)
+        simplified_values = {non_alpha_numerical_chars_pattern.sub('', s).lower()
+                             for s in orig_values}
+        if len(orig_values) != len(simplified_values):
+            raise qa_errors.PossibleDuplicateError(str(sorted(orig_values)))
+    return df
+
+
+def make_spend_values(rng, row_count):
+    """Two-decimal spend values mixed with the edge cases of the decimal check."""
+    values = np.round(rng.rand(row_count) * 10 ** rng.randint(1, 12), 2)
+    edge_values = np.array([0.1 + 0.2, 4.321, 1e-05, 1.5e-07, 0.0001, 0.001, -0.01, -0.0,
+                            1e16, 1.2e16, 12345678901234.56, 45035996273704.96, 2.0 ** 60,
+                            np.nan, np.inf, -np.inf, 1e308, 99.995, 0.07, 1.005])
+    edge_count = rng.randint(0, 3)
+    values[rng.randint(0, row_count, edge_count)] = rng.choice(edge_values, edge_count)
+    return values
+
+
+def make_names(rng, row_count):
+    names = [f"Advertiser {i}" for i in range(rng.randint(1, 300))]
+    if rng.rand() < 0.5:
+        # A possible duplicate of an existing name
+        names.append(rng.choice(['advertiser 0', 'ADVERTISER-0', 'Advertiser  0', 'Advertisér 0']))
+    return rng.choice(names, row_count).astype(object)
+
+
+def get_cases(rng, row_count):
+    """Yields (label, old function name, dataframe, args) to compare."""
+    df = pd.DataFrame({
+        comp_harm_constants.YEAR_COLUMN: rng.randint(2013 + rng.randint(0, 3), 2021, row_count),
+        comp_harm_constants.MONTH_COLUMN: rng.randint(rng.randint(0, 2), 13 + rng.randint(0, 2), row_count),
+        comp_harm_constants.GROSS_SPEND_COLUMN: make_spend_values(rng, row_count),
+        comp_harm_constants.ADVERTISER_COLUMN: make_names(rng, row_count),
+    })
+    yield 'year range', 'assert_if_year_values_are_within_valid_range', df, ()
+    yield 'month range', 'assert_if_month_values_are_within_valid_range', df, ()
+
+    float_df = df[[comp_harm_constants.YEAR_COLUMN]].astype(float)
+    float_df.iloc[rng.randint(0, row_count)] = np.nan if rng.rand() < 0.3 else 2019.0
+    yield 'year range (float)', 'assert_if_year_values_are_within_valid_range', float_df, ()
+
+    spend_cols = [comp_harm_constants.GROSS_SPEND_COLUMN]
+    yield 'decimals (float)', 'assert_float_values_in_columns_have_either_one_or_two_decimals', \
+        df, (spend_cols,)
+    yield 'decimals (int)', 'assert_float_values_in_columns_have_either_one_or_two_decimals', \
+        df, ([comp_harm_constants.YEAR_COLUMN],)
+    str_df = df[spend_cols].astype(str)
+    str_df.iloc[rng.randint(0, row_count)] = rng.choice(['4.32.1', '12.5', '7', '3.141'])
+    yield 'decimals (str)', 'assert_float_values_in_columns_have_either_one_or_two_decimals', \
+        str_df, (spend_cols,)
+
+    yield 'possible duplicates', 'check_possible_duplicates_in_columns', \
+        df, ([comp_harm_constants.ADVERTISER_COLUMN],)
+    mixed_df = df[[comp_harm_constants.ADVERTISER_COLUMN]].copy()
+    if rng.rand() < 0.5:
+        mixed_df.iloc[rng.randint(0, row_count)] = rng.choice([np.nan, 7])
+    yield 'possible duplicates (mixed)', 'check_possible_duplicates_in_columns', \
+        mixed_df, ([comp_harm_constants.ADVERTISER_COLUMN],)
+
+
+def outcome(func, df, *args):
+    """Returns 'passed' or the type of the error raised."""
+    try:
+        func(df, *args)
+        return 'passed'
+    except Exception as e:
+        return type(e)
+
+
+def timed(func, df, *args):
+    start = time.perf_counter()
+    outcome(func, df, *args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Rows used for timing')
+    parser.add_argument('--seeds', type=int, default=50, help='Number of randomized parity runs')
+    parser.add_argument('--parity_rows', type=int, default=5000, help='Rows used for parity runs')
+    args = parser.parse_args()
+
+    qa_funcs = CommonCompHarmQAFunctions({})
+    old_funcs = globals()
+
+    outcome_counts = {}
+    for seed in range(args.seeds):
+        for label, func_name, df, func_args in get_cases(np.random.RandomState(seed), args.parity_rows):
+            old = outcome(lambda *a: old_funcs['old_' + func_name](qa_funcs, *a), df, *func_args)
+            new = outcome(getattr(qa_funcs, func_name), df, *func_args)
+            assert old == new, f"{label} (seed {seed}): {old} != {new}"
+            outcome_counts[old] = outcome_counts.get(old, 0) + 1
+    print(f"Old and new versions gave the same outcome in {sum(outcome_counts.values())} "
+          f"randomized cases: {outcome_counts}\n")
+
+    # Timed on valid data so that every check goes through all the values
+    df = make_comp_harm_like_dataframe(args.rows)
+    cases = [('year range', 'assert_if_year_values_are_within_valid_range', ()),
+             ('month range', 'assert_if_month_values_are_within_valid_range', ()),
+             ('decimals', 'assert_float_values_in_columns_have_either_one_or_two_decimals',
+              ([comp_harm_constants.GROSS_SPEND_COLUMN],)),
+             ('possible duplicates', 'check_possible_duplicates_in_columns',
+              ([comp_harm_constants.ADVERTISER_COLUMN],))]
+    print(f"{'QA CHECK':<22} {'OLD SECS':>9} {'NEW SECS':>9} {'SPEEDUP':>8}")
+    for label, func_name, func_args in cases:
+        old_secs = timed(lambda *a: old_funcs['old_' + func_name](qa_funcs, *a), df, *func_args)
+        new_secs = timed(getattr(qa_funcs, func_name), df, *func_args)
+        print(f"{label:<22} {old_secs:>9.3f} {new_secs:>9.3f} {old_secs / new_secs:>7.1f}x")
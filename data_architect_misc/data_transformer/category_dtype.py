@@ -0,0 +1,168 @@
+"""
+Helpers for the (opt-in) 'categorical_columns' mode of transform.py,
+in which low-cardinality string columns like HARMONIZED_REGION,
+HARMONIZED_COUNTRY, HARMONIZED_MEDIA_TYPE and HARMONIZED_CURRENCY are
+held as pandas' category dtype instead of Python string objects.
+
+A category column stores each distinct value only once (its categories)
+and a small integer code for each row, so a column with a handful of
+distinct values in 100,000 rows takes ~100KB instead of several MBs.
+Functions below work on the distinct values of a category column and
+broadcast the results back to the rows via the codes (and work as usual
+on the other columns), so transform functions that update string values
+should use them instead of assigning values to the column directly.
+REF: https://pandas.pydata.org/pandas-docs/stable/user_guide/categorical.html
+
+Usage example:
+>> df = convert_to_category_columns(df, max_unique_ratio=0.1)
+>> df['HARMONIZED_REGION'] = fixed_value_column('LATAM', df.index)
+>> df['Brand'] = apply_to_distinct_values(df['Brand'], lambda s: s.str.upper())
+"""
+import numpy as np
+import pandas as pd
+
+from constants.transform_constants import CATEGORICAL_COLUMNS_AUTO_PREFIX, \
+    CATEGORICAL_COLUMNS_AUTO_OTHER_COLUMNS
+
+
+def is_category(series):
+    """Checks if the series is of pandas' category dtype."""
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def is_category_column(col_name, categorical_columns, auto_value):
+    """
+    Checks if the column must be held as category dtype, given the
+    value of 'categorical_columns' in the config, which is either
+    a list of column names or auto_value (meaning the columns that
+    is_auto_category_column accepts, if they have few distinct values).
+    """
+    if categorical_columns == auto_value:
+        return is_auto_category_column(col_name)
+    return isinstance(categorical_columns, list) and (col_name in categorical_columns)
+
+
+def is_auto_category_column(col_name):
+    """
+    Checks if the column may be held as category dtype in the 'auto'
+    mode, i.e., if it's one of the HARMONIZED_* or brand columns that
+    common transform functions add and update.
+    """
+    return isinstance(col_name, str) and (
+        col_name.startswith(CATEGORICAL_COLUMNS_AUTO_PREFIX)
+        or (col_name in CATEGORICAL_COLUMNS_AUTO_OTHER_COLUMNS))
+
+
+def _from_codes(codes, categories, series):
+    """Creates a category series with the index and name of the series."""
+    return pd.Series(pd.Categorical.from_codes(codes, categories),
+                     index=series.index, name=series.name)
+
+
+def to_category(series, max_unique_ratio=None):
+    """
+    Converts the series to category dtype by factorizing it once.
+    If max_unique_ratio is given and the series has more distinct
+    values than that fraction of its rows, the series is returned
+    as it is because the categories would save little (if any) memory.
+    Missing values (NaN/None) become missing values of the category.
+    """
+    if is_category(series):
+        return series
+
+    codes, uniques = pd.factorize(series)
+    if (max_unique_ratio is not None) and (len(uniques) > max_unique_ratio * len(series)):
+        return series
+    return _from_codes(codes, uniques, series)
+
+
+def convert_to_category_columns(df, list_of_col_names=None, max_unique_ratio=None):
+    """
+    Converts the string (object dtype) columns in list_of_col_names
+    to category dtype. If list_of_col_names is None, all string columns
+    with distinct values no more than max_unique_ratio of the rows are
+    converted. Columns not (yet) in the dataframe are ignored.
+    """
+    if list_of_col_names is None:
+        list_of_col_names = df.columns
+
+    for col_name in list_of_col_names:
+        if (col_name in df.columns) and (df[col_name].dtype == object):
+            df[col_name] = to_category(df[col_name], max_unique_ratio)
+
+    return df
+
+
+def fixed_value_column(value, index):
+    """
+    Returns a category series with the same value in every row
+    of the index, which only takes one byte per row.
+    """
+    return pd.Series(pd.Categorical.from_codes(np.zeros(len(index), dtype=np.int8),
+                                               [value]),
+                     index=index)
+
+
+def apply_to_distinct_values(series, func):
+    """
+    Returns func(series) if the series is not of category dtype.
+    Otherwise, func is applied to the series of the categories
+    (i.e., the distinct values only) and the results are broadcast
+    back to the rows, which keeps the series as category dtype.
+
+    func must take a series and return a series of new values
+    of the same length, e.g., lambda s: s.map(mappings).fillna(s)
+    """
+    if not is_category(series):
+        return func(series)
+
+    categories = series.cat.categories
+    if not len(categories):
+        return series.copy()
+
+    new_codes, new_categories = pd.factorize(func(pd.Series(np.asarray(categories))))
+    codes = series.cat.codes.values
+    return _from_codes(np.where(codes == -1, -1, new_codes[codes]), new_categories, series)
+
+
+def _add_categories_if_missing(series, values):
+    """Adds the values (excluding NaN) that are not yet categories of the series."""
+    categories = series.cat.categories
+    missing_values = [v for v in pd.unique(values) if pd.notna(v) and (v not in categories)]
+    if missing_values:
+        return series.cat.add_categories(missing_values)
+    return series
+
+
+def set_values(df, mask, col_name, values):
+    """
+    Same as df.loc[mask, col_name] = values, where values is either
+    a scalar or a series with the same index as df, but it also works
+    for columns of category dtype by adding new values to the categories
+    first (pandas refuses to set values that are not in the categories).
+    """
+    if is_category(df[col_name]):
+        if isinstance(values, pd.Series):
+            # Setting values from a category series with different
+            # categories is also refused, so we set them as objects
+            values = values[mask].astype(object)
+            df[col_name] = _add_categories_if_missing(df[col_name], values.values)
+        else:
+            df[col_name] = _add_categories_if_missing(df[col_name], [values])
+
+    df.loc[mask, col_name] = values
+    return df
+
+
+def fill_na(series, value):
+    """
+    Same as series.fillna(value), but it also works for series
+    of category dtype when the value is not one of the categories.
+    """
+    # pandas refuses to fill a category series with a value that is
+    # not one of its categories, even if there is nothing to fill
+    if is_category(series):
+        if not series.hasnans:
+            return series
+        series = _add_categories_if_missing(series, [value])
+    return series.fillna(value)
@@ -15,10 +15,12 @@ import os
 from data_readers.pandas_file_data_reader import PandasFileDataReader
 from data_readers.pandas_excel_data_reader import PandasExcelDataReader
 from data_readers.pandas_csv_data_reader import PandasCSVDataReader
+from data_readers.arrow_file_data_reader import ArrowFileDataReader
 from data_writers.file_data_writer import FileDataWriter
 from data_writers.excel_data_writer import ExcelDataWriter
 from data_writers.csv_data_writer import CSVDataWriter
 from data_writers.mssql_data_writer import MSSQLDataWriter
+from data_writers.arrow_file_data_writer import ArrowFileDataWriter
 
 # transform.py and transform_utils.py will allow
 # processing of more than one input files. Then we feed
@@ -42,10 +44,38 @@ KEY_FUNC_NAME = 'function_name'
 KEY_FUNC_ARGS = 'function_args'
 KEY_FUNC_KWARGS = 'function_kwargs'
 
+# Whether to check that every transform function returns pandas
+# dataframe. By default, this is on unless Python is run in
+# optimized mode (i.e., python -O transform.py), in which case,
+# __debug__ is False.
+KEY_CHECK_RETURN_VALUE_TYPE = 'check_return_value_type'
+DEFAULT_CHECK_RETURN_VALUE_TYPE = __debug__
+
+# Columns to hold as pandas' category dtype (see category_dtype.py)
+# while the functions are applied to each dataframe read. It is either
+# a list of column names or 'auto', in which case the HARMONIZED_* and
+# brand columns (that common transform functions add and update) whose
+# distinct values are no more than 'max_categorical_unique_ratio' of the
+# rows (e.g., region, country, media type and currency) are converted,
+# as are those added with fixed string values. Other (raw) columns are
+# left as they are in 'auto' mode because country specific functions
+# may assign new values to them (e.g., df.fillna("")), which category
+# columns do not allow unless the values are in their categories.
+# By default (None), no column is converted.
+KEY_CATEGORICAL_COLUMNS = 'categorical_columns'
+DEFAULT_CATEGORICAL_COLUMNS = None
+CATEGORICAL_COLUMNS_AUTO = 'auto'
+CATEGORICAL_COLUMNS_AUTO_PREFIX = 'HARMONIZED_'
+CATEGORICAL_COLUMNS_AUTO_OTHER_COLUMNS = ['RAW_BRAND', 'RAW_SUBBRAND']
+KEY_MAX_CATEGORICAL_UNIQUE_RATIO = 'max_categorical_unique_ratio'
+DEFAULT_MAX_CATEGORICAL_UNIQUE_RATIO = 0.1
+
 # Keys in config file are required
 REQUIRED_KEYS = [KEY_INPUT_FOLDER_PATH,
                  KEY_INPUT_FILE_NAME_OR_PATTERN,
                  KEY_FUNCTIONS_TO_APPLY]
+INPUT_FILE_KEYS = [KEY_INPUT_FOLDER_PATH,
+                   KEY_INPUT_FILE_NAME_OR_PATTERN]
 
 # Keys in config file and their expected data types
 # Note: In the future, we may want to allow some of
@@ -59,6 +89,9 @@ EXPECTED_CONFIG_VALUE_DATA_TYPES = {
     KEY_DATA_WRITER_MODULE_FILE: [str],
     KEY_CUSTOM_TRANSFORM_FUNCTIONS_FILE: [str],
     KEY_FUNCTIONS_TO_APPLY: [list],
+    KEY_CHECK_RETURN_VALUE_TYPE: [bool],
+    KEY_CATEGORICAL_COLUMNS: [list, str, type(None)],
+    KEY_MAX_CATEGORICAL_UNIQUE_RATIO: [float, int],
 
     # Data reader modules' constants
     PandasFileDataReader.KEY_ROWS_PER_READ: [int],
@@ -66,10 +99,13 @@ EXPECTED_CONFIG_VALUE_DATA_TYPES = {
     PandasFileDataReader.KEY_HEADER: [int],
     PandasFileDataReader.KEY_SKIP_ROWS: [int],
     PandasFileDataReader.KEY_SKIP_FOOTER: [int],
+    PandasFileDataReader.KEY_STREAM_INPUT: [bool],
     PandasExcelDataReader.KEY_SHEET_NAME: [str, int, type(None)],
     PandasCSVDataReader.KEY_INPUT_CSV_DELIMITER: [str],
     PandasCSVDataReader.KEY_INPUT_FILE_ENCODING: [str],
     PandasCSVDataReader.KEY_SKIP_BLANK_LINES: [bool],
+    ArrowFileDataReader.KEY_INPUT_COLUMNS: [list, type(None)],
+    ArrowFileDataReader.KEY_READ_STRINGS_AS_CATEGORIES: [bool],
 
     # Data writer modules' constants
     FileDataWriter.KEY_INCLUDE_INDEX_COLUMN_IN_OUTPUT_FILE: [bool],
@@ -82,6 +118,13 @@ EXPECTED_CONFIG_VALUE_DATA_TYPES = {
     MSSQLDataWriter.KEY_DATABASE_SCHEMA: [str],
     MSSQLDataWriter.KEY_OUTPUT_TABLE_NAME: [str],
     MSSQLDataWriter.KEY_INCLUDE_INDEX_COLUMN_IN_OUTPUT_FILE: [bool],
+    MSSQLDataWriter.KEY_INSERT_METHOD: [str],
+    MSSQLDataWriter.KEY_ROWS_PER_BATCH: [int],
+    MSSQLDataWriter.KEY_BULK_INSERT_STAGING_FOLDER: [str],
+    MSSQLDataWriter.KEY_BULK_INSERT_SERVER_FOLDER: [str],
+    ArrowFileDataWriter.KEY_OUTPUT_ROWS_PER_GROUP: [int],
+    ArrowFileDataWriter.KEY_DICTIONARY_ENCODE_STRINGS: [bool],
+    ArrowFileDataWriter.KEY_OUTPUT_COMPRESSION: [str, type(None)],
 }
 
 # The lists below are not used; I decided to group them together
@@ -93,12 +136,16 @@ READER_CONSTANTS = [
     PandasFileDataReader.KEY_HEADER,
     PandasFileDataReader.KEY_SKIP_ROWS,
     PandasFileDataReader.KEY_SKIP_FOOTER,
+    PandasFileDataReader.KEY_STREAM_INPUT,
 
     PandasExcelDataReader.KEY_SHEET_NAME,
 
     PandasCSVDataReader.KEY_INPUT_CSV_DELIMITER,
     PandasCSVDataReader.KEY_INPUT_FILE_ENCODING,
-    PandasCSVDataReader.KEY_SKIP_BLANK_LINES
+    PandasCSVDataReader.KEY_SKIP_BLANK_LINES,
+
+    ArrowFileDataReader.KEY_INPUT_COLUMNS,
+    ArrowFileDataReader.KEY_READ_STRINGS_AS_CATEGORIES
 ]
 
 WRITER_CONSTANTS = [
@@ -114,7 +161,15 @@ WRITER_CONSTANTS = [
 
     MSSQLDataWriter.KEY_DATABASE_SCHEMA,
     MSSQLDataWriter.KEY_OUTPUT_TABLE_NAME,
-    MSSQLDataWriter.KEY_INCLUDE_INDEX_COLUMN_IN_OUTPUT_FILE
+    MSSQLDataWriter.KEY_INCLUDE_INDEX_COLUMN_IN_OUTPUT_FILE,
+    MSSQLDataWriter.KEY_INSERT_METHOD,
+    MSSQLDataWriter.KEY_ROWS_PER_BATCH,
+    MSSQLDataWriter.KEY_BULK_INSERT_STAGING_FOLDER,
+    MSSQLDataWriter.KEY_BULK_INSERT_SERVER_FOLDER,
+
+    ArrowFileDataWriter.KEY_OUTPUT_ROWS_PER_GROUP,
+    ArrowFileDataWriter.KEY_DICTIONARY_ENCODE_STRINGS,
+    ArrowFileDataWriter.KEY_OUTPUT_COMPRESSION
 ]
 
 # These constants below are used in transform.py
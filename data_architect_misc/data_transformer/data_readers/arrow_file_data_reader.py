@@ -0,0 +1,126 @@
+import logging
+
+import pandas as pd
+
+from data_readers.pandas_file_data_reader import PandasFileDataReader
+
+
+class ArrowFileDataReader(PandasFileDataReader):
+    """
+    This class is used as parent class of the data readers for
+    columnar files (ParquetDataReader and FeatherDataReader),
+    which read the file as a stream of Arrow record batches.
+
+    Columnar files have the column names and types in them,
+    so 'header', 'skiprows' and 'skipfooter' in the config
+    are not used. Each dataframe returned by read_next_dataframe
+    has 'rows_per_read' rows (except the last one), no matter
+    how many rows are in each row group (or record batch) of
+    the file. Files written by ParquetDataWriter and
+    FeatherDataWriter have row groups of 'output_rows_per_group'
+    rows, which makes each read one or a few row groups.
+
+    Only the columns listed in 'input_columns' (if given) are
+    read from the file. String columns that are dictionary-encoded
+    in the file are turned into plain string columns, unless
+    'read_strings_as_categories' is set, in which case they
+    become pandas' category columns (without decoding them).
+
+    Note: pyarrow is imported only where we use it so that
+    transform_constants.py can import this class (for its
+    config keys) without pyarrow being installed.
+    """
+    KEY_INPUT_COLUMNS = 'input_columns'
+    DEFAULT_INPUT_COLUMNS = None
+
+    KEY_READ_STRINGS_AS_CATEGORIES = 'read_strings_as_categories'
+    DEFAULT_READ_STRINGS_AS_CATEGORIES = False
+
+    def __init__(self, input_file_path_and_name, config):
+        super().__init__(config)
+        self.logger = logging.getLogger(__name__)
+        self.input_file = input_file_path_and_name
+        self.input_columns = config.get(self.KEY_INPUT_COLUMNS,
+                                        self.DEFAULT_INPUT_COLUMNS)
+        self.read_strings_as_categories = config.get(
+            self.KEY_READ_STRINGS_AS_CATEGORIES,
+            self.DEFAULT_READ_STRINGS_AS_CATEGORIES)
+
+        self.headers = self.read_header_row()
+        self.read_iter_count = 0
+        self.rows_read = 0
+        self.record_batches = self._iter_record_batches()
+        # Rows of the last record batch that did not fit in the previous read
+        self.left_over_batch = None
+
+    def _get_schema(self):
+        """
+        Returns the Arrow schema of the file.
+        This method must be implemented by child classes.
+        """
+        raise NotImplementedError
+
+    def _iter_record_batches(self):
+        """
+        Yields the record batches of the file with only the
+        columns in self.headers. This method must be implemented
+        by child classes.
+        """
+        raise NotImplementedError
+
+    def read_header_row(self):
+        """Returns the names of the columns to read."""
+        column_names = self._get_schema().names
+        if self.input_columns is None:
+            return column_names
+
+        missing_columns = [c for c in self.input_columns if c not in column_names]
+        if missing_columns:
+            raise ValueError(f"These columns in '{self.KEY_INPUT_COLUMNS}' are "
+                             f"NOT found in the input file: {missing_columns}")
+        return self.input_columns
+
+    def _to_dataframe(self, batches):
+        """Converts the record batches into one dataframe."""
+        import pyarrow as pa
+
+        table = pa.Table.from_batches(batches)
+        columns = table.columns
+        if not self.read_strings_as_categories:
+            columns = [c.cast(c.type.value_type) if pa.types.is_dictionary(c.type) else c
+                       for c in columns]
+
+        # Rebuilding the table also drops the pandas metadata
+        # (e.g., 'category' dtypes) saved with the file
+        return pa.Table.from_arrays(columns, names=table.column_names).to_pandas()
+
+    def read_next_dataframe(self):
+        batches, row_count = [], 0
+        while row_count < self.rows_per_read:
+            if self.left_over_batch is not None:
+                batch, self.left_over_batch = self.left_over_batch, None
+            else:
+                batch = next(self.record_batches, None)
+            if batch is None:
+                break
+
+            rows_wanted = self.rows_per_read - row_count
+            if batch.num_rows > rows_wanted:
+                self.left_over_batch = batch.slice(rows_wanted)
+                batch = batch.slice(0, rows_wanted)
+            batches.append(batch)
+            row_count += batch.num_rows
+
+        if row_count == 0:
+            return pd.DataFrame(columns=self.headers)
+
+        self.logger.info(
+            f"Reading data between row range: {self.rows_read+1} "
+            f"=> {self.rows_read+row_count}\n"
+            f"from this file: {self.input_file}")
+
+        # Increment counters below to prepare for the next read
+        self.read_iter_count += 1
+        self.rows_read += row_count
+
+        return self._to_dataframe(batches)
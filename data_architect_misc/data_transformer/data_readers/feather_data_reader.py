@@ -0,0 +1,31 @@
+import logging
+
+import pyarrow as pa
+
+from data_readers.arrow_file_data_reader import ArrowFileDataReader
+
+
+class FeatherDataReader(ArrowFileDataReader):
+    """
+    This class reads Pandas dataframe from a Feather (V2) or
+    Arrow IPC file 'rows_per_read' rows at a time. The file is
+    memory-mapped, so record batches are read without copying
+    (unless the file is compressed).
+
+    REF: https://arrow.apache.org/docs/python/ipc.html
+    """
+
+    def __init__(self, input_file_path_and_name, config):
+        self.ipc_reader = pa.ipc.open_file(pa.memory_map(input_file_path_and_name))
+        super().__init__(input_file_path_and_name, config)
+        self.logger = logging.getLogger(__name__)
+
+    def _get_schema(self):
+        return self.ipc_reader.schema
+
+    def _iter_record_batches(self):
+        column_indexes = [self.ipc_reader.schema.get_field_index(c) for c in self.headers]
+        for i in range(self.ipc_reader.num_record_batches):
+            batch = self.ipc_reader.get_batch(i)
+            yield pa.RecordBatch.from_arrays([batch.column(j) for j in column_indexes],
+                                             names=self.headers)
@@ -4,8 +4,10 @@ Last Modified Date: April 14, 2020
 """
 import os
 
+from data_readers.openpyxl_excel_data_reader import OpenpyxlExcelDataReader
 from data_readers.pandas_excel_data_reader import PandasExcelDataReader
 from data_readers.pandas_csv_data_reader import PandasCSVDataReader
+from data_readers.pandas_file_data_reader import PandasFileDataReader
 
 
 def _extract_file_name(file_path_and_name):
@@ -34,6 +36,8 @@ class FileDataReader:
     CSV_FILE_EXTENSION = '.csv'
     EXCEL_FILE_EXTENSION_OLD = '.xls'
     EXCEL_FILE_EXTENSION_NEW = '.xlsx'
+    PARQUET_FILE_EXTENSIONS = ['.parquet', '.pq']
+    FEATHER_FILE_EXTENSIONS = ['.feather', '.arrow']
 
     def __init__(self, input_file_path_and_name, config):
         self.input_file_path_and_name = input_file_path_and_name
@@ -44,13 +48,35 @@ class FileDataReader:
         Factory method that returns the fitting
         data reader object based on the type of
         input file.
+
+        If streaming is turned on in the config, new Excel
+        files (.xlsx) are read by OpenpyxlExcelDataReader,
+        which opens the workbook only once. Old Excel files
+        (.xls) are not supported by openpyxl, so they are
+        always read by PandasExcelDataReader.
+
+        Data readers of columnar files (Parquet and Feather) are
+        imported only when we need them so that pyarrow does not
+        need to be installed to read CSV and Excel files.
         """
         if self._is_excel(self.input_file_path_and_name):
+            if self._is_new_excel(self.input_file_path_and_name) \
+                    and self._is_streaming_requested():
+                return OpenpyxlExcelDataReader(self.input_file_path_and_name,
+                                               self.config)
             return PandasExcelDataReader(self.input_file_path_and_name,
                                          self.config)
         elif self._is_csv(self.input_file_path_and_name):
             return PandasCSVDataReader(self.input_file_path_and_name,
                                        self.config)
+        elif self._is_parquet(self.input_file_path_and_name):
+            from data_readers.parquet_data_reader import ParquetDataReader
+            return ParquetDataReader(self.input_file_path_and_name,
+                                     self.config)
+        elif self._is_feather(self.input_file_path_and_name):
+            from data_readers.feather_data_reader import FeatherDataReader
+            return FeatherDataReader(self.input_file_path_and_name,
+                                     self.config)
 
     def _is_excel(self, file_name_with_path):
         """Checks if file is an Excel file *by checking its file extension*"""
@@ -59,9 +85,32 @@ class FileDataReader:
         return ((self.EXCEL_FILE_EXTENSION_NEW == file_extension.lower()) or
                 (self.EXCEL_FILE_EXTENSION_OLD == file_extension.lower()))
 
+    def _is_new_excel(self, file_name_with_path):
+        """Checks if file is an Excel 2007+ (.xlsx) file *by checking its file extension*"""
+        file_extension = _get_file_extension(
+            _extract_file_name(file_name_with_path))
+        return self.EXCEL_FILE_EXTENSION_NEW == file_extension.lower()
+
+    def _is_streaming_requested(self):
+        """Checks if the config asks us to stream the input file"""
+        return self.config.get(PandasFileDataReader.KEY_STREAM_INPUT,
+                               PandasFileDataReader.DEFAULT_STREAM_INPUT)
+
     def _is_csv(self, file_name_with_path):
         """Checks if file is a CSV file *by checking its file extension*"""
         file_extension = _get_file_extension(
             _extract_file_name(file_name_with_path))
         return ((self.CSV_FILE_EXTENSION == file_extension.lower()) or
                 (self.TXT_FILE_EXTENSION == file_extension.lower()))
+
+    def _is_parquet(self, file_name_with_path):
+        """Checks if file is a Parquet file *by checking its file extension*"""
+        file_extension = _get_file_extension(
+            _extract_file_name(file_name_with_path))
+        return file_extension.lower() in self.PARQUET_FILE_EXTENSIONS
+
+    def _is_feather(self, file_name_with_path):
+        """Checks if file is a Feather/Arrow IPC file *by checking its file extension*"""
+        file_extension = _get_file_extension(
+            _extract_file_name(file_name_with_path))
+        return file_extension.lower() in self.FEATHER_FILE_EXTENSIONS
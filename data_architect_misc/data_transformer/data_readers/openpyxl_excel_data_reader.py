@@ -0,0 +1,228 @@
+import logging
+
+import numpy as np
+import openpyxl
+from openpyxl.cell.cell import TYPE_BOOL, TYPE_ERROR, TYPE_NUMERIC
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from data_readers.pandas_excel_data_reader import PandasExcelDataReader
+from data_readers.pandas_file_data_reader import PandasFileDataReader
+
+
+class OpenpyxlExcelDataReader(PandasFileDataReader):
+    """
+    This class reads Pandas dataframe from an Excel (.xlsx) file
+    by streaming the rows of the sheet(s) through openpyxl's
+    read-only worksheet cursor.
+
+    Unlike PandasExcelDataReader, which calls pandas' read_excel
+    (and thus, parses the whole workbook XML again) for every chunk
+    of data, this class opens the workbook only once and builds
+    each 'rows_per_read'-sized dataframe from the same cursor.
+
+    If the sheet name in the config is None, this class will read
+    all the sheets in the workbook one after another. Each dataframe
+    returned by read_next_dataframe comes from only one sheet and
+    has the column headers of that sheet.
+    """
+    KEY_SHEET_NAME = PandasExcelDataReader.KEY_SHEET_NAME
+    DEFAULT_SHEET_TO_READ = PandasExcelDataReader.DEFAULT_SHEET_TO_READ
+
+    def __init__(self, input_file_path_and_name, config):
+        super().__init__(config)
+        self.logger = logging.getLogger(__name__)
+        self.input_file = input_file_path_and_name
+        self.sheet_name = self._get_sheet_name(config)
+
+        # REF: https://openpyxl.readthedocs.io/en/stable/optimized.html
+        self.workbook = openpyxl.load_workbook(self.input_file,
+                                               read_only=True,
+                                               data_only=True)
+        self.sheet_names_to_read = self._get_sheet_names_to_read()
+        header_row = self.read_header_row()
+        if self.sheet_name is None:
+            self.headers_by_sheet = header_row
+        else:
+            self.headers_by_sheet = {self.sheet_names_to_read[0]: header_row}
+
+        # Number of times read_next_dataframe is called
+        self.read_iter_count = 0
+
+        # Variables below keep track of the sheet we are currently
+        # reading. self.headers always holds the column headers of
+        # that sheet so that _assign_column_headers in the parent
+        # class can be reused as is.
+        self.current_sheet_idx = 0
+        self.current_sheet_name = self.sheet_names_to_read[0]
+        self.headers = self.headers_by_sheet[self.current_sheet_name]
+        self.row_cursor = None
+        self.rows_read_in_current_sheet = 0
+        self.look_ahead_df = None
+
+    def _get_sheet_name(self, config):
+        """Extracts the sheet name to read data from."""
+        return config.get(self.KEY_SHEET_NAME,
+                          self.DEFAULT_SHEET_TO_READ)
+
+    def _get_sheet_names_to_read(self):
+        """
+        Translates the sheet name (or index, or None for
+        all sheets) in the config into the list of sheet
+        names we will read data from.
+        """
+        if self.sheet_name is None:
+            return self.workbook.sheetnames
+        elif isinstance(self.sheet_name, int):
+            return [self.workbook.sheetnames[self.sheet_name]]
+
+        return [self.sheet_name]
+
+    @staticmethod
+    def _convert_cell(cell):
+        """
+        Converts openpyxl cell to the same Python value
+        pandas' read_excel (with openpyxl engine) would
+        give us for that cell.
+        """
+        if cell.is_date:
+            return cell.value
+        elif cell.data_type == TYPE_ERROR:
+            return np.nan
+        elif cell.data_type == TYPE_BOOL:
+            return bool(cell.value)
+        elif cell.value is None:
+            return ''
+        elif cell.data_type == TYPE_NUMERIC:
+            # Same as 'convert_float' in pandas' read_excel
+            val = int(cell.value)
+            if val == cell.value:
+                return val
+            return float(cell.value)
+
+        return cell.value
+
+    def _get_header_row(self, sheet_name):
+        """
+        Reads the row which has column headers in the given
+        sheet and returns them as a list. If user instructed
+        to not read header row, this will return [0, 1, 2, ...]
+        as column headers (just like pandas does).
+        """
+        worksheet = self.workbook[sheet_name]
+        if self.header_row_index is None:
+            return list(range(worksheet.max_column or 0))
+
+        # openpyxl stops parsing the sheet once it
+        # gets past the max_row given below
+        header_row = next(worksheet.iter_rows(
+            min_row=self.header_row_index + 1,
+            max_row=self.header_row_index + 1), ())
+        return TextParser([[self._convert_cell(c) for c in header_row]],
+                          header=0).read().columns.to_list()
+
+    def read_header_row(self):
+        """
+        Reads the row which has column headers
+        and returns them as a list or **in case of
+        reading all sheets, a dictionary** in the form
+        {sheet_name => list_of_col_names_of_that_sheet}.
+        """
+        if self.sheet_name is None:
+            return {sheet_name: self._get_header_row(sheet_name)
+                    for sheet_name in self.sheet_names_to_read}
+
+        return self._get_header_row(self.sheet_names_to_read[0])
+
+    def _get_row_cursor(self):
+        """
+        Creates (only once per sheet) and returns openpyxl's
+        row iterator which starts from the row where the data
+        begins in the sheet we are currently reading.
+        """
+        if self.row_cursor is None:
+            self.row_cursor = self.workbook[self.current_sheet_name].iter_rows(
+                min_row=self.skip_rows + 1)
+        return self.row_cursor
+
+    def _move_to_next_sheet(self):
+        """
+        Points the cursor to the next sheet to read, if any.
+        Returns False if there is no more sheet to read.
+        """
+        if self.current_sheet_idx + 1 >= len(self.sheet_names_to_read):
+            return False
+
+        self.current_sheet_idx += 1
+        self.current_sheet_name = self.sheet_names_to_read[self.current_sheet_idx]
+        self.headers = self.headers_by_sheet[self.current_sheet_name]
+        self.row_cursor = None
+        self.rows_read_in_current_sheet = 0
+        return True
+
+    def _read_next_chunk(self):
+        """
+        Reads up to 'rows_per_read' rows from the cursor of the
+        current sheet and returns them as a dataframe. Returns
+        an empty dataframe once the current sheet is exhausted.
+        """
+        rows = []
+        for row in self._get_row_cursor():
+            rows.append([self._convert_cell(c) for c in row])
+            if len(rows) == self.rows_per_read:
+                break
+
+        if not rows:
+            return pd.DataFrame(columns=self.headers)
+
+        # We feed the rows to the same parser pandas' read_excel
+        # uses so that data types are inferred the same way
+        df = TextParser(rows,
+                        header=None,
+                        keep_default_na=self.keep_default_na).read()
+        if not self.headers:
+            # The sheet's dimensions were unknown
+            # when we tried to read the header row
+            self.headers = df.columns.to_list()
+            self.headers_by_sheet[self.current_sheet_name] = self.headers
+
+        return self._assign_column_headers(df)
+
+    def _read_next_chunk_in_current_sheet(self):
+        """
+        Returns the chunk we have already read ahead (to check
+        for the end of the sheet), if any, or reads a new one.
+        """
+        if self.look_ahead_df is not None:
+            df = self.look_ahead_df
+            self.look_ahead_df = None
+            return df
+
+        return self._read_next_chunk()
+
+    def read_next_dataframe(self):
+        df = self._read_next_chunk_in_current_sheet()
+        while df.empty and self._move_to_next_sheet():
+            df = self._read_next_chunk()
+
+        if df.empty:
+            # Nothing more to read, thus release the file handle
+            self.workbook.close()
+            return df
+
+        row_idx_to_start_reading = self.rows_read_in_current_sheet + self.skip_rows
+        self.logger.info(
+            f"Reading data between row range: {row_idx_to_start_reading+1} "
+            f"=> {row_idx_to_start_reading+self.rows_per_read}\n"
+            f"from sheet '{self.current_sheet_name}' of this file: {self.input_file}")
+
+        # Increment counters below to prepare for the next read
+        self.read_iter_count += 1
+        self.rows_read_in_current_sheet += df.shape[0]
+
+        if self.skip_footer > 0:
+            self.look_ahead_df = self._read_next_chunk()
+            if self.look_ahead_df.empty:
+                return self._drop_footer_rows(df)
+
+        return df
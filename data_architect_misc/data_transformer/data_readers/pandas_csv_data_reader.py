@@ -66,6 +66,14 @@ class PandasCSVDataReader(PandasFileDataReader):
         # Number of times read_next_dataframe is called
         self.read_iter_count = 0
 
+        # Variables below are only used in streaming mode.
+        # chunk_iterator is the one and only pandas' TextFileReader
+        # we read the file with and look_ahead_df holds the chunk
+        # we have read ahead (to find out if we have reached
+        # the end of the file) but not returned yet.
+        self.chunk_iterator = None
+        self.look_ahead_df = None
+
     def read_header_row(self):
         """
         Reads the row which has column headers
@@ -118,3 +126,77 @@ class PandasCSVDataReader(PandasFileDataReader):
             return pd.DataFrame(columns=self.headers)
 
         return df
+
+    def _get_chunk_iterator(self):
+        """
+        Creates (only once) and returns pandas' TextFileReader
+        which reads the file, chunk by chunk, starting from
+        the row where the data begins.
+        """
+        if self.chunk_iterator is None:
+            self.chunk_iterator = pd.read_csv(
+                self.input_file,
+                keep_default_na=self.keep_default_na,
+                skip_blank_lines=self.skip_blank_lines,
+                header=None,
+                encoding=self.encoding,
+                delimiter=self.delimiter,
+                skiprows=self.skip_rows,
+                quoting=self.quoting,
+                escapechar=self.escape_char,
+                chunksize=self.rows_per_read
+            )
+        return self.chunk_iterator
+
+    def _read_next_chunk(self):
+        """
+        Reads the next chunk from the persistent chunk iterator.
+        Returns an empty dataframe once the file is exhausted.
+        """
+        try:
+            df = next(self._get_chunk_iterator())
+        except (StopIteration, EmptyDataError):
+            # Nothing more to read, thus release the file
+            # handle and return an empty data frame
+            if self.chunk_iterator is not None:
+                self.chunk_iterator.close()
+            return pd.DataFrame(columns=self.headers)
+
+        return self._assign_column_headers(df)
+
+    def _stream_next_dataframe(self):
+        """
+        Streaming version of read_next_dataframe. Every row in
+        the file is read only once and we only ever hold one
+        extra chunk (the look-ahead chunk) in memory to decide
+        whether the current chunk is the last one and thus,
+        whether we need to drop the 'skipfooter' rows from it.
+        """
+        if self.look_ahead_df is not None:
+            df = self.look_ahead_df
+            self.look_ahead_df = None
+        else:
+            df = self._read_next_chunk()
+
+        if not df.empty:
+            row_idx_to_start_reading = self._get_row_idx_to_start_reading()
+            self.logger.info(
+                f"Reading data between row range: {row_idx_to_start_reading+1} "
+                f"=> {row_idx_to_start_reading+self.rows_per_read}\n"
+                f"from this file: {self.input_file}")
+
+        # Increment counter below to prepare for the next read
+        self.read_iter_count += 1
+
+        if (self.skip_footer > 0) and (not df.empty):
+            self.look_ahead_df = self._read_next_chunk()
+            if self.look_ahead_df.empty:
+                return self._drop_footer_rows(df)
+
+        return df
+
+    def read_next_dataframe(self):
+        if self.stream_input:
+            return self._stream_next_dataframe()
+
+        return super().read_next_dataframe()
@@ -66,6 +66,14 @@ class PandasFileDataReader:
     KEY_SKIP_FOOTER = 'skipfooter'  # number of rows to drop from the bottom
     DEFAULT_SKIP_FOOTER = 0
 
+    # Should the reader stream the file through one persistent
+    # cursor instead of re-reading the file from the top
+    # (via 'skiprows') for every chunk. Re-reading makes the
+    # total reading time grow quadratically with the file
+    # size, which hurts for multi-GB files.
+    KEY_STREAM_INPUT = 'stream_input'
+    DEFAULT_STREAM_INPUT = False
+
     def __init__(self, config):
         self.logger = logging.getLogger(__name__)
         self.rows_per_read = self._get_rows_per_read(config)
@@ -73,6 +81,8 @@ class PandasFileDataReader:
         self.header_row_index = self._get_row_index_to_read_column_header(config)
         self.skip_rows = self._get_leading_rows_to_skip(config)
         self.skip_footer = self._get_bottom_rows_to_skip(config)
+        self.stream_input = config.get(self.KEY_STREAM_INPUT,
+                                       self.DEFAULT_STREAM_INPUT)
         if self.rows_per_read < self.skip_footer:
             raise ConflictingParametersError(
                 f"The number of rows to read per iteration, "
@@ -226,6 +236,34 @@ class PandasFileDataReader:
             1,
             False)
 
+    def _drop_footer_rows(self, df):
+        """
+        Drops the last 'skipfooter' rows from the dataframe
+        that is known to be the last chunk of the file.
+        """
+        # Here, the user needs to be careful that rows
+        # to drop from the bottom, 'skipfooter',
+        # do not awkwardly fall between the previously
+        # read dataframe and the next one to read. If
+        # they do, then this will only drop fewer than
+        # self.skip_footer rows.
+        #
+        # In other words, user needs to make sure the
+        # 'rows_per_read' and 'skipfooter' don't conflict
+        # each other and thus, resulting in some rows
+        # from the bottom not being dropped.
+        # See 'TestExcelFile2.xlsx' and 'TestExcelConfig2.json'
+        # in examples/test folder as an example of this
+        # awkward scenario.
+        self.logger.info(
+            f"Dropped *as many as* (could be fewer than) "
+            f"this number of rows of data: {self.skip_footer}"
+            f"\nThe following rows are dropped:\n"
+            f"{df[-self.skip_footer:]}")
+
+        # REF: https://stackoverflow.com/a/57681199
+        return df[:-self.skip_footer]
+
     def read_next_dataframe(self):
         df = self._read_dataframe(self._get_row_idx_to_start_reading(),
                                   self.rows_per_read)
@@ -234,27 +272,6 @@ class PandasFileDataReader:
         self.read_iter_count += 1
 
         if (self.skip_footer > 0) and self._read_one_line_ahead().empty:
-            # Here, the user needs to be careful that rows
-            # to drop from the bottom, 'skipfooter',
-            # do not awkwardly fall between the previously
-            # read dataframe and the next one to read. If
-            # they do, then this will only drop fewer than
-            # self.skip_footer rows.
-            #
-            # In other words, user needs to make sure the
-            # 'rows_per_read' and 'skipfooter' don't conflict
-            # each other and thus, resulting in some rows
-            # from the bottom not being dropped.
-            # See 'TestExcelFile2.xlsx' and 'TestExcelConfig2.json'
-            # in examples/test folder as an example of this
-            # awkward scenario.
-            self.logger.info(
-                f"Dropped *as many as* (could be fewer than) "
-                f"this number of rows of data: {self.skip_footer}"
-                f"\nThe following rows are dropped:\n"
-                f"{df[-self.skip_footer:]}")
-
-            # REF: https://stackoverflow.com/a/57681199
-            return df[:-self.skip_footer]
+            return self._drop_footer_rows(df)
 
         return df
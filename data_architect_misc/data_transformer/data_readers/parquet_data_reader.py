@@ -0,0 +1,29 @@
+import logging
+
+import pyarrow.parquet as pq
+
+from data_readers.arrow_file_data_reader import ArrowFileDataReader
+
+
+class ParquetDataReader(ArrowFileDataReader):
+    """
+    This class reads Pandas dataframe from a Parquet file
+    'rows_per_read' rows at a time. The file is memory-mapped
+    and only the row groups (and columns) needed for each read
+    are decoded.
+
+    REF: https://arrow.apache.org/docs/python/parquet.html
+    """
+
+    def __init__(self, input_file_path_and_name, config):
+        self.parquet_file = pq.ParquetFile(input_file_path_and_name,
+                                           memory_map=True)
+        super().__init__(input_file_path_and_name, config)
+        self.logger = logging.getLogger(__name__)
+
+    def _get_schema(self):
+        return self.parquet_file.schema_arrow
+
+    def _iter_record_batches(self):
+        return self.parquet_file.iter_batches(batch_size=self.rows_per_read,
+                                              columns=self.headers)
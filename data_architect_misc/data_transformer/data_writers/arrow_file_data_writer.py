@@ -0,0 +1,73 @@
+import logging
+
+from data_writers.file_data_writer import FileDataWriter
+
+
+class ArrowFileDataWriter(FileDataWriter):
+    """
+    This class is the parent class of the data writers for
+    columnar files (ParquetDataWriter and FeatherDataWriter).
+    It converts Pandas dataframe to an Arrow table, with the
+    string columns dictionary-encoded (i.e., each distinct
+    string is stored once per row group) unless told not to.
+
+    Files are written in row groups of 'output_rows_per_group'
+    rows so that reading them back with the same 'rows_per_read'
+    reads whole row groups at a time.
+
+    Note: pyarrow is imported only where we use it so that
+    transform_constants.py can import this class (for its
+    config keys) without pyarrow being installed.
+    """
+    KEY_OUTPUT_ROWS_PER_GROUP = 'output_rows_per_group'
+    DEFAULT_OUTPUT_ROWS_PER_GROUP = 100000
+
+    KEY_DICTIONARY_ENCODE_STRINGS = 'dictionary_encode_strings'
+    DEFAULT_DICTIONARY_ENCODE_STRINGS = True
+
+    KEY_OUTPUT_COMPRESSION = 'output_compression'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.logger = logging.getLogger(__name__)
+        self.rows_per_group = config.get(
+            self.KEY_OUTPUT_ROWS_PER_GROUP,
+            self.DEFAULT_OUTPUT_ROWS_PER_GROUP)
+        self.dictionary_encode_strings = config.get(
+            self.KEY_DICTIONARY_ENCODE_STRINGS,
+            self.DEFAULT_DICTIONARY_ENCODE_STRINGS)
+        self.compression = config.get(
+            self.KEY_OUTPUT_COMPRESSION,
+            self.DEFAULT_OUTPUT_COMPRESSION)
+
+    def _to_arrow_array(self, column):
+        """
+        Converts the column to an Arrow array. Columns that
+        mix strings with other values (e.g., numbers and the
+        empty strings we read for empty cells) cannot be stored
+        as one Arrow type, so we store them as strings like
+        CSVDataWriter would. Missing values (NaN/None) are kept
+        as nulls (CSVDataWriter writes them as empty cells)
+        instead of becoming 'nan' or 'None' strings.
+        """
+        import pyarrow as pa
+
+        try:
+            arr = pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            self.logger.warning(f"Column '{column.name}' has values of mixed "
+                                f"types, so they are written as strings.")
+            arr = pa.array(column.where(column.isna(), column.astype(str)),
+                           from_pandas=True)
+
+        if self.dictionary_encode_strings and pa.types.is_string(arr.type):
+            arr = arr.dictionary_encode()
+        return arr
+
+    def _to_arrow_table(self, df):
+        import pyarrow as pa
+
+        if self.include_index:
+            df = df.reset_index()
+        return pa.Table.from_arrays([self._to_arrow_array(df[c]) for c in df.columns],
+                                    names=[str(c) for c in df.columns])
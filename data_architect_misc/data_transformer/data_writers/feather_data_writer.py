@@ -0,0 +1,38 @@
+import logging
+
+import pyarrow.feather as feather
+
+from data_writers.arrow_file_data_writer import ArrowFileDataWriter
+
+
+class FeatherDataWriter(ArrowFileDataWriter):
+    """
+    This class is a wrapper to pyarrow's write_feather method.
+    We can use this class to write dataframe to Feather (V2,
+    i.e., Arrow IPC) file as output.
+    REF: https://arrow.apache.org/docs/python/feather.html
+    """
+    DEFAULT_OUTPUT_COMPRESSION = 'lz4'
+
+    OUTPUT_FILE_EXTENSION = '.feather'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.logger = logging.getLogger(__name__)
+
+    def _get_output_file_extension(self):
+        return self.OUTPUT_FILE_EXTENSION
+
+    def write_data(self, df, output_file_path_and_name=None):
+        if not output_file_path_and_name:
+            out_file = self._get_output_file_path_and_name()
+        else:
+            out_file = output_file_path_and_name
+
+        self.logger.info(f"Writing data to: {out_file}")
+        feather.write_feather(
+            self._to_arrow_table(df),
+            out_file,
+            compression=self.compression,
+            chunksize=self.rows_per_group
+        )
@@ -1,7 +1,11 @@
 import logging
+import ntpath
+import os
+import posixpath
 import urllib
+import uuid
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 
 
 class DBSchemaNotDefinedError(Exception):
@@ -57,32 +61,63 @@ class MSSQLDataWriter:
 
     # err on the side of throwing error rather than overwriting an existing table
     REPLACE_IF_EXISTS = 'fail'
+    # but once we have created the table in this run (i.e., after the first
+    # chunk is written), the rest of the chunks are appended to it
+    APPEND_IF_EXISTS = 'append'
 
-    # NOTE: Do NOT change the default of CHUNK_SIZE=None to
-    # something else. Firstly, nobody should be using Pandas' to_sql
-    # method to write to MS SQL because it's too slow.
-    # Secondly, if CHUNK_SIZE is not provided as parameter, all rows will
-    # be loaded at once, and based on some experiments below, that
-    # approach is slightly better in terms of performance than setting
-    # CHUNK_SIZE to some other values as shown below.
-    # CHUNKSIZE = None, METHOD = None => 850 secs
-    # CHUNKSIZE = 100, METHOD = None => 892 secs
-    # CHUNKSIZE = 10000, METHOD = None => 875 secs
-    CHUNK_SIZE = None
-
-    # NOTE: Do NOT change the default to other values besides 'multi'.
-    # 'multi' means passing multiple values in a single INSERT clause
-    # and in practice, it is throwing SQL Alchemy errors as detailed below.
-    # We will revisit updating 'multi' to somethign else after Pandas
-    # and/or SQL Alchemy needs to sort out these glitches.
+    # (server, database, schema, table) of the tables created in this run.
+    # transform.py creates a new writer for each input file, so this is kept
+    # in the class (not in each writer) for the chunks of the second and later
+    # input files of a config to be appended to the table created by the first.
+    # NOTE: Each worker process of 'transform.py --workers' has its own copy,
+    # so input files written to the same table must NOT be run in parallel.
+    tables_created = set()
+
+    # How rows are sent to SQL Server:
+    # 'fast_executemany' => parameterized INSERT sent in batches of
+    #   'sql_rows_per_batch' rows using pyodbc's fast_executemany, which
+    #   ships the whole batch of parameters in one round trip.
+    # 'multi' => pass multiple values in a single INSERT clause.
+    # 'bulk_insert' => write each chunk to a staging CSV file in a folder
+    #   that SQL Server can read and load it with BULK INSERT (fastest,
+    #   but requires SQL Server 2017+ and 'bulk_insert_staging_folder').
     # REF: https://pandas.pydata.org/pandas-docs/stable/user_guide/io.html#insertion-method
+    # REF: https://docs.sqlalchemy.org/en/13/dialects/mssql.html#fast-executemany-mode
+    KEY_INSERT_METHOD = 'sql_insert_method'
+    INSERT_METHOD_FAST_EXECUTEMANY = 'fast_executemany'
+    INSERT_METHOD_MULTI_VALUES = 'multi'
+    INSERT_METHOD_BULK_INSERT = 'bulk_insert'
+    DEFAULT_INSERT_METHOD = INSERT_METHOD_FAST_EXECUTEMANY
+    INSERT_METHODS = [INSERT_METHOD_FAST_EXECUTEMANY,
+                      INSERT_METHOD_MULTI_VALUES,
+                      INSERT_METHOD_BULK_INSERT]
+
+    KEY_ROWS_PER_BATCH = 'sql_rows_per_batch'
+    DEFAULT_ROWS_PER_BATCH = 10000
+
+    # NOTE: Previously, we used plain to_sql (CHUNKSIZE=None, METHOD=None)
+    # which took ~850 secs for ~25K rows. 'multi' method used to throw
+    # errors like below because SQL Server allows at most 2100 parameter
+    # markers per statement and 1000 rows per VALUES clause, and we did
+    # NOT size the chunks accordingly:
     # CHUNKSIZE = None, METHOD = 'multi' => sqlalchemy.exc.ProgrammingError: (pyodbc.ProgrammingError) ('The SQL contains 4184 parameter markers, but 331864 parameters were supplied', 'HY000')
-    # CHUNKSIZE = 100, METHOD = 'multi' => sqlalchemy.exc.ProgrammingError (pyodbc.ProgrammingError) ('42000', '[42000] [Microsoft][ODBC Driver 13 for SQL Server][SQL Server]Error converting data type nvarchar to bigint. (8114) (SQLExecDirectW)')
     # CHUNKSIZE = 10000, METHOD = 'multi' => sqlalchemy.exc.ProgrammingError: (pyodbc.ProgrammingError) ('The SQL contains -1072 parameter markers, but 130000 parameters were supplied', 'HY000')
-    METHOD = 'multi'  # to pass multiple values in a single INSERT clause (for better efficiency)
+    # Now, rows per INSERT for 'multi' method is calculated from the number
+    # of columns to stay under these limits (see _get_rows_per_batch).
+    # REF: https://docs.microsoft.com/en-us/sql/sql-server/maximum-capacity-specifications-for-sql-server
+    MAX_PARAMETERS_PER_STATEMENT = 2100
+    MAX_ROWS_PER_VALUES_CLAUSE = 1000
+
+    # Local folder to write the staging files to for 'bulk_insert' method
+    # and the same folder as seen by SQL Server (e.g., a UNC path like
+    # \\fileserver\staging). If the latter is not provided, we assume
+    # SQL Server sees the staging folder under the same path.
+    KEY_BULK_INSERT_STAGING_FOLDER = 'bulk_insert_staging_folder'
+    KEY_BULK_INSERT_SERVER_FOLDER = 'bulk_insert_server_folder'
 
-    def __init__(self, config):
-        from sql_server_account_info import sql_server_info
+    def __init__(self, config, sql_server_info=None):
+        if sql_server_info is None:
+            from sql_server_account_info import sql_server_info
         # Example of sql_server_info:
         # sql_server_info = {
         #     "protocol": "mssql+pyodbc://",
@@ -113,6 +148,24 @@ class MSSQLDataWriter:
             self.DEFAULT_INCLUDE_INDEX_COLUMN_IN_OUTPUT_FILE
         )
 
+        self.insert_method = self._get_insert_method(config)
+        self.rows_per_batch = config.get(self.KEY_ROWS_PER_BATCH,
+                                         self.DEFAULT_ROWS_PER_BATCH)
+        self.bulk_insert_staging_folder = config.get(
+            self.KEY_BULK_INSERT_STAGING_FOLDER)
+        self.bulk_insert_server_folder = config.get(
+            self.KEY_BULK_INSERT_SERVER_FOLDER,
+            self.bulk_insert_staging_folder)
+        if (self.insert_method == self.INSERT_METHOD_BULK_INSERT) \
+                and (not self.bulk_insert_staging_folder):
+            raise ValueError(f"'{self.KEY_BULK_INSERT_STAGING_FOLDER}' must be "
+                             f"defined in JSON config file to use "
+                             f"'{self.INSERT_METHOD_BULK_INSERT}' method.")
+
+        # One engine (and thus, one connection pool) per writer
+        # instead of one new engine for every chunk we write.
+        self.engine = self._get_sqlalchemy_engine()
+
     def _get_database_schema(self, config):
         """
         Returns output DB schema name provided in JSON config file.
@@ -125,6 +178,15 @@ class MSSQLDataWriter:
 
         return config.get(self.KEY_DATABASE_SCHEMA)
 
+    def _get_insert_method(self, config):
+        """Returns the insert method provided in JSON config file."""
+        insert_method = config.get(self.KEY_INSERT_METHOD,
+                                   self.DEFAULT_INSERT_METHOD)
+        if insert_method not in self.INSERT_METHODS:
+            raise ValueError(f"'{self.KEY_INSERT_METHOD}' in JSON config file "
+                             f"must be one of these: {self.INSERT_METHODS}")
+        return insert_method
+
     def _get_sqlalchemy_engine(self):
         """
         Create and return SQL Alchemy engine from hostname-based
@@ -158,32 +220,117 @@ class MSSQLDataWriter:
                                                                                      self.user_id,
                                                                                      self.password,
                                                                                      self.OTHER_URL_PARAMS)))
-        return create_engine(pyodbc_connection_str, echo=False)
+        return create_engine(
+            pyodbc_connection_str,
+            echo=False,
+            fast_executemany=(self.insert_method == self.INSERT_METHOD_FAST_EXECUTEMANY))
+
+    def _get_rows_per_batch(self, df):
+        """
+        Returns the number of rows to send to SQL Server per INSERT
+        statement (for 'multi' method) or per executemany call (for
+        'fast_executemany' method).
+        """
+        if self.insert_method == self.INSERT_METHOD_MULTI_VALUES:
+            params_per_row = df.shape[1] + (df.index.nlevels if self.include_index else 0)
+            return max(1, min(self.MAX_ROWS_PER_VALUES_CLAUSE,
+                              (self.MAX_PARAMETERS_PER_STATEMENT - 1) // params_per_row))
+
+        return self.rows_per_batch
+
+    def set_output_file_name_suffix(self, suffix_str):
+        """
+        transform.py calls this before writing each chunk to name
+        output files. All chunks go into the same SQL table, so
+        there is nothing to do here.
+        """
+        pass
+
+    def _get_table_key(self):
+        return self.server, self.database, self.db_schema, self.output_sql_table_name
+
+    def _get_if_exists_behavior(self):
+        """
+        Only the first chunk written to the table in this run may create
+        it (and fails if the table already existed before the run).
+        """
+        if self._get_table_key() in MSSQLDataWriter.tables_created:
+            return self.APPEND_IF_EXISTS
+        return self.REPLACE_IF_EXISTS
+
+    def _get_staging_file_path_as_seen_by_server(self, staging_file_name):
+        # SQL Server (on Windows) expects Windows paths, but allow
+        # POSIX style paths for SQL Server on Linux as well
+        path_module = posixpath if '/' in self.bulk_insert_server_folder else ntpath
+        return path_module.join(self.bulk_insert_server_folder, staging_file_name)
+
+    def _bulk_insert(self, df):
+        """
+        Writes the dataframe to a staging CSV file and loads it into
+        the table with BULK INSERT. The table is created (or checked
+        for, in case of the first chunk) via to_sql with zero rows
+        so that column types are decided the same way as other methods.
+        REF: https://docs.microsoft.com/en-us/sql/t-sql/statements/bulk-insert-transact-sql
+        """
+        df.head(0).to_sql(
+            name=self.output_sql_table_name,
+            con=self.engine,
+            schema=self.db_schema,
+            if_exists=self._get_if_exists_behavior(),
+            index=self.include_index
+        )
+
+        staging_file_name = f"{self.output_sql_table_name}_{uuid.uuid4().hex}.csv"
+        staging_file = os.path.join(self.bulk_insert_staging_folder, staging_file_name)
+        df.to_csv(staging_file,
+                  index=self.include_index,
+                  header=False,
+                  encoding='utf-8',
+                  line_terminator='\n')
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    f"BULK INSERT [{self.db_schema}].[{self.output_sql_table_name}] "
+                    f"FROM '{self._get_staging_file_path_as_seen_by_server(staging_file_name)}' "
+                    f"WITH (FORMAT = 'CSV', FIELDQUOTE = '\"', FIELDTERMINATOR = ',', "
+                    f"ROWTERMINATOR = '0x0a', CODEPAGE = '65001', TABLOCK)"))
+        finally:
+            os.remove(staging_file)
 
     def write_data(self, df):
         """
-        Write Pandas dataframe as a table in MS SQL Server database
-        using Pandas' to_sql method.
+        Write Pandas dataframe to a table in MS SQL Server database.
+        The first call in this run creates the table (and fails if the
+        table already exists) and the following calls, including the ones
+        by writers of other input files, append to it.
 
-        WARNING: Do NOT write data directly to SQL Server table because
-        it is painfully slow. For example, to write ~25K rows of 13
-        mostly string type (no more than 20 chars in each column)
-        columns, it takes ~15 minutes to finish.
+        WARNING: Writing data to SQL Server table with plain to_sql is
+        painfully slow. For example, to write ~25K rows of 13 mostly
+        string type (no more than 20 chars in each column) columns,
+        it took ~15 minutes to finish. Use the default 'fast_executemany'
+        or 'bulk_insert' method (see KEY_INSERT_METHOD above).
         """
         self.logger.info(
             f"Writing data to MSSQL at (server; database; schema; table): "
             f"{self.server}; {self.database}; {self.db_schema}; "
-            f"{self.output_sql_table_name}")
+            f"{self.output_sql_table_name} using '{self.insert_method}' method")
 
-        df.to_sql(
-            name=self.output_sql_table_name,
-            con=self._get_sqlalchemy_engine(),
-            schema=self.db_schema,
-            if_exists=self.REPLACE_IF_EXISTS,
-            index=self.include_index,
-            # chunksize=self.CHUNK_SIZE,
-            # method=self.METHOD
-        )
+        if self.insert_method == self.INSERT_METHOD_BULK_INSERT:
+            self._bulk_insert(df)
+        else:
+            df.to_sql(
+                name=self.output_sql_table_name,
+                con=self.engine,
+                schema=self.db_schema,
+                if_exists=self._get_if_exists_behavior(),
+                index=self.include_index,
+                chunksize=self._get_rows_per_batch(df),
+                method=(self.INSERT_METHOD_MULTI_VALUES
+                        if self.insert_method == self.INSERT_METHOD_MULTI_VALUES
+                        else None)
+            )
+
+        MSSQLDataWriter.tables_created.add(self._get_table_key())
 
 # For future reference in other projects:
 # A way to READ MSSQL data via pandas
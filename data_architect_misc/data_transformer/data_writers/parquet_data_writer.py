@@ -0,0 +1,37 @@
+import logging
+
+import pyarrow.parquet as pq
+
+from data_writers.arrow_file_data_writer import ArrowFileDataWriter
+
+
+class ParquetDataWriter(ArrowFileDataWriter):
+    """
+    This class is a wrapper to pyarrow's write_table method.
+    We can use this class to write dataframe to Parquet file as output.
+    REF: https://arrow.apache.org/docs/python/parquet.html
+    """
+    DEFAULT_OUTPUT_COMPRESSION = 'snappy'
+
+    OUTPUT_FILE_EXTENSION = '.parquet'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.logger = logging.getLogger(__name__)
+
+    def _get_output_file_extension(self):
+        return self.OUTPUT_FILE_EXTENSION
+
+    def write_data(self, df, output_file_path_and_name=None):
+        if not output_file_path_and_name:
+            out_file = self._get_output_file_path_and_name()
+        else:
+            out_file = output_file_path_and_name
+
+        self.logger.info(f"Writing data to: {out_file}")
+        pq.write_table(
+            self._to_arrow_table(df),
+            out_file,
+            row_group_size=self.rows_per_group,
+            compression=self.compression
+        )
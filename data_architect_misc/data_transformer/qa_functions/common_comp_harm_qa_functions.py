@@ -13,6 +13,7 @@ import datetime
 import logging
 import re
 
+import numpy as np
 import pandas as pd
 
 import transform_errors
@@ -249,6 +250,18 @@ class CommonCompHarmQAFunctions:
 
         return df
 
+    @staticmethod
+    def _has_values_outside_range(series, min_value, max_value):
+        """
+        Checks if any value in the series is missing (NaN) or is not
+        between min_value and max_value (inclusive). Only the minimum
+        and maximum values of the series are compared, instead of
+        comparing each value in Python.
+        """
+        if series.empty:
+            return False
+        return series.hasnans or (series.min() < min_value) or (series.max() > max_value)
+
     def check_distinct_year_values_in_year_column(self, df):
         """
         Display distinct year values in the transformed data.
@@ -275,10 +288,11 @@ class CommonCompHarmQAFunctions:
         2015 (the year we started collecting data for competitive
         harmonization project) to the current year.
         """
-        years = sorted(df[comp_harm_constants.YEAR_COLUMN].unique())
         cur_year = datetime.datetime.now().year
 
-        if not all([(y >= self.MIN_YEAR) and (y <= cur_year) for y in years]):
+        if self._has_values_outside_range(df[comp_harm_constants.YEAR_COLUMN],
+                                          self.MIN_YEAR, cur_year):
+            years = sorted(df[comp_harm_constants.YEAR_COLUMN].unique())
             raise qa_errors.InvalidValueFoundError(
                 f"Unexpected year found in the data. Please inspect the "
                 f"following year values: {years} to make sure that none of "
@@ -311,10 +325,9 @@ class CommonCompHarmQAFunctions:
         are within the valid range (from 1 to 12). If not,
         raises InvalidValueFoundError.
         """
-        months = sorted(df[comp_harm_constants.MONTH_COLUMN].unique())
-
-        if not all([(y >= self.MIN_MONTH) and
-                    (y <= self.MAX_MONTH) for y in months]):
+        if self._has_values_outside_range(df[comp_harm_constants.MONTH_COLUMN],
+                                          self.MIN_MONTH, self.MAX_MONTH):
+            months = sorted(df[comp_harm_constants.MONTH_COLUMN].unique())
             raise qa_errors.InvalidValueFoundError(
                 f"Unexpected month value found in the data. Please inspect "
                 f"the following month values: {months} to make sure that "
@@ -800,6 +813,35 @@ class CommonCompHarmQAFunctions:
             self.MAX_SPEND,
             [comp_harm_constants.GROSS_SPEND_COLUMN])
 
+    @staticmethod
+    def _get_str_values_that_may_have_more_than_two_decimals(series):
+        """
+        Returns the distinct string values (i.e., str() of each value)
+        of the series that the decimal check below must look at.
+
+        Integer and boolean values never have decimals. A float value x
+        has no more than two decimals if np.round(x, 2) == x, so only
+        the values that fail this check (it can fail for a few very big
+        values with two decimals, which is fine since their strings are
+        checked anyway) are returned, instead of all values. Values that
+        are missing/infinite, too small (str() uses scientific notation
+        like '1e-05' below 0.0001) or too big (x * 100 must be below
+        2 ** 52) are always returned as well.
+        """
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+            return []
+
+        if series.dtype == np.float64:
+            values = series.values
+            with np.errstate(invalid='ignore', over='ignore'):
+                abs_values = np.abs(values)
+                is_in_checkable_range = ((abs_values >= 1e-4) | (values == 0)) & \
+                                        (abs_values < 2 ** 52 / 100)
+                has_two_decimals_or_less = np.round(values, 2) == values
+            series = series[~(is_in_checkable_range & has_two_decimals_or_less)]
+
+        return pd.unique(series.astype(str).values)
+
     def assert_float_values_in_columns_have_either_one_or_two_decimals(
             self,
             df,
@@ -825,15 +867,15 @@ class CommonCompHarmQAFunctions:
                                                f"column names being string values.")
 
         for col_name in list_of_col_names:
-            df1 = df[col_name].astype(str) \
-                .map(lambda x: [x, '0'] if len(x.split('.')) == 1 else x.split('.'))
+            split_values = [x.split('.') for x in
+                            self._get_str_values_that_may_have_more_than_two_decimals(df[col_name])]
 
-            if any([len(x) > 2 for x in df1.values]):
+            if any([len(x) > 2 for x in split_values]):
                 raise qa_errors.InvalidValueFoundError(
                     f"Some of the values in '{col_name}' column have "
                     f"more than two decimal characters such as '4.32.1'.")
 
-            if any([len(x[1]) > 2 for x in df1.values]):
+            if any([(len(x) == 2) and (len(x[1]) > 2) for x in split_values]):
                 raise qa_errors.InvalidValueFoundError(
                     f"Some of the values in '{col_name}' column have "
                     f"more than two decimal digits such as '4.321'.")
@@ -890,12 +932,17 @@ class CommonCompHarmQAFunctions:
         """
         non_alpha_numerical_chars_pattern = re.compile(r'\W', re.UNICODE)
         for col_name in list_of_col_names:
-            orig_values = set(df[col_name].values)
-            simplified_values = {non_alpha_numerical_chars_pattern.sub('', s).lower()
-                                 for s in orig_values}
+            orig_values = pd.Series(pd.unique(df[col_name])).astype(object)
+            if pd.api.types.infer_dtype(orig_values, skipna=False) == 'string':
+                simplified_values = orig_values.str.replace(
+                    non_alpha_numerical_chars_pattern, '').str.lower().unique()
+            else:
+                # Raises the same error as before for non-string values
+                simplified_values = {non_alpha_numerical_chars_pattern.sub('', s).lower()
+                                     for s in orig_values}
             if len(orig_values) != len(simplified_values):
                 err_msg = ''.join(["Possible duplicates found in the values of column, '",
-                                   col_name, "':\n", str(sorted(orig_values)),
+                                   col_name, "':\n", str(sorted(orig_values.tolist())),
                                    ".\nPlease update/map these values to new, standardized values."
                                    ])
                 raise qa_errors.PossibleDuplicateError(err_msg)
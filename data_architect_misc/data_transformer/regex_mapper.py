@@ -0,0 +1,157 @@
+"""
+RegexMapper applies a dictionary of regular-expression-based
+mappings (like comp_harm_constants.CATEGORY_MAPPINGS) to a column
+by resolving each *distinct* value in the column only once and
+broadcasting the results back to the rows.
+
+Raw columns like category or advertiser names have a few hundred
+distinct values in hundreds of thousands of rows, so this is much
+faster than running every regex over every row as in
+Series.replace(regex=dict) or Series.str.contains(pattern).
+Results are also cached across chunks and input files (per process).
+Columns of category dtype (see category_dtype.py) already hold their
+distinct values, so they are resolved without factorizing and the
+results are returned as category columns as well.
+
+Usage example:
+>> mapper = get_regex_mapper(comp_harm_constants.CATEGORY_MAPPINGS)
+>> df['HARMONIZED_CATEGORY'] = mapper.replace(df['RAW_CATEGORY'])
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+import category_dtype
+
+# Cached mappers keyed by the (pattern, value) pairs of the dictionary
+_regex_mappers = {}
+
+
+def get_regex_mapper(dictionary_of_regex_mappings):
+    """
+    Returns the RegexMapper for the dictionary of mappings, creating
+    one if we haven't seen the same mappings in this process before.
+    """
+    key = tuple(dictionary_of_regex_mappings.items())
+    if key not in _regex_mappers:
+        _regex_mappers[key] = RegexMapper(dictionary_of_regex_mappings)
+    return _regex_mappers[key]
+
+
+class RegexMapper:
+    """
+    Pre-compiled regex mappings with caches of the results
+    for the values that have already been resolved.
+    """
+    # We clear a result cache when it grows beyond this many values
+    # so that columns with (almost) unique values, like IDs, don't
+    # make it grow without limit across input files.
+    MAX_CACHED_VALUES = 200000
+
+    def __init__(self, dictionary_of_regex_mappings):
+        self.patterns = [(re.compile(pattern), new_value)
+                         for pattern, new_value in dictionary_of_regex_mappings.items()]
+        self.replaced_values = {}
+        self.last_matched_values = {}
+
+    def _replace_value(self, value):
+        """
+        Mimics Series.replace(regex=dict) for a single value: for each
+        pattern (in the order given in the dictionary) that matches
+        the *original* value, the matched part of the value *as
+        replaced so far* is substituted with the new value.
+        """
+        if not isinstance(value, str):
+            return value
+
+        new_value = value
+        for regex, replacement in self.patterns:
+            if regex.search(value):
+                new_value = regex.sub(replacement, new_value)
+        return new_value
+
+    def _get_last_matched_value(self, value):
+        """
+        Returns the new value of the *last* pattern that matches
+        the value (like applying Series.str.contains(pattern) for
+        each pattern in turn), or None if no pattern matches.
+        """
+        if not isinstance(value, str):
+            return None
+
+        for regex, replacement in reversed(self.patterns):
+            if regex.search(value):
+                return replacement
+        return None
+
+    def _resolve_unique_values(self, series, resolve_value, cache):
+        """
+        Factorizes the series into codes and unique values, resolves
+        each unique value with the cache (or resolve_value function
+        for the ones not in it) and returns the array of codes, the
+        unique values and the array of results for the unique values.
+        REF: https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.factorize.html
+        """
+        if category_dtype.is_category(series):
+            # Category columns already have their distinct values
+            # (categories) and the codes to them, so there's
+            # nothing to factorize
+            codes, uniques = series.cat.codes.values, series.cat.categories
+        else:
+            codes, uniques = pd.factorize(series)
+        if len(cache) > self.MAX_CACHED_VALUES:
+            cache.clear()
+
+        results = np.empty(len(uniques), dtype=object)
+        for i, value in enumerate(uniques):
+            if not isinstance(value, str):
+                # Don't cache these because 1, 1.0 and True
+                # would be the same key in the dictionary
+                results[i] = resolve_value(value)
+                continue
+            if value not in cache:
+                cache[value] = resolve_value(value)
+            results[i] = cache[value]
+        return codes, uniques, results
+
+    def replace(self, series, value_if_unchanged=None):
+        """
+        Returns a new series with the same values as
+        series.replace(regex=dictionary_of_regex_mappings).
+        Missing values (NaN/None) are left as they are.
+
+        If value_if_unchanged is given, the values that are the
+        same after the replacement are set to it instead.
+
+        A series of category dtype is returned as category dtype.
+        """
+        codes, uniques, results = self._resolve_unique_values(
+            series, self._replace_value, self.replaced_values)
+        if not len(results):
+            return series.copy()
+
+        if value_if_unchanged is not None:
+            results[results == np.asarray(uniques, dtype=object)] = value_if_unchanged
+
+        if category_dtype.is_category(series):
+            return category_dtype.apply_to_distinct_values(
+                series, lambda s: pd.Series(results, index=s.index))
+
+        values = np.where(codes == -1, series.values, results[codes])
+        return pd.Series(values, index=series.index, name=series.name)
+
+    def get_last_matched_values(self, series):
+        """
+        Returns a boolean mask of the rows in which at least one of
+        the patterns matches the value, and a series with the new
+        value of the last matching pattern for each of these rows.
+        """
+        codes, _, results = self._resolve_unique_values(
+            series, self._get_last_matched_value, self.last_matched_values)
+        if not len(results):
+            return np.zeros(len(series), dtype=bool), series.copy()
+
+        is_matched = np.array([r is not None for r in results], dtype=bool)
+        mask = (codes != -1) & is_matched[codes]
+        return mask, pd.Series(results[codes], index=series.index)
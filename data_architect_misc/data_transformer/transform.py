@@ -9,12 +9,17 @@ import argparse
 import datetime
 import dateutil.relativedelta
 import logging
+import multiprocessing
 import os
 import sys
+import time
+import traceback
 
 from constants.transform_constants import KEY_CURRENT_INPUT_FILE
 from data_readers.file_data_reader import FileDataReader
 import transform_errors
+from transform_pipeline import TransformPipeline
+from transform_profiler import TransformProfiler, STAGE_READ, STAGE_WRITE
 import transform_utils
 
 DESC = """This program is intended to take a JSON configuration file 
@@ -33,9 +38,22 @@ in the config file, run the program like below:
 \nUsage example #2 - Alternatively input file's path and name can be 
 provided with 'i' flag to the program as below:
     >> python transform.py -c .\configs\china\config.json 
-    -i ./input/switzerland/Monthly_Spend_20200229.xlsx"""
+    -i ./input/switzerland/Monthly_Spend_20200229.xlsx
 
-C_FLAG_HELP_TEXT = """[Required] Configuration file (with full or relative path).
+\nUsage example #3 - To transform the input files in parallel, provide
+the number of worker processes with 'workers' flag. More than one config
+file can be provided with 'c' flag (in any mode) like below:
+    >> python transform.py -c .\configs\china\config.json
+    .\configs\japan\config.json --workers 4
+
+\nUsage example #4 - To find out which functions (or reading and writing
+of the data) take the most time, provide 'profile' flag with the number of
+slowest steps to show. The time taken, row counts and memory usage for
+each step and chunk will also be written to JSON and CSV files in
+./output/profiles folder:
+    >> python transform.py -c .\configs\china\config.json --profile 20"""
+
+C_FLAG_HELP_TEXT = """[Required] Configuration file(s) (with full or relative path).
 E.g., python transform.py -c .\configs\china\config.json"""
 
 I_FLAG_HELP_TEXT = """[Optional] Input file (with full or relative path) that 
@@ -43,78 +61,310 @@ has data to which the functions defined in the config file will be applied to.
 E.g., python transform.py -i ./input/switzerland/Monthly_Spend_20200229.xlsx 
 -c .\configs\china\config.json"""
 
+WORKERS_FLAG_HELP_TEXT = """[Optional] Number of worker processes to transform
+input files with. Each (config, input file) pair is processed by a worker
+and failure in one pair does NOT stop the others from being processed.
+Output file names include the input file name in this mode.
+Do NOT use it for a config writing several input files to one SQL table.
+E.g., python transform.py -c .\configs\china\config.json --workers 4"""
+
+PROFILE_FLAG_HELP_TEXT = """[Optional] Record time taken, row counts and memory
+usage of each function (and of reading and writing data) for each chunk,
+write them to JSON and CSV reports and show the top N (default: 10) slowest
+steps across all configs at the end.
+E.g., python transform.py -c .\configs\china\config.json --profile 20"""
+DEFAULT_PROFILE_TOP_N = 10
+
+LOG_FORMAT = "\n%(levelname)s: %(message)s"
+LOG_FORMAT_WITH_PREFIX = "\n%(levelname)s: [{}] %(message)s"
+
+logger = logging.getLogger(__name__)  # ('transform.py')
+
+
+def _get_unit_name(config_file, config_idx, input_file):
+    """Name to tell (config, input file) pairs apart in logs and reports."""
+    return f"{os.path.basename(config_file)}#{config_idx}:{os.path.basename(input_file)}"
+
+
+def _read_next_dataframe(reader, profiler):
+    """Reads the next chunk and records the time taken, if profiling."""
+    if not profiler:
+        return reader.read_next_dataframe()
+
+    profiler.start_chunk()
+    start = time.perf_counter()
+    df = reader.read_next_dataframe()
+    profiler.record(STAGE_READ, time.perf_counter() - start,
+                    rows_out=df.shape[0])
+    return df
+
+
+def build_transform_pipeline(config, profiler=None):
+    """
+    Instantiates the transform functions class of the config and
+    compiles the functions defined in the config into a pipeline.
+    This is done once per config and the pipeline is shared by all
+    the input files of the config.
+    """
+    # To optimize the application of custom function to Pandas' dataframe, read:
+    # REF: https://archive.st/7w9d (also available at: http://archive.ph/qXKXC)
+    transform_funcs_kls = transform_utils.instantiate_transform_functions_class(config)
+
+    # Resolve and validate the functions in the config before reading any data
+    return TransformPipeline(config, transform_funcs_kls, profiler)
+
+
+def _log_step_timings(pipeline):
+    logger.info("Time taken by each function (calls, seconds):\n" + "\n".join(
+        [f"{calls:>6} {secs:>10.2f}  {func_name}"
+         for func_name, calls, secs in pipeline.get_step_timings()]))
+
+
+def transform_input_file(config, input_file, pipeline, profiler=None,
+                         include_input_file_in_output_name=False):
+    """
+    Reads the data in the input file chunk by chunk, applies
+    the functions defined in the config (compiled into the pipeline
+    by build_transform_pipeline) to each chunk and writes the
+    result to the output (if instructed in the config).
+
+    If TransformProfiler is given, time taken to read and write
+    each chunk and to apply each function is recorded in it.
+
+    If include_input_file_in_output_name is True, the name of the
+    input file (without extension) is added to the output file names
+    so that input files processed at the same time (by workers) with
+    the same config do NOT overwrite each other's output files.
+    """
+    # To be convenient in some situations, we will add the currently
+    # processed/transformed file name (full path and name info)
+    config[KEY_CURRENT_INPUT_FILE] = input_file
+
+    reader = FileDataReader(input_file, config).get_data_reader()
+    write_data = transform_utils.get_write_data_decision(config)
+    data_writer_kls = transform_utils.instantiate_data_writer_class(config)
+
+    output_name_prefix = ''
+    if include_input_file_in_output_name:
+        output_name_prefix = f"{os.path.splitext(os.path.basename(input_file))[0]}_"
+
+    row_count = 0
+    cur_df = _read_next_dataframe(reader, profiler)
+
+    while not cur_df.empty:
+        cur_df = pipeline.apply(cur_df)
+
+        if write_data:
+            data_writer_kls.set_output_file_name_suffix(
+                f"{output_name_prefix}rows_{row_count}_{row_count+cur_df.shape[0]}")
+            row_count = row_count+cur_df.shape[0]
+            start = time.perf_counter()
+            data_writer_kls.write_data(cur_df)
+            if profiler:
+                profiler.record(STAGE_WRITE, time.perf_counter() - start,
+                                rows_in=cur_df.shape[0])
+
+        cur_df = _read_next_dataframe(reader, profiler)
+
+
+def _init_worker():
+    """
+    Worker processes started with 'spawn' (e.g., on Windows)
+    do NOT inherit the logging config of the parent process.
+    """
+    if not logging.getLogger().handlers:
+        logging.basicConfig(stream=sys.stdout, level=logging.INFO,
+                            format=LOG_FORMAT)
+
+
+def _set_log_prefix(prefix):
+    """
+    Prefixes every log message of the current (worker) process
+    with the given string so that we can tell which input file
+    the message is about when several workers log to the same
+    console.
+    """
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter(
+            LOG_FORMAT_WITH_PREFIX.format(prefix)))
+
+
+def _get_units_of_work(config_files, input_file, profile):
+    """
+    Returns the list of (unit name, config, input file, profile)
+    tuples to be sent to the workers and the list of (unit name, error
+    message) tuples for the configs we cannot even start with
+    (e.g., config file that cannot be loaded, invalid config
+    or no input file found).
+    """
+    units, failures = [], []
+    for config_file in config_files:
+        # We catch every error here (e.g., syntax error in the JSON file)
+        # because one bad config must NOT abort the others
+        try:
+            configs = transform_utils.load_config(config_file)
+        except Exception as e:
+            logger.error(f"Failed to load this config file: {config_file}\n"
+                         f"{traceback.format_exc()}")
+            failures.append((os.path.basename(config_file), f"{type(e).__name__}: {e}"))
+            continue
+
+        for config_idx, config in enumerate(configs):
+            unit_prefix = f"{os.path.basename(config_file)}#{config_idx}"
+            try:
+                if input_file:
+                    config = transform_utils.insert_input_file_keys_values_to_config_json(
+                        input_file, config)
+                transform_utils.validate_configurations(config)
+                for f in transform_utils.get_input_files(config):
+                    units.append((_get_unit_name(config_file, config_idx, f),
+                                  config, f, profile))
+            except Exception as e:
+                logger.error(f"Failed to prepare this config: {unit_prefix}\n"
+                             f"{traceback.format_exc()}")
+                failures.append((unit_prefix, f"{type(e).__name__}: {e}"))
+
+    return units, failures
+
+
+def _transform_unit_of_work(unit):
+    """
+    Transforms one (config, input file) pair in a worker process
+    and returns (unit name, seconds taken, error message, profile
+    records). Error message is None if the input file is transformed
+    successfully and profile records are empty if not profiling.
+    """
+    unit_name, config, input_file, profile = unit
+    _set_log_prefix(unit_name)
+    profiler = TransformProfiler() if profile else None
+    if profiler:
+        profiler.start_unit(unit_name)
+
+    start = time.perf_counter()
+    try:
+        # Each worker process gets one input file of the config,
+        # so the pipeline cannot be shared with its other input files
+        pipeline = build_transform_pipeline(config, profiler)
+        transform_input_file(config, input_file, pipeline, profiler,
+                             include_input_file_in_output_name=True)
+        _log_step_timings(pipeline)
+    except Exception:
+        # We catch every error here because one
+        # bad input file must NOT abort the others
+        err_msg = traceback.format_exc()
+        logger.error(f"Failed to transform this file: {input_file}\n{err_msg}")
+    else:
+        err_msg = None
+
+    records = profiler.records if profiler else []
+    return unit_name, time.perf_counter() - start, err_msg, records
+
+
+def _log_summary(results, failures):
+    """Logs time taken by, and status of, each unit of work."""
+    lines = [f"{'SECONDS':>10}  {'STATUS':<7} UNIT"]
+    for unit_name, secs, err_msg, _ in sorted(results, key=lambda r: -r[1]):
+        lines.append(f"{secs:>10.1f}  {'FAILED' if err_msg else 'OK':<7} {unit_name}")
+    for unit_name, err_msg in failures:
+        lines.append(f"{'-':>10}  {'FAILED':<7} {unit_name}: {err_msg.strip()}")
+
+    logger.info("Summary of the transform run:\n" + "\n".join(lines))
+
+
+def transform_in_parallel(config_files, input_file, workers, profiler=None):
+    """
+    Sends each (config, input file) pair to a pool of worker
+    processes and returns the number of pairs that failed.
+    Each worker creates its own reader, writer and transform
+    functions objects for each pair it processes.
+
+    If TransformProfiler is given, profile records collected
+    by the workers are merged into it.
+    """
+    units, failures = _get_units_of_work(config_files, input_file,
+                                         profiler is not None)
+    logger.info(f"Transforming {len(units)} input file(s) with {workers} workers.")
+
+    # REF: https://docs.python.org/3/library/multiprocessing.html#module-multiprocessing.pool
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker) as p:
+        results = list(p.imap_unordered(_transform_unit_of_work, units))
+
+    if profiler:
+        for r in results:
+            profiler.add_records(r[3])
+
+    _log_summary(results, failures)
+    return len(failures) + len([r for r in results if r[2]])
+
+
 if __name__ == '__main__':
     # 0. Set logging config
     # REF 1: https://stackoverflow.com/a/15729700/1330974
     # REF 2a: https://web.archive.org/save/https://www.loggly.com/ultimate-guide/python-logging-basics/
     # REF 2b: http://archive.ph/0Uf6u
     logging.basicConfig(stream=sys.stdout, level=logging.INFO,
-                        format="\n%(levelname)s: %(message)s")
-    logger = logging.getLogger(__name__)  # ('transform.py')
+                        format=LOG_FORMAT)
 
     # 1. Process arguments passed into the program
     parser = argparse.ArgumentParser(
         description=DESC,
         formatter_class=argparse.RawTextHelpFormatter,
         usage=argparse.SUPPRESS)
-    parser.add_argument('-c', required=True, type=str,
+    parser.add_argument('-c', required=True, type=str, nargs='+',
                         help=C_FLAG_HELP_TEXT)
     parser.add_argument('-i', required=False, type=str,
                         help=I_FLAG_HELP_TEXT)
+    parser.add_argument('--workers', required=False, type=int,
+                        help=WORKERS_FLAG_HELP_TEXT)
+    parser.add_argument('--profile', required=False, type=int, nargs='?',
+                        const=DEFAULT_PROFILE_TOP_N,
+                        help=PROFILE_FLAG_HELP_TEXT)
     args = parser.parse_args()
 
-    # 2. Make sure JSON configuration file exists
-    if not os.path.exists(args.c):
+    # 2. Make sure JSON configuration file(s) exist
+    if not all(os.path.exists(c) for c in args.c):
         raise transform_errors.ConfigFileError()
 
-    # 3. Iterate through each transform procedure in config file
-    start_dt = datetime.datetime.now()
-    for config in transform_utils.load_config(args.c):
-        if args.i:
-            # This hack allows user to provide input file as commandline parameter
-            config = transform_utils.insert_input_file_keys_values_to_config_json(args.i, config)
-
-        # Make sure config JSON has no conflicting keys and invalid data types
-        transform_utils.validate_configurations(config)
-
-        for input_file in transform_utils.get_input_files(config):
-            reader = FileDataReader(input_file, config).get_data_reader()
-            write_data = transform_utils.get_write_data_decision(config)
-            data_writer_kls = transform_utils.instantiate_data_writer_class(config)
+    profiler = TransformProfiler() if args.profile else None
 
-            # To be convenient in some situations, we will add the currently
-            # processed/transformed file name (full path and name info)
-            config[KEY_CURRENT_INPUT_FILE] = input_file
+    start_dt = datetime.datetime.now()
+    if args.workers:
+        # 3a. Transform each (config, input file) pair in a pool of workers
+        failure_count = transform_in_parallel(args.c, args.i, args.workers, profiler)
 
-            # To optimize the application of custom function to Pandas' dataframe, read:
-            # REF: https://archive.st/7w9d (also available at: http://archive.ph/qXKXC)
-            transform_funcs_kls = transform_utils.instantiate_transform_functions_class(config)
+        if profiler:
+            profiler.write_report()
+            profiler.log_slowest_steps(args.profile)
 
-            row_count = 0
-            cur_df = reader.read_next_dataframe()
+        td = dateutil.relativedelta.relativedelta (datetime.datetime.now(), start_dt)
+        logger.info(f"Transform script finished and from start to completion it took "
+                    f"{td.hours} hrs, {td.minutes} mins, and {td.seconds} secs.")
+        sys.exit(1 if failure_count else 0)
 
-            while not cur_df.empty:
-                for func_and_params in transform_utils.get_functions_to_apply(config):
-                    # logger.info(f"Invoking function:{json.dumps(func_and_params, sort_keys=True, indent=4)}")
-                    logger.info(f"Invoking function: {func_and_params['function_name']}")
-                    func_name = transform_utils.get_function_name(func_and_params)
-                    func_args = transform_utils.get_function_args(func_and_params)
-                    func_kwargs = transform_utils.get_function_kwargs(func_and_params)
+    # 3. Iterate through each transform procedure in config file(s)
+    for config_file in args.c:
+        for config_idx, config in enumerate(transform_utils.load_config(config_file)):
+            if args.i:
+                # This hack allows user to provide input file as commandline parameter
+                config = transform_utils.insert_input_file_keys_values_to_config_json(args.i, config)
 
-                    cur_df = getattr(transform_funcs_kls,
-                                     func_name)(cur_df, *func_args, **func_kwargs)
+            # Make sure config JSON has no conflicting keys and invalid data types
+            transform_utils.validate_configurations(config)
 
-                if write_data:
-                    data_writer_kls.set_output_file_name_suffix(
-                        f"rows_{row_count}_{row_count+cur_df.shape[0]}")
-                    row_count = row_count+cur_df.shape[0]
-                    data_writer_kls.write_data(cur_df)
+            pipeline = build_transform_pipeline(config, profiler)
+            for input_file in transform_utils.get_input_files(config):
+                if profiler:
+                    profiler.start_unit(_get_unit_name(config_file, config_idx, input_file))
+                transform_input_file(config, input_file, pipeline, profiler)
+            _log_step_timings(pipeline)
 
-                cur_df = reader.read_next_dataframe()
+            td = dateutil.relativedelta.relativedelta (datetime.datetime.now(), start_dt)
+            logger.info(f"Transform script finished and from start to completion it took "
+                        f"{td.hours} hrs, {td.minutes} mins, and {td.seconds} secs.")
 
-        td = dateutil.relativedelta.relativedelta (datetime.datetime.now(), start_dt)
-        logger.info(f"Transform script finished and from start to completion it took "
-                    f"{td.hours} hrs, {td.minutes} mins, and {td.seconds} secs.")
+    if profiler:
+        profiler.write_report()
+        profiler.log_slowest_steps(args.profile)
 
     # TODO : use pydoc to generate documentation?
     # >> python -m pydoc -w transform
@@ -0,0 +1,559 @@
+"""
+Read 'DESC' in the code below to see what this script is for.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import datetime
+import dateutil.relativedelta
+import glob
+import hashlib
+import inspect
+import io
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+
+import pandas as pd
+
+from constants.transform_constants import KEY_CURRENT_INPUT_FILE, KEY_FUNCTIONS_TO_APPLY, \
+    KEY_CUSTOM_TRANSFORM_FUNCTIONS_FILE, DEFAULT_COMMON_TRANSFORM_FUNCTIONS_FILE, \
+    KEY_DATA_WRITER_MODULE_FILE, DEFAULT_DATA_WRITER_MODULE_FILE
+from data_readers.file_data_reader import FileDataReader
+from data_readers.pandas_file_data_reader import PandasFileDataReader
+from data_writers.arrow_file_data_writer import ArrowFileDataWriter
+from data_writers.excel_data_writer import ExcelDataWriter
+import transform
+import transform_errors
+from transform_pipeline import TransformPipeline
+import transform_utils
+
+DESC = """This program runs a multi-step pipeline (e.g., transforming
+Brazil's NATIONAL, NonOpenTV, PayTV and Merchandising data and then
+combining them) described in a JSON manifest file like below:
+    {
+      "cache_folder_path": "./output/LATAM_Brazil/dag_cache",
+      "steps": [
+        {"name": "national",
+         "config_file": "./configs/LATAM_Brazil/step1_....json",
+         "input_file": "./input/LATAM_Brazil/NATIONAL_*.xlsx"},
+        ...
+        {"name": "combine",
+         "config_file": "./configs/LATAM_Brazil/step6_....json",
+         "depends_on": ["national", "non_open_tv", "pay_tv", "merchandising"],
+         "skip_functions": ["create_new_dataframe_from_input_CSV_files"],
+         "spill": true}
+      ]
+    }
+Each step is one transform procedure in a config file (the first one,
+unless 'config_index' is given). A step without 'depends_on' reads its
+input file(s) like transform.py does, from 'input_file' (if given) or
+from the input folder and file name in its config. A step with 'depends_on' gets the
+outputs of those steps (concatenated in the order listed) as its input
+dataframe, straight from memory, without reading them back from the
+files in ./output. The values are converted as if they were, though
+(e.g., '' for missing values unless the step sets 'keep_default_na' to
+true, and strings unless the whole column is numbers for the outputs of
+steps writing CSV files).
+'skip_functions' are dropped from the step's config
+(e.g., the functions that used to load those files) and 'config_overrides'
+are merged into it (e.g., {"write_output": false} for steps whose output
+file is not needed anymore).
+
+Steps that do not depend on each other run in parallel when 'workers'
+flag is given. A step is skipped if its config, transform functions
+file, input files (size and modified time) and the steps it depends on
+have not changed since the last run. To feed a skipped step's output to
+a step that does have to run, the skipped step's output must have been
+spilled to a Parquet file in the cache folder (with 'spill' in the
+manifest or 'spill' flag); otherwise the skipped step is run again.
+\nUsage example:
+    >> python transform_dag.py -m .\configs\LATAM_Brazil\pipeline.json --workers 4"""
+
+M_FLAG_HELP_TEXT = """[Required] Pipeline manifest file (with full or relative path).
+E.g., python transform_dag.py -m .\configs\LATAM_Brazil\pipeline.json"""
+
+WORKERS_FLAG_HELP_TEXT = """[Optional] Number of worker processes to run the
+steps that do not depend on each other with.
+E.g., python transform_dag.py -m .\configs\LATAM_Brazil\pipeline.json --workers 4"""
+
+FORCE_FLAG_HELP_TEXT = """[Optional] Run every step even if nothing has
+changed since the last run."""
+
+SPILL_FLAG_HELP_TEXT = """[Optional] Spill the output of every step to a
+Parquet file in the cache folder (needs pyarrow)."""
+
+# Keys in the pipeline manifest file
+KEY_CACHE_FOLDER_PATH = 'cache_folder_path'
+KEY_STEPS = 'steps'
+KEY_STEP_NAME = 'name'
+KEY_CONFIG_FILE = 'config_file'
+KEY_CONFIG_INDEX = 'config_index'
+KEY_INPUT_FILE = 'input_file'
+KEY_DEPENDS_ON = 'depends_on'
+KEY_SKIP_FUNCTIONS = 'skip_functions'
+KEY_CONFIG_OVERRIDES = 'config_overrides'
+KEY_SPILL = 'spill'
+
+DEFAULT_CACHE_FOLDER_PATH = os.path.join(os.getcwd(), 'output', 'dag_cache')
+STATE_FILE_NAME = 'dag_state.json'
+SPILL_FILE_EXTENSION = '.parquet'
+
+STATUS_OK = 'OK'
+STATUS_SKIPPED = 'SKIPPED'
+STATUS_FAILED = 'FAILED'
+STATUS_NOT_RUN = 'NOT RUN'
+
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(manifest_file):
+    """
+    Loads the manifest file and returns the steps in an order in
+    which every step comes after the steps it depends on.
+    """
+    manifest = transform_utils.load_config(manifest_file)
+    steps = manifest.get(KEY_STEPS, list())
+    if not steps:
+        raise transform_errors.ListEmptyError(KEY_STEPS)
+
+    steps_by_name = {}
+    for step in steps:
+        for k in [KEY_STEP_NAME, KEY_CONFIG_FILE]:
+            if k not in step:
+                raise transform_errors.RequiredKeyNotFound(step, [k])
+        if step[KEY_STEP_NAME] in steps_by_name:
+            raise transform_errors.PipelineManifestError(
+                f"More than one step is named '{step[KEY_STEP_NAME]}'.")
+        steps_by_name[step[KEY_STEP_NAME]] = step
+
+    for step in steps:
+        for dep in step.get(KEY_DEPENDS_ON, list()):
+            if dep not in steps_by_name:
+                raise transform_errors.PipelineManifestError(
+                    f"Step '{step[KEY_STEP_NAME]}' depends on step '{dep}', "
+                    f"which is not in the manifest.")
+
+    # Topological sort (depth first) that also catches cycles
+    ordered_steps, state = [], {}  # state: 1 = visiting, 2 = done
+    def visit(name):
+        if state.get(name) == 1:
+            raise transform_errors.PipelineManifestError(
+                f"Steps depend on each other in a cycle through step '{name}'.")
+        if state.get(name) == 2:
+            return
+        state[name] = 1
+        for dep in steps_by_name[name].get(KEY_DEPENDS_ON, list()):
+            visit(dep)
+        state[name] = 2
+        ordered_steps.append(steps_by_name[name])
+
+    for step in steps:
+        visit(step[KEY_STEP_NAME])
+
+    cache_folder = manifest.get(KEY_CACHE_FOLDER_PATH, DEFAULT_CACHE_FOLDER_PATH)
+    return ordered_steps, cache_folder
+
+
+def get_step_config(step):
+    """
+    Returns the config of the step with 'config_overrides' merged into
+    it and 'skip_functions' removed from its functions to apply.
+    """
+    config = transform_utils.load_config(step[KEY_CONFIG_FILE])[step.get(KEY_CONFIG_INDEX, 0)]
+    config.update(step.get(KEY_CONFIG_OVERRIDES, dict()))
+    if KEY_INPUT_FILE in step:
+        config = transform_utils.insert_input_file_keys_values_to_config_json(
+            step[KEY_INPUT_FILE], config)
+
+    skip_functions = set(step.get(KEY_SKIP_FUNCTIONS, list()))
+    config[KEY_FUNCTIONS_TO_APPLY] = [
+        f for f in config.get(KEY_FUNCTIONS_TO_APPLY, list())
+        if transform_utils.get_function_name(f) not in skip_functions]
+    return config
+
+
+def _hash_file(file_path_and_name):
+    with open(file_path_and_name, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _get_class_module_files(module_file):
+    """
+    Returns the module files of the primary class in the module file
+    and of all the classes it inherits from (e.g., a country's transform
+    functions class inherits most of its functions from the common
+    transform and QA functions classes).
+    """
+    if not os.path.isfile(module_file):
+        return []
+    try:
+        kls = transform_utils.instantiate_class_in_module_file(module_file)
+    except ImportError:
+        # The step will fail with this error when it runs
+        return [os.path.abspath(module_file)]
+    module_files = [inspect.getsourcefile(k) for k in inspect.getmro(kls) if k is not object]
+    return sorted(set(os.path.abspath(f) for f in module_files if f))
+
+
+def get_step_fingerprint(step, config, dep_fingerprints):
+    """
+    Hash of everything a step's output depends on: its config, the
+    code of its transform functions (including the classes they inherit
+    from), data readers and data writer, its input files (path, size and
+    modified time) and the fingerprints of the steps it depends on.
+    """
+    input_files = []
+    if not step.get(KEY_DEPENDS_ON):
+        input_files = [(f, os.path.getsize(f), os.path.getmtime(f))
+                       for f in sorted(transform_utils.get_input_files(config))]
+
+    funcs_file = config.get(KEY_CUSTOM_TRANSFORM_FUNCTIONS_FILE,
+                            DEFAULT_COMMON_TRANSFORM_FUNCTIONS_FILE)
+    writer_file = config.get(KEY_DATA_WRITER_MODULE_FILE, DEFAULT_DATA_WRITER_MODULE_FILE)
+    # Which reader is used depends on the input file's type, so all of them count
+    reader_files = sorted(glob.glob(os.path.join(os.path.dirname(inspect.getsourcefile(FileDataReader)), '*.py')))
+    return hashlib.sha256(json.dumps({
+        'config': config,
+        'transform_functions': {f: _hash_file(f) for f in _get_class_module_files(funcs_file)},
+        'data_readers': {f: _hash_file(f) for f in reader_files},
+        'data_writer': {f: _hash_file(f) for f in _get_class_module_files(writer_file)},
+        'input_files': input_files,
+        'depends_on': dep_fingerprints,
+    }, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def to_hand_off_dataframe(df, config, dependent_config):
+    """
+    Returns the output dataframe of a step (run with the config) as the
+    step depending on it (run with the dependent_config) gets it.
+    Before transform_dag.py, the dependent steps read the output files
+    back with the data readers, so the values they got depended on the
+    data writer of the step and on the 'keep_default_na' of the reader:
+      - Parquet/Feather files keep the dataframe as it is.
+      - Excel cells keep their types, but floats are rounded to the 15
+        significant digits Excel keeps and whole numbers in float
+        columns turn into int. Missing values turn into '' unless
+        'keep_default_na' is true.
+      - CSV text (the default writer) gives numbers only in the columns
+        with nothing but numbers, strings elsewhere and column names as
+        strings. Missing values (and strings like 'NA' if
+        'keep_default_na' is true) are read as NaN, otherwise ''. We do
+        the same by writing the dataframe to CSV text in memory and
+        reading it back.
+    """
+    keep_default_na = dependent_config.get(PandasFileDataReader.KEY_KEEP_DEFAULT_NA,
+                                           PandasFileDataReader.DEFAULT_KEEP_DEFAULT_NA)
+    data_writer_kls = transform_utils.instantiate_class_in_module_file(
+        config.get(KEY_DATA_WRITER_MODULE_FILE, DEFAULT_DATA_WRITER_MODULE_FILE))
+    if issubclass(data_writer_kls, ArrowFileDataWriter):
+        return df.reset_index(drop=True)
+
+    if issubclass(data_writer_kls, ExcelDataWriter):
+        df = df.reset_index(drop=True)
+        for col_name in df.columns:
+            col = df[col_name]
+            if pd.api.types.is_float_dtype(col):
+                col = col.map('{:.15g}'.format).astype(float)
+            is_missing = col.isna()
+            if is_missing.any():
+                df[col_name] = col if keep_default_na else col.astype(object).where(~is_missing, '')
+            elif pd.api.types.is_float_dtype(col) and (col % 1 == 0).all():
+                df[col_name] = col.astype('int64')
+            else:
+                df[col_name] = col
+        return df
+
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer, keep_default_na=keep_default_na, low_memory=False)
+
+
+def run_step(step, config, input_dfs, base_input_file, spill_file):
+    """
+    Runs one step (in a worker process or in this one) and returns
+    (step name, output dataframe, current input file, seconds taken,
+    error message). Error message is None if the step succeeded.
+    """
+    step_name = step[KEY_STEP_NAME]
+    start = time.perf_counter()
+    try:
+        transform_funcs_kls = transform_utils.instantiate_transform_functions_class(config)
+        pipeline = TransformPipeline(config, transform_funcs_kls) \
+            if config[KEY_FUNCTIONS_TO_APPLY] else None
+
+        if input_dfs is None:
+            # Read the input file(s) chunk by chunk like transform.py
+            out_dfs = []
+            input_files = transform_utils.get_input_files(config)
+            base_input_file = input_files[0]
+            for input_file in input_files:
+                config[KEY_CURRENT_INPUT_FILE] = input_file
+                reader = FileDataReader(input_file, config).get_data_reader()
+                cur_df = reader.read_next_dataframe()
+                while not cur_df.empty:
+                    out_dfs.append(pipeline.apply(cur_df) if pipeline else cur_df)
+                    cur_df = reader.read_next_dataframe()
+            df = pd.concat(out_dfs, ignore_index=True, sort=False) if out_dfs else pd.DataFrame()
+        else:
+            # Functions that need an input file name (e.g., to check
+            # the date range in it) get the first dependency's
+            config[KEY_CURRENT_INPUT_FILE] = base_input_file
+            df = pd.concat(input_dfs, ignore_index=True, sort=False)
+            if pipeline:
+                df = pipeline.apply(df)
+
+        if transform_utils.get_write_data_decision(config):
+            data_writer_kls = transform_utils.instantiate_data_writer_class(config)
+            data_writer_kls.set_output_file_name_suffix(f"rows_0_{df.shape[0]}")
+            data_writer_kls.write_data(df)
+
+    except Exception:
+        # One failed step must NOT stop the steps that do not depend on it
+        err_msg = traceback.format_exc()
+        logger.error(f"Failed to run this step: {step_name}\n{err_msg}")
+        return step_name, None, base_input_file, time.perf_counter() - start, err_msg
+
+    if spill_file:
+        spill_output(df, spill_file)
+
+    return step_name, df, base_input_file, time.perf_counter() - start, None
+
+
+def spill_output(df, spill_file):
+    """
+    Writes the output dataframe of a step to the spill file. Object
+    columns that mix strings with other values (e.g., numbers and the
+    empty strings we read for empty cells) cannot be stored as one
+    Parquet type, so their values are written as strings like
+    ArrowFileDataWriter does. The step has already succeeded at this
+    point, so failing to spill only means that the step will be run
+    again (instead of being read from the spill file) next time.
+    """
+    try:
+        df = df.copy()
+        for col_name in df.columns:
+            col = df[col_name]
+            if col.dtype == object and pd.api.types.infer_dtype(col, skipna=True) not in ('string', 'empty'):
+                df[col_name] = col.where(col.isna(), col.astype(str))
+        df.to_parquet(spill_file, index=False)
+    except Exception:
+        logger.warning(f"Failed to spill the output to: {spill_file}\n{traceback.format_exc()}")
+        if os.path.isfile(spill_file):
+            os.remove(spill_file)
+
+
+def _run_step_in_worker(*args):
+    """Runs the step in a worker process with its name in every log message."""
+    # ProcessPoolExecutor's 'initializer' needs Python 3.7+, so the
+    # worker's logging is set up here instead
+    transform._init_worker()
+    transform._set_log_prefix(args[0][KEY_STEP_NAME])
+    return run_step(*args)
+
+
+class TransformDAG:
+    """
+    Runs the steps in a pipeline manifest in the order of their
+    dependencies and keeps the output dataframe of each step in
+    memory only until every step that depends on it has started.
+
+    Fingerprints of the steps that succeeded (and the input file
+    name their dependents get) are saved in the state file in the
+    cache folder after each step, so that an interrupted run picks
+    up from where it stopped.
+    """
+
+    def __init__(self, manifest_file, spill_all=False, force=False):
+        self.steps, self.cache_folder = load_manifest(manifest_file)
+        self.steps_by_name = {s[KEY_STEP_NAME]: s for s in self.steps}
+        self.spill_all = spill_all
+        self.force = force
+
+        if not os.path.exists(self.cache_folder):
+            os.makedirs(self.cache_folder)
+        self.state_file = os.path.join(self.cache_folder, STATE_FILE_NAME)
+        self.state = {}
+        if os.path.isfile(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+
+        self.configs, self.fingerprints = {}, {}
+        for step in self.steps:
+            name = step[KEY_STEP_NAME]
+            self.configs[name] = get_step_config(step)
+            # Steps fed by other steps do not need input file keys
+            transform_utils.validate_configurations(
+                self.configs[name], require_input_file_keys=not step.get(KEY_DEPENDS_ON))
+            self.fingerprints[name] = get_step_fingerprint(
+                step, self.configs[name],
+                [self.fingerprints[d] for d in step.get(KEY_DEPENDS_ON, list())])
+
+    def _get_spill_file(self, step_name):
+        return os.path.join(self.cache_folder, step_name + SPILL_FILE_EXTENSION)
+
+    def _should_spill(self, step):
+        return self.spill_all or step.get(KEY_SPILL, False)
+
+    def _is_up_to_date(self, step_name):
+        return not self.force and \
+            self.state.get(step_name, {}).get('fingerprint') == self.fingerprints[step_name]
+
+    def get_steps_to_run(self):
+        """
+        Returns the names of the steps that changed since the last run,
+        plus the unchanged steps whose output is needed by those but
+        was not spilled.
+        """
+        to_run = set(s[KEY_STEP_NAME] for s in self.steps
+                     if not self._is_up_to_date(s[KEY_STEP_NAME]))
+        # Dependents come after their dependencies in self.steps, so
+        # walking backwards pulls in the whole chain that has to run
+        for step in reversed(self.steps):
+            if step[KEY_STEP_NAME] not in to_run:
+                continue
+            for dep in step.get(KEY_DEPENDS_ON, list()):
+                if dep not in to_run and not os.path.isfile(self._get_spill_file(dep)):
+                    to_run.add(dep)
+        return to_run
+
+    def _save_state(self):
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+
+    def _get_step_args(self, step, outputs):
+        """Returns the args of run_step for the step."""
+        deps = step.get(KEY_DEPENDS_ON, list())
+        input_dfs = None
+        if deps:
+            input_dfs = [to_hand_off_dataframe(
+                outputs[d] if d in outputs else pd.read_parquet(self._get_spill_file(d)),
+                self.configs[d], self.configs[step[KEY_STEP_NAME]]) for d in deps]
+        base_input_file = self.state.get(deps[0], {}).get('input_file') if deps else None
+        spill_file = self._get_spill_file(step[KEY_STEP_NAME])
+        if not self._should_spill(step):
+            if os.path.isfile(spill_file):
+                # Spilled output of an earlier run would be stale after this run
+                os.remove(spill_file)
+            spill_file = None
+        return step, self.configs[step[KEY_STEP_NAME]], input_dfs, base_input_file, spill_file
+
+    def run(self, workers=1):
+        """
+        Runs the steps that have to run (with up to 'workers' of them
+        at the same time) and returns the list of (step name, seconds
+        taken, status, error message) for every step in the manifest.
+        """
+        to_run = self.get_steps_to_run()
+        results = {s: (s, 0.0, STATUS_SKIPPED, None) for s in self.steps_by_name if s not in to_run}
+        pending = [s for s in self.steps if s[KEY_STEP_NAME] in to_run]
+        logger.info(f"Running {len(pending)} of {len(self.steps)} step(s) with {workers} worker(s).")
+
+        outputs = {}  # step name => output dataframe still needed by a pending step
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        running = {}  # future => step name
+        try:
+            while pending or running:
+                for step in [s for s in pending if self._is_ready(s, results)]:
+                    pending.remove(step)
+                    args = self._get_step_args(step, outputs)
+                    if executor:
+                        running[executor.submit(_run_step_in_worker, *args)] = step[KEY_STEP_NAME]
+                    else:
+                        self._finish_step(run_step(*args), outputs, results)
+                    self._release_outputs(pending, outputs)
+
+                for step in [s for s in pending if self._has_failed_dependency(s, results)]:
+                    pending.remove(step)
+                    results[step[KEY_STEP_NAME]] = (step[KEY_STEP_NAME], 0.0, STATUS_NOT_RUN,
+                                                    'A step it depends on failed.')
+                    self._release_outputs(pending, outputs)
+
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        del running[future]
+                        self._finish_step(future.result(), outputs, results)
+        finally:
+            if executor:
+                executor.shutdown()
+
+        return [results[s[KEY_STEP_NAME]] for s in self.steps]
+
+    @staticmethod
+    def _get_dependency_statuses(step, results):
+        return [results[d][2] if d in results else None
+                for d in step.get(KEY_DEPENDS_ON, list())]
+
+    def _is_ready(self, step, results):
+        return all(s in (STATUS_OK, STATUS_SKIPPED)
+                   for s in self._get_dependency_statuses(step, results))
+
+    def _has_failed_dependency(self, step, results):
+        return any(s in (STATUS_FAILED, STATUS_NOT_RUN)
+                   for s in self._get_dependency_statuses(step, results))
+
+    def _finish_step(self, result, outputs, results):
+        step_name, df, input_file, secs, err_msg = result
+        if err_msg:
+            self.state.pop(step_name, None)
+            results[step_name] = (step_name, secs, STATUS_FAILED, err_msg)
+        else:
+            self.state[step_name] = {'fingerprint': self.fingerprints[step_name],
+                                     'input_file': input_file}
+            outputs[step_name] = df
+            results[step_name] = (step_name, secs, STATUS_OK, None)
+        self._save_state()
+
+    @staticmethod
+    def _release_outputs(pending, outputs):
+        """Drops the output dataframes that no pending step needs anymore."""
+        needed = set(d for s in pending for d in s.get(KEY_DEPENDS_ON, list()))
+        for step_name in [s for s in outputs if s not in needed]:
+            del outputs[step_name]
+
+
+def _log_summary(results):
+    """Logs time taken by, and status of, each step."""
+    lines = [f"{'SECONDS':>10}  {'STATUS':<8} STEP"]
+    for step_name, secs, status, err_msg in results:
+        line = f"{secs:>10.1f}  {status:<8} {step_name}"
+        if status == STATUS_NOT_RUN:
+            line += f": {err_msg}"
+        lines.append(line)
+    logger.info("Summary of the pipeline run:\n" + "\n".join(lines))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO,
+                        format=transform.LOG_FORMAT)
+
+    parser = argparse.ArgumentParser(
+        description=DESC,
+        formatter_class=argparse.RawTextHelpFormatter,
+        usage=argparse.SUPPRESS)
+    parser.add_argument('-m', required=True, type=str,
+                        help=M_FLAG_HELP_TEXT)
+    parser.add_argument('--workers', required=False, type=int, default=1,
+                        help=WORKERS_FLAG_HELP_TEXT)
+    parser.add_argument('--force', action='store_true',
+                        help=FORCE_FLAG_HELP_TEXT)
+    parser.add_argument('--spill', action='store_true',
+                        help=SPILL_FLAG_HELP_TEXT)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.m):
+        raise transform_errors.ConfigFileError()
+
+    start_dt = datetime.datetime.now()
+    results = TransformDAG(args.m, spill_all=args.spill, force=args.force).run(args.workers)
+    _log_summary(results)
+
+    td = dateutil.relativedelta.relativedelta(datetime.datetime.now(), start_dt)
+    logger.info(f"Pipeline finished and from start to completion it took "
+                f"{td.hours} hrs, {td.minutes} mins, and {td.seconds} secs.")
+    sys.exit(1 if any(r[2] in (STATUS_FAILED, STATUS_NOT_RUN) for r in results) else 0)
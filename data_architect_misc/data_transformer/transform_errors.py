@@ -152,6 +152,30 @@ class InputFileNameAndDataDateRangeMismatchError(TransformError):
                          f"Make sure to name the input file with the "
                          f"correct date ranges in the data.")
 
+class FunctionNotFoundError(TransformError):
+    """
+    Raised when the function named in the config file is
+    NOT defined in the transform functions class.
+    """
+
+    def __init__(self, function_name, class_name):
+        super().__init__(f"This function defined in the config file "
+                         f"is NOT found in {class_name} class (or its "
+                         f"parent classes): {function_name}")
+
+
+class FunctionSignatureError(TransformError):
+    """
+    Raised when the args and kwargs provided in the config
+    file do NOT match the signature of the function.
+    """
+
+    def __init__(self, function_name, error_msg):
+        super().__init__(f"The arguments provided in the config file "
+                         f"do NOT match the parameters of this "
+                         f"function, '{function_name}': {error_msg}")
+
+
 class ListEmptyError(TransformError):
     """Raised when the provided list is empty."""
 
@@ -173,6 +197,16 @@ class OrderOfListContentsDifferentError(TransformError):
                          f"{list1}\n"
                          f"{list2}.")
 
+
+class PipelineManifestError(TransformError):
+    """
+    Raised when the steps in the pipeline manifest file
+    (used by transform_dag.py) do NOT form a valid DAG.
+    """
+
+    def __init__(self, error_msg):
+        super().__init__(f"Invalid pipeline manifest: {error_msg}")
+
 # class MutuallyExclusiveKeyError(TransformError):
 #     """
 #     Raised when config file has more than one key that serves the same
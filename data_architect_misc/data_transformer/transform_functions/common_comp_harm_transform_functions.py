@@ -576,7 +576,8 @@ class CommonCompHarmTransformFunctions(CommonTransformFunctions, CommonCompHarmQ
         we will assign "Not available" for those values that will not have an Advertiser name related
         """
         if column_name not in df:
-            df[column_name] = comp_harm_constants.NOT_AVAILABLE
+            return self.add_new_column_with_fixed_str_value(
+                df, column_name, comp_harm_constants.NOT_AVAILABLE)
         else:
             df[column_name] = df[column_name].replace('', comp_harm_constants.NOT_AVAILABLE)
         return df
@@ -9,18 +9,25 @@ Last Modified: Jan 30, 2020
 """
 
 import datetime
+import functools
 import logging
 import re
 
 import pandas as pd
 import numpy as np
 
+import category_dtype
+import regex_mapper
 import transform_errors
 from constants import comp_harm_constants
-from constants.transform_constants import KEY_CURRENT_INPUT_FILE, KEY_HEADER
+from constants.transform_constants import KEY_CURRENT_INPUT_FILE, KEY_HEADER, \
+    KEY_CATEGORICAL_COLUMNS, DEFAULT_CATEGORICAL_COLUMNS, CATEGORICAL_COLUMNS_AUTO
 
 
 def return_value_type_check(f):
+    # functools.wraps keeps the original function reachable via
+    # '__wrapped__' so that TransformPipeline can skip this check
+    @functools.wraps(f)
     def check_callable(*args, **kwargs):
         """
         Helper function which asserts that all functions implemented
@@ -75,6 +82,65 @@ class TransformFunctions:
         """
         return re.sub("(^|\s)(\S)", lambda m: m.group(1) + m.group(2).upper(), s)
 
+    def _map_distinct_values(self, series, func):
+        """
+        Same as series.apply(func) for a function that takes one value,
+        except that func is called only once for each distinct value
+        (and the result is broadcast back to the rows with that value).
+        Raw columns like category or brand names repeat the same few
+        hundred values over and over, so this is a lot faster.
+        Missing values (NaN/None) are left as they are.
+        REF: https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.factorize.html
+        """
+        if category_dtype.is_category(series):
+            return category_dtype.apply_to_distinct_values(series, lambda s: s.map(func))
+
+        codes, uniques = pd.factorize(series)
+        if not len(uniques):
+            return series.copy()
+
+        results = np.empty(len(uniques), dtype=object)
+        for i, value in enumerate(uniques):
+            results[i] = func(value)
+        return pd.Series(np.where(codes == -1, series.values, results[codes]),
+                         index=series.index, name=series.name)
+
+    def _to_str_values(self, series, dtype=None):
+        """
+        Same as series.apply(str) (i.e., str() of each value), but
+        faster. If dtype is given, the values are cast to it first.
+
+        Number, boolean and date/time columns (e.g., years or dates)
+        usually repeat a few distinct values, so we call str() once for
+        each distinct value. series.astype(str) is slower than that for
+        these columns and formats dates on its own (e.g., '2020-01-01'
+        instead of str(Timestamp) which is '2020-01-01 00:00:00').
+        """
+        if dtype is not None:
+            series = series.astype(dtype)
+        if pd.api.types.is_object_dtype(series):
+            return series.astype(str)
+
+        codes, uniques = pd.factorize(series)
+        str_values = [str(v) for v in uniques]
+        is_missing = (codes == -1)
+        if is_missing.any():
+            # Missing values (e.g., 'nan' or 'NaT') get the code -1,
+            # i.e., the last one of the distinct values here
+            str_values.append(str(series.values[is_missing][0]))
+        return pd.Series(np.asarray(str_values, dtype=object)[codes],
+                         index=series.index, name=series.name)
+
+    def _is_category_column(self, col_name):
+        """
+        Checks if the new column must be created as pandas' category
+        dtype as instructed by 'categorical_columns' in the config.
+        """
+        categorical_columns = getattr(self, 'config', {}).get(
+            KEY_CATEGORICAL_COLUMNS, DEFAULT_CATEGORICAL_COLUMNS)
+        return category_dtype.is_category_column(
+            col_name, categorical_columns, CATEGORICAL_COLUMNS_AUTO)
+
 
 class CommonTransformFunctions(TransformFunctions):
     """
@@ -148,7 +214,16 @@ class CommonTransformFunctions(TransformFunctions):
                 f"list_of_col_names must be list type and new_col_name "
                 f"must of string type.")
 
-        df[new_col_name] = df[list_of_col_names].apply(lambda x: ''.join(str(y) for y in x.values), axis=1)
+        # Same as df[list_of_col_names].apply(lambda x: ''.join(str(y) for y in x.values), axis=1)
+        # but vectorized. Like apply does for each row, we cast the values to the common type
+        # of the columns (e.g., ints to floats if some columns are ints and the others floats;
+        # any string column makes it object type) before converting them to strings.
+        cols = df[list_of_col_names]
+        row_dtype = np.find_common_type(list(cols.dtypes), []) \
+            if all(pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t)
+                   for t in cols.dtypes) else object
+        str_cols = [self._to_str_values(cols.iloc[:, i], row_dtype) for i in range(cols.shape[1])]
+        df[new_col_name] = str_cols[0].str.cat(str_cols[1:]) if len(str_cols) > 1 else str_cols[0]
 
         return df
 
@@ -367,7 +442,7 @@ class CommonTransformFunctions(TransformFunctions):
                                                       "be of list type with individual "
                                                       "names being string values.")
         for col_name in list_of_col_names:
-            df[col_name] = df[col_name].apply(lambda s: self._cap_sentence(s))
+            df[col_name] = self._map_distinct_values(df[col_name], self._cap_sentence)
 
         return df
 
@@ -400,7 +475,7 @@ class CommonTransformFunctions(TransformFunctions):
                                                       "be of list type with individual "
                                                       "names being string values.")
         for col_name in list_of_col_names:
-            df[col_name] = df[col_name].apply(lambda s: s.upper())
+            df[col_name] = self._map_distinct_values(df[col_name], lambda s: s.upper())
 
         return df
 
@@ -432,11 +507,15 @@ class CommonTransformFunctions(TransformFunctions):
             Dataframe with values that now includes aggregated (summed) values
             using Group By.
         """
-        df_grouped_and_summed = df.groupby(group_by_cols)[target_col_names] \
+        # observed=True keeps groupby from adding rows for every combination
+        # of categories when the group by columns are of category dtype
+        df_grouped_and_summed = df.groupby(group_by_cols, observed=True)[target_col_names] \
             .sum().reset_index()
-        df = pd.concat([df, df_grouped_and_summed], sort=False) \
-            .fillna(label_to_assign_for_non_aggregated_cols) \
-            .sort_values(by=group_by_cols).reset_index(drop=True)
+        df = pd.concat([df, df_grouped_and_summed], sort=False)
+        for col_name in df.columns:
+            df[col_name] = category_dtype.fill_na(
+                df[col_name], label_to_assign_for_non_aggregated_cols)
+        df = df.sort_values(by=group_by_cols).reset_index(drop=True)
 
         return df
 
@@ -460,7 +539,8 @@ class CommonTransformFunctions(TransformFunctions):
                                                       "be of list type with individual "
                                                       "names being string values.")
         for col_name in list_of_col_names:
-            df[col_name] = chars_to_add_in_front + df[col_name]
+            df[col_name] = category_dtype.apply_to_distinct_values(
+                df[col_name], lambda s: chars_to_add_in_front + s)
 
         return df
 
@@ -547,7 +627,9 @@ class CommonTransformFunctions(TransformFunctions):
                 f"of update values: {len(list_of_dictionary_of_value_mappings)}")
 
         for i, col in enumerate(list_of_col_names):
-            df[col] = df[col].map(list_of_dictionary_of_value_mappings[i]).fillna(df[col])
+            mappings = list_of_dictionary_of_value_mappings[i]
+            df[col] = category_dtype.apply_to_distinct_values(
+                df[col], lambda s: s.map(mappings).fillna(s))
 
         return df
 
@@ -583,9 +665,11 @@ class CommonTransformFunctions(TransformFunctions):
                 f"of update values: {len(list_of_dictionary_of_value_mappings)}")
 
         for i, col in enumerate(list_of_col_names):
+            mappings = list_of_dictionary_of_value_mappings[i]
             # first, convert the data type of the column to string
-            df[col] = df[col].apply(str)
-            df[col] = df[col].map(list_of_dictionary_of_value_mappings[i]).fillna(df[col])
+            df[col] = category_dtype.apply_to_distinct_values(df[col], self._to_str_values)
+            df[col] = category_dtype.apply_to_distinct_values(
+                df[col], lambda s: s.map(mappings).fillna(s))
 
         return df
 
@@ -680,9 +764,12 @@ class CommonTransformFunctions(TransformFunctions):
                 "the regular expressions in column 2, and values the desired final string "
                 "values for the column 1.")
 
-        for pattern, new_str_value in dictionary_of_regex_mappings.items():
-            mask = df[col2_name].str.contains(pattern)
-            df.loc[mask, col1_name] = new_str_value
+        # Same as setting column 1 to the new value for each pattern
+        # that matches column 2 in turn, but each distinct value in
+        # column 2 is matched against the patterns only once.
+        mask, new_values = regex_mapper.get_regex_mapper(
+            dictionary_of_regex_mappings).get_last_matched_values(df[col2_name])
+        category_dtype.set_values(df, mask, col1_name, new_values)
 
         return df
 
@@ -731,7 +818,8 @@ class CommonTransformFunctions(TransformFunctions):
                                                       "be of list type with individual "
                                                       "names being string values.")
 
-        df.loc[df[col1_name].isin(list_of_values_in_col1), col2_name] = final_val_in_col2
+        category_dtype.set_values(df, df[col1_name].isin(list_of_values_in_col1),
+                                  col2_name, final_val_in_col2)
 
         return df
 
@@ -829,7 +917,8 @@ class CommonTransformFunctions(TransformFunctions):
         Returns:
             The dataframe whose NaN values are replaced with empty string.
         """
-        df[list_of_col_names] = df[list_of_col_names].fillna('')
+        for col_name in list_of_col_names:
+            df[col_name] = category_dtype.fill_na(df[col_name], '')
 
         return df
 
@@ -891,7 +980,7 @@ class CommonTransformFunctions(TransformFunctions):
             raise transform_errors.InputDataTypeError("Column names and values "
                                                       "must be of string type")
 
-        df.loc[df[col2_name] == col2_value, col2_name] = df[col1_name]
+        category_dtype.set_values(df, df[col2_name] == col2_value, col2_name, df[col1_name])
 
         return df
 
@@ -934,7 +1023,11 @@ class CommonTransformFunctions(TransformFunctions):
             raise transform_errors.InputDataTypeError("Column names and fixed_str_value "
                                                       "must be of string type")
 
-        df[new_col_name] = fixed_str_value
+        if self._is_category_column(new_col_name):
+            # Stores the value once instead of once per row
+            df[new_col_name] = category_dtype.fixed_value_column(fixed_str_value, df.index)
+        else:
+            df[new_col_name] = fixed_str_value
 
         return df
 
@@ -968,7 +1061,8 @@ class CommonTransformFunctions(TransformFunctions):
                                                       "must be provided as a list.")
         for new_column in list_new_col_names:
             if new_column not in df.columns:
-                df[new_column] = ''
+                df[new_column] = category_dtype.fixed_value_column('', df.index) \
+                    if self._is_category_column(new_column) else ''
 
         return df
 
@@ -1087,10 +1181,13 @@ class CommonTransformFunctions(TransformFunctions):
                 "the regular expressions and values the desired final string values for the "
                 "new column.")
 
-        df[new_col_name] = df[existing_col_name].replace(regex=dictionary_of_mappings)
-        if leave_empty_if_no_match:
-            # If the regex mapping does NOT exist, we need to leave this cell blank
-            df.loc[df[new_col_name] == df[existing_col_name],new_col_name] = ''
+        # Gives the same values as df[existing_col_name].replace(regex=dictionary_of_mappings)
+        # but matches each distinct value against the regexes only once.
+        # If the regex mapping does NOT exist and leave_empty_if_no_match
+        # is set, we need to leave this cell blank.
+        df[new_col_name] = regex_mapper.get_regex_mapper(dictionary_of_mappings).replace(
+            df[existing_col_name],
+            value_if_unchanged='' if leave_empty_if_no_match else None)
 
         return df
 
@@ -1120,8 +1217,36 @@ class CommonTransformFunctions(TransformFunctions):
                 " The date column name is not string type or "
                 " The format is not string type. ")
 
-        df.loc[:, date_col_name] = df[date_col_name].apply(
-            lambda x:datetime.datetime.strptime(str(x), format_str))
+        date_strs = self._to_str_values(df[date_col_name])
+        # Parses each distinct date string only once
+        codes, distinct_date_strs = pd.factorize(date_strs)
+        distinct_date_strs = pd.Series(distinct_date_strs)
+        try:
+            distinct_dates = pd.to_datetime(distinct_date_strs, format=format_str)
+        except (ValueError, OverflowError):
+            distinct_dates = None
+
+        # pandas reads strings like 'nan' and 'NaT' as missing dates and
+        # cannot hold dates beyond year 2262, while datetime.strptime raises
+        # an error for the former and is fine with the latter. For ISO-like
+        # formats (e.g., '%Y-%m-%d'), pandas also accepts strings that do not
+        # match the format (e.g., '2020-01' or '20200105'), which strptime
+        # refuses, and gives back objects (not dates) for strings with
+        # different time zones. So we only keep pandas' dates if formatting
+        # them back gives the exact same strings. Otherwise, to give the same
+        # result (or error) as before, we fall back to parsing each value
+        # with datetime.strptime.
+        if (distinct_dates is None) or \
+                (not pd.api.types.is_datetime64_any_dtype(distinct_dates)) or \
+                distinct_dates.isna().any() or \
+                not (distinct_dates.dt.strftime(format_str) == distinct_date_strs).all():
+            new_dates = date_strs.apply(
+                lambda x: datetime.datetime.strptime(x, format_str))
+        else:
+            new_dates = distinct_dates.take(codes)
+            new_dates.index = date_strs.index
+
+        df.loc[:, date_col_name] = new_dates
 
         return df
 
@@ -1195,9 +1320,11 @@ class CommonTransformFunctions(TransformFunctions):
                 "Mapping key-value pairs must be of dictionary type")
 
         if use_existing_col_values:
-            df[new_col_name] = df[existing_col_name].replace(dictionary_of_mappings)
+            df[new_col_name] = category_dtype.apply_to_distinct_values(
+                df[existing_col_name], lambda s: s.replace(dictionary_of_mappings))
         else:
-            df[new_col_name] = df[existing_col_name].map(dictionary_of_mappings)
+            df[new_col_name] = category_dtype.apply_to_distinct_values(
+                df[existing_col_name], lambda s: s.map(dictionary_of_mappings))
 
         return df
 
@@ -0,0 +1,170 @@
+"""
+TransformPipeline resolves the functions listed in the config
+file (and their args and kwargs) into bound methods of the
+transform functions class *once per config*, so that we don't
+have to look them up again for every chunk of data read.
+"""
+import collections
+import inspect
+import logging
+import time
+import types
+
+import category_dtype
+from constants.transform_constants import KEY_CHECK_RETURN_VALUE_TYPE, \
+    DEFAULT_CHECK_RETURN_VALUE_TYPE, KEY_CATEGORICAL_COLUMNS, DEFAULT_CATEGORICAL_COLUMNS, \
+    CATEGORICAL_COLUMNS_AUTO, KEY_MAX_CATEGORICAL_UNIQUE_RATIO, DEFAULT_MAX_CATEGORICAL_UNIQUE_RATIO
+import transform_errors
+from transform_profiler import STAGE_FUNCTION
+import transform_utils
+
+TransformStep = collections.namedtuple(
+    'TransformStep', ['function_name', 'function', 'args', 'kwargs'])
+
+
+class TransformPipeline:
+    """
+    Compiled list of transform steps to apply to each dataframe.
+
+    All function names in the config are checked against the
+    transform functions class and all args/kwargs are checked
+    against the function signatures when this class is created.
+    That way, typos in the config file are caught before any
+    data is read from the input file.
+
+    This class also keeps track of how many times each step
+    is called and how long (in seconds) it takes in total. If
+    a TransformProfiler is given, every call of every step is
+    also recorded in it along with the row counts and memory
+    usage of the dataframe before and after the step.
+
+    If 'categorical_columns' is given in the config, the string
+    columns listed (or, if it's 'auto', the HARMONIZED_* and brand
+    columns with few distinct values) are converted to pandas'
+    category dtype before the steps are applied. Columns that do
+    not exist in the dataframe read (e.g., HARMONIZED_COUNTRY) are
+    converted right after the step that adds them.
+    """
+
+    def __init__(self, config, transform_funcs_kls, profiler=None):
+        self.logger = logging.getLogger(__name__)
+        self.profiler = profiler
+        self.check_return_value_type = config.get(
+            KEY_CHECK_RETURN_VALUE_TYPE,
+            DEFAULT_CHECK_RETURN_VALUE_TYPE)
+        self.categorical_columns = config.get(
+            KEY_CATEGORICAL_COLUMNS,
+            DEFAULT_CATEGORICAL_COLUMNS)
+        if isinstance(self.categorical_columns, str) \
+                and (self.categorical_columns != CATEGORICAL_COLUMNS_AUTO):
+            raise transform_errors.ConfigFileInputDataTypeError(
+                KEY_CATEGORICAL_COLUMNS,
+                f"list of column names or '{CATEGORICAL_COLUMNS_AUTO}'")
+        self.max_categorical_unique_ratio = config.get(
+            KEY_MAX_CATEGORICAL_UNIQUE_RATIO,
+            DEFAULT_MAX_CATEGORICAL_UNIQUE_RATIO)
+        self.steps = [self._compile_step(func_and_params, transform_funcs_kls)
+                      for func_and_params in transform_utils.get_functions_to_apply(config)]
+
+        # Per step counters
+        self.call_counts = [0] * len(self.steps)
+        self.seconds_taken = [0.0] * len(self.steps)
+
+    def _get_function(self, transform_funcs_kls, func_name):
+        """
+        Returns the function as a bound method of the transform
+        functions object. If we are told NOT to check the return
+        value type, we strip the 'return_value_type_check' wrapper
+        installed by TransformFunctions.__init_subclass__.
+        """
+        func = getattr(transform_funcs_kls, func_name, None)
+        if not callable(func):
+            raise transform_errors.FunctionNotFoundError(
+                func_name, type(transform_funcs_kls).__name__)
+
+        if not self.check_return_value_type and inspect.ismethod(func):
+            func = types.MethodType(inspect.unwrap(func.__func__),
+                                    transform_funcs_kls)
+        return func
+
+    def _compile_step(self, func_and_params, transform_funcs_kls):
+        """
+        Resolves one function (with its args and kwargs) in
+        the config into a TransformStep after making sure the
+        args and kwargs fit the function's parameters.
+        """
+        func_name = transform_utils.get_function_name(func_and_params)
+        func_args = transform_utils.get_function_args(func_and_params)
+        func_kwargs = transform_utils.get_function_kwargs(func_and_params)
+        func = self._get_function(transform_funcs_kls, func_name)
+
+        try:
+            # The first parameter of every transform function is
+            # the dataframe, so we bind a placeholder to it here.
+            # inspect.signature follows '__wrapped__' to the
+            # signature of the original function.
+            inspect.signature(func).bind(None, *func_args, **func_kwargs)
+        except TypeError as e:
+            raise transform_errors.FunctionSignatureError(func_name, str(e))
+
+        return TransformStep(func_name, func, func_args, func_kwargs)
+
+    def _convert_to_category_columns(self, df, checked_col_names):
+        """
+        Converts the string columns to category dtype as instructed
+        by 'categorical_columns' in the config. In 'auto' mode, each
+        column is checked only once (and added to checked_col_names)
+        so that we don't keep checking the columns with too many
+        distinct values.
+        """
+        if self.categorical_columns == CATEGORICAL_COLUMNS_AUTO:
+            col_names = [c for c in df.columns
+                         if (c not in checked_col_names) and category_dtype.is_auto_category_column(c)]
+            checked_col_names.update(col_names)
+            return category_dtype.convert_to_category_columns(
+                df, col_names, max_unique_ratio=self.max_categorical_unique_ratio)
+
+        return category_dtype.convert_to_category_columns(df, self.categorical_columns)
+
+    def apply(self, df):
+        """Applies every step in the pipeline to the dataframe in order."""
+        checked_col_names = set()
+        if self.categorical_columns:
+            df = self._convert_to_category_columns(df, checked_col_names)
+
+        if self.profiler:
+            # Memory usage of the dataframe coming out of a
+            # step is reused as that going into the next step
+            memory_bytes = self.profiler.get_memory_usage(df)
+
+        for i, step in enumerate(self.steps):
+            self.logger.info(f"Invoking function: {step.function_name}")
+            rows_in = df.shape[0]
+            start = time.perf_counter()
+            df = step.function(df, *step.args, **step.kwargs)
+            if self.categorical_columns:
+                df = self._convert_to_category_columns(df, checked_col_names)
+            seconds = time.perf_counter() - start
+            self.seconds_taken[i] += seconds
+            self.call_counts[i] += 1
+
+            if self.profiler:
+                memory_bytes_after = self.profiler.get_memory_usage(df)
+                self.profiler.record(STAGE_FUNCTION, seconds,
+                                     function_name=step.function_name,
+                                     step=i,
+                                     rows_in=rows_in,
+                                     rows_out=df.shape[0],
+                                     memory_bytes_before=memory_bytes,
+                                     memory_bytes_after=memory_bytes_after)
+                memory_bytes = memory_bytes_after
+
+        return df
+
+    def get_step_timings(self):
+        """
+        Returns the list of (function name, number of calls,
+        total seconds taken) for each step in the pipeline.
+        """
+        return [(step.function_name, self.call_counts[i], self.seconds_taken[i])
+                for i, step in enumerate(self.steps)]
@@ -0,0 +1,128 @@
+"""
+TransformProfiler records how long each function in the config
+(as well as the data reader and writer) takes for each chunk of
+data, how many rows go in and come out, and how much memory the
+dataframe takes before and after each function.
+
+It is turned on by running transform.py with 'profile' flag:
+>> python transform.py -c .\configs\china\config.json --profile 20
+"""
+import collections
+import csv
+from datetime import datetime
+import json
+import logging
+import os
+
+STAGE_READ = 'read'
+STAGE_FUNCTION = 'function'
+STAGE_WRITE = 'write'
+
+
+class TransformProfiler:
+    """
+    Collects one record per (unit of work, chunk, stage) where
+    the unit of work is a (config, input file) pair and the
+    stage is either reading the chunk, applying one of the
+    functions in the config or writing the chunk.
+
+    Records are plain dictionaries so that they can be sent back
+    from worker processes and merged with add_records().
+    """
+    REPORT_COLUMNS = ['unit', 'chunk', 'stage', 'step', 'function_name',
+                      'seconds', 'rows_in', 'rows_out',
+                      'memory_bytes_before', 'memory_bytes_after']
+    DEFAULT_REPORT_FOLDER = os.path.join(os.getcwd(), 'output', 'profiles')
+    REPORT_FILE_PREFIX = 'transform_profile'
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.records = []
+        self.unit_name = None
+        self.chunk_idx = -1
+
+    def start_unit(self, unit_name):
+        """Marks the beginning of a new (config, input file) pair."""
+        self.unit_name = unit_name
+        self.chunk_idx = -1
+
+    def start_chunk(self):
+        """Marks the beginning of a new chunk in the current unit of work."""
+        self.chunk_idx += 1
+
+    @staticmethod
+    def get_memory_usage(df):
+        """
+        Returns the number of bytes used by the dataframe
+        including the Python string objects in its columns.
+        REF: https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.memory_usage.html
+        """
+        return int(df.memory_usage(deep=True).sum())
+
+    def record(self, stage, seconds, function_name=None, step=None,
+               rows_in=None, rows_out=None,
+               memory_bytes_before=None, memory_bytes_after=None):
+        """Adds one record for the current chunk of the current unit of work."""
+        self.records.append({
+            'unit': self.unit_name,
+            'chunk': self.chunk_idx,
+            'stage': stage,
+            'step': step,
+            'function_name': function_name,
+            'seconds': seconds,
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'memory_bytes_before': memory_bytes_before,
+            'memory_bytes_after': memory_bytes_after
+        })
+
+    def add_records(self, records):
+        """Merges records collected by another (e.g., worker's) profiler."""
+        self.records.extend(records)
+
+    def get_slowest_steps(self, top_n):
+        """
+        Sums the seconds taken by each (unit, stage, step) across
+        all chunks and returns the top N slowest of them as a list
+        of (seconds, unit, stage, function name, chunk count) tuples.
+        """
+        totals = collections.defaultdict(lambda: [0.0, 0])
+        for r in self.records:
+            key = (r['unit'], r['stage'], r['step'], r['function_name'])
+            totals[key][0] += r['seconds']
+            totals[key][1] += 1
+
+        slowest = sorted(totals.items(), key=lambda kv: -kv[1][0])[:top_n]
+        return [(secs, unit, stage, func_name, chunks)
+                for (unit, stage, _, func_name), (secs, chunks) in slowest]
+
+    def log_slowest_steps(self, top_n):
+        """Logs the top N slowest steps across all units of work."""
+        lines = [f"{'SECONDS':>10} {'CHUNKS':>7}  {'STAGE':<8} {'FUNCTION':<50} UNIT"]
+        for secs, unit, stage, func_name, chunks in self.get_slowest_steps(top_n):
+            lines.append(f"{secs:>10.2f} {chunks:>7}  {stage:<8} "
+                         f"{func_name or '-':<50} {unit}")
+        self.logger.info(f"Top {top_n} slowest steps:\n" + "\n".join(lines))
+
+    def write_report(self, report_folder=DEFAULT_REPORT_FOLDER):
+        """
+        Writes the records to JSON and CSV files in the report
+        folder and returns the paths of these two files.
+        """
+        if not os.path.exists(report_folder):
+            os.makedirs(report_folder)
+
+        file_name = f"{self.REPORT_FILE_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        json_file = os.path.join(report_folder, f"{file_name}.json")
+        csv_file = os.path.join(report_folder, f"{file_name}.csv")
+
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, indent=2)
+
+        with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+        self.logger.info(f"Profile report written to: {json_file} and {csv_file}")
+        return json_file, csv_file
@@ -37,9 +37,11 @@ def insert_input_file_keys_values_to_config_json(file_path_and_name, config):
     return config
 
 
-def _assert_required_keys(config):
+def _assert_required_keys(config, require_input_file_keys=True):
     """Checks if all required keys exist in the config loaded."""
     for k in REQUIRED_KEYS:
+        if not require_input_file_keys and k in INPUT_FILE_KEYS:
+            continue
         if k not in config:
             raise transform_errors.RequiredKeyNotFoundInConfigFile(k)
 
@@ -56,9 +58,13 @@ def _assert_expected_data_types(config):
             raise transform_errors.ConfigFileInputDataTypeError(k, types)
 
 
-def validate_configurations(config):
-    """Calls other helper functions to check on the validity of config JSON"""
-    _assert_required_keys(config)
+def validate_configurations(config, require_input_file_keys=True):
+    """
+    Calls other helper functions to check on the validity of config JSON.
+    Set require_input_file_keys to False for configs that do not read an
+    input file (e.g., steps of transform_dag.py fed by other steps).
+    """
+    _assert_required_keys(config, require_input_file_keys)
     _assert_expected_data_types(config)
 
 
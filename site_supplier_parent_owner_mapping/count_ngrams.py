@@ -7,43 +7,119 @@ CSV files.
 This is used to inspect the most commonly occuring groups of words
 in the mapping files that we have to do for Benchmarking report.
 
+Rows are streamed from the input file and all n and columns are counted
+in one pass. By default the counts are exact (one Counter per n), which
+needs memory for every distinct n-gram. For larger mapping dumps, use
+'--mode space_saving', which keeps only the (approximate) heavy hitters
+in a fixed number of counters per n (see SpaceSavingCounter).
+
+Usage example:
+>> python count_ngrams.py -i data/mappings_utf16.csv -c 1 2 3 4 5 --top 1000
+>> python count_ngrams.py -i data/mappings_utf16.csv -c 1 2 3 4 5 --mode space_saving --capacity 10000
+
 Author: Phyo Thiha
 Last Modified Date: March 24, 2017
 """
 
+import argparse
 import csv
-from nltk import ngrams
+import heapq
+from collections import Counter
+
+GRAMS = list(range(2, 6)) # create bi-, tri-, quad-, pent-gram
+COLUMNS = [1, 2, 3, 4, 5] # site, supplier, parent owner, updated site, updated supplier
+
+
+def find_ngrams(s, n):
+    """Yields the character n-grams of s as strings."""
+    return (s[i:i + n] for i in range(len(s) - n + 1))
+
+
+class SpaceSavingCounter(object):
+    """
+    Approximate counts of the most frequent items of a stream in a fixed
+    number of counters (Space-Saving by Metwally et al., with evictions done
+    in batches). Once more than 2 * capacity items are tracked, all but the
+    capacity largest are dropped. A new item starts from the smallest count
+    kept at the last eviction (the error, which is at least any dropped
+    count), so counts are never underestimated and overestimated by at
+    most that error. Any item that occurs more than
+    (stream length / capacity) times is guaranteed to be kept.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.error = 0
+
+    def update(self, items):
+        counts = self.counts
+        for item, count in Counter(items).items():
+            if item in counts:
+                counts[item] += count
+            else:
+                counts[item] = self.error + count
+        if len(counts) > 2 * self.capacity:
+            self._evict()
+
+    def _evict(self):
+        kept = heapq.nlargest(self.capacity, self.counts.items(), key=lambda x: x[1])
+        self.error = max(self.error, min(count for _, count in kept))
+        self.counts = dict(kept)
+
+    def most_common(self, n=None):
+        if n is None:
+            return sorted(self.counts.items(), key=lambda x: -x[1])
+        return heapq.nlargest(n, self.counts.items(), key=lambda x: x[1])
+
 
-input_file = 'mappings_utf16.csv'
-grams = list(range(2,6)) # create bi-, tri-, quad-, pent-gram
-ngram_tables = [{} for i in grams]
+def count_ngrams(rows, columns=COLUMNS, grams=GRAMS, mode='exact', capacity=10000):
+    """
+    Counts the (lowercased) character n-grams of the columns in the rows
+    (any iterable of lists, e.g. a csv.reader) for each n in grams.
+    Returns {n: counter}, where each counter has most_common([k]).
+    Rows that are too short for some of the columns are skipped.
+    """
+    if mode == 'exact':
+        counters = {n: Counter() for n in grams}
+    elif mode == 'space_saving':
+        counters = {n: SpaceSavingCounter(capacity) for n in grams}
+    else:
+        raise ValueError('Unknown mode: %s' % mode)
 
-with open(input_file, encoding='utf-16') as csv_file:
-    csv_reader = csv.reader(csv_file, delimiter='\t')
+    last_column = max(columns)
+    for row in rows:
+        if len(row) <= last_column:
+            continue
+        for c in columns:
+            s = row[c].lower()
+            for n, counter in counters.items():
+                counter.update(find_ngrams(s, n))
+    return counters
 
-    for row in csv_reader:
-        site = row[1].lower()
-        supplier = row[2].lower()
-        parent_owner = row[3].lower()
-        updated_site = row[4].lower()
-        updated_supplier = row[5].lower()
 
-        for s in [site, supplier, parent_owner, updated_site, updated_supplier]:
-            for i, n in enumerate(grams):
-                tokens = list(ngrams(list(s), n))
+def main():
+    parser = argparse.ArgumentParser(description='Count the character n-grams in the columns of the input file.')
+    parser.add_argument('-i', '--input', default='mappings_utf16.csv', help='Input file (tab-delimited)')
+    parser.add_argument('-e', '--encoding', default='utf-16', help='Encoding of the input and output files')
+    parser.add_argument('-c', '--columns', type=int, nargs='+', default=COLUMNS, help='Indexes of the columns to count')
+    parser.add_argument('-n', '--grams', type=int, nargs='+', default=GRAMS, help='Values of n to count')
+    parser.add_argument('--mode', choices=['exact', 'space_saving'], default='exact',
+                        help="'exact' counts every n-gram; 'space_saving' keeps only the heavy hitters")
+    parser.add_argument('--capacity', type=int, default=10000,
+                        help='Number of n-grams tracked per n in space_saving mode')
+    parser.add_argument('--top', type=int, default=None, help='Write only the top K n-grams per n')
+    args = parser.parse_args()
 
-                for t in tokens:
-                    cur_gram = ''.join(t)
-                    if cur_gram in ngram_tables[i]:
-                        ngram_tables[i][cur_gram] += 1
-                    else:
-                        ngram_tables[i][cur_gram] = 1
+    with open(args.input, encoding=args.encoding) as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter='\t')
+        counters = count_ngrams(csv_reader, args.columns, args.grams, args.mode, args.capacity)
 
-for i, t in enumerate(ngram_tables):
-    with open(''.join([str(grams[i]),'.csv']), 'w', newline='', encoding='utf-16') as csv_file:
-        csv_writer = csv.writer(csv_file, delimiter='\t')
-        csv_writer.writerows(t.items())
+    for n, counter in counters.items():
+        with open(''.join([str(n), '.csv']), 'w', newline='', encoding=args.encoding) as csv_file:
+            csv_writer = csv.writer(csv_file, delimiter='\t')
+            csv_writer.writerows(counter.most_common(args.top))
 
-def find_ngrams(input_list, n): # this is my homebrew ngram generator; for now, we'll just use the one from nltk
-  return zip(*[input_list[i:] for i in range(n)])
 
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,37 @@
 import sys
 import csv
 import getopt
+import heapq
 import re
+from collections import defaultdict
 
 #usage: python suggest_mappings.py -i sspo.csv -o results -a 0 -b 3
+#usage: python suggest_mappings.py -i data/mappings_utf16.csv -e utf-16 -d '\t' -o results -a 1 -b 4 -r
 
 from levenshtein import Similarity
 
+TOP_N = 3 # number of suggestions per metric
+# number of candidates per site (picked by the n-gram index) that get scored with the
+# exact metrics. Sites with no candidate above the threshold of any metric are scored
+# against every updated site instead (the full cross product), so the suggestions above
+# the thresholds (the ones we use) are rarely missed. Check how many with -r. E.g., on an
+# 800-row sample of data/mappings_utf16.csv, 1899 of the 1902 were found (-k 20 or -n 2
+# made little difference) in about half the time of scoring every updated site, which
+# -k 0 does.
+CANDIDATE_COUNT = 50
+NGRAM_SIZE = 3
+
+# metrics in the order of the output columns
+METRICS = [
+    Similarity.jaro_score,
+    Similarity.levenshtein_normalized_score,
+    Similarity.lcs_score,
+    Similarity.jaccard_similarity,
+]
+# suggestions with scores equal or above these (in the order of METRICS) are
+# the ones we use; empirical values from score3.xlsx which is the output of process_sites.py
+THRESHOLDS = [0.95, 0.85, 0.85, 0.88]
+
 
 class MapperUtils(object):
 
@@ -28,13 +53,76 @@ class Mapper(object):
         pass
 
 
+class NGramIndex(object):
+    """
+    Inverted index from character n-grams to the (transformed) words that
+    have them. Candidates for a word are the indexed words that share the
+    most n-grams with it (by Dice coefficient), so that only those get
+    scored with the exact metrics instead of every indexed word.
+    """
+
+    def __init__(self, words, n=NGRAM_SIZE):
+        self.n = n
+        self.gram_counts = []
+        self.postings = defaultdict(list) # n-gram => ids of the words that have it
+        for i, w in enumerate(words):
+            grams = self.ngrams(w)
+            self.gram_counts.append(len(grams))
+            for g in grams:
+                self.postings[g].append(i)
+
+    def ngrams(self, w):
+        # pad the word so that its start and end (and words shorter than n) have n-grams too
+        w = '^' + w + '$'
+        return set(w[i:i + self.n] for i in range(max(len(w) - self.n + 1, 1)))
+
+    def candidates(self, w, k):
+        """Returns the ids of the (at most) k indexed words that share the most n-grams with w, in id order."""
+        grams = self.ngrams(w)
+        shared = defaultdict(int)
+        for g in grams:
+            for i in self.postings.get(g, ()):
+                shared[i] += 1
+        top = heapq.nlargest(k, shared.items(),
+                             key=lambda x: 2.0 * x[1] / (len(grams) + self.gram_counts[x[0]]))
+        return sorted(i for i, _ in top)
+
+
+def score_candidates(wt1, candidates, transformed):
+    """
+    Scores the candidates against the transformed word wt1 with each of
+    the METRICS and returns the TOP_N (candidate, score) pairs per metric.
+    Ties keep the order of the candidates, like a stable sort would.
+    """
+    scores = [[] for _ in METRICS]
+    for w2 in candidates:
+        wt2 = transformed[w2]
+        for k, metric in enumerate(METRICS):
+            scores[k].append((w2, metric(wt1, wt2)))
+    return [heapq.nlargest(TOP_N, metric_scores, key=lambda x: x[1]) for metric_scores in scores]
+
+
+def has_suggestion_above_thresholds(top_suggestions):
+    """Checks if any metric has a top suggestion that passes the metric's threshold."""
+    return any(score >= threshold
+               for metric_top, threshold in zip(top_suggestions, THRESHOLDS)
+               for _, score in metric_top)
+
+
 def main(argv):
     verbose = True
     input_file = ''
     output_file = ''
+    encoding = None
+    delimiter = ','
+    candidate_count = CANDIDATE_COUNT
+    ngram_size = NGRAM_SIZE
+    check_recall = False
 
     try:
-        opts, args = getopt.getopt(argv, "hi:o:a:b:",["ifile=","ofile=","col1=", "col2="])
+        opts, args = getopt.getopt(argv, "hi:o:a:b:e:d:k:n:r",
+                                   ["ifile=","ofile=","col1=", "col2=", "encoding=", "delimiter=",
+                                    "candidates=", "ngram=", "recall"])
     except getopt.GetoptError:
         print('Usage: map_words.py -i <input file> -o <output file> -a <col 1> -b <col2>')
         sys.exit(2)
@@ -46,6 +134,9 @@ def main(argv):
     for opt, arg in opts:
         if opt == '-h':
             print('Usage: map_words.py -i <inputfile> -o <outputfile> -a <column 1> -b <column 2>')
+            print('Options: -e <input encoding> -d <delimiter> -k <candidates per site> -n <n-gram size>')
+            print('         -k candidates per site picked with an n-gram index (default: %d; 0 to score all updated sites)' % CANDIDATE_COUNT)
+            print('         -r to check the recall of the suggestions above the thresholds against the full cross product')
             sys.exit()
         elif opt in ("-i", "--ifile"):
             input_file = arg
@@ -55,6 +146,16 @@ def main(argv):
             col_idx1 = int(arg)
         elif opt in ("-b", "--col2"):
             col_idx2 = int(arg)
+        elif opt in ("-e", "--encoding"):
+            encoding = arg
+        elif opt in ("-d", "--delimiter"):
+            delimiter = arg.encode().decode('unicode_escape') # so that '\t' can be passed in
+        elif opt in ("-k", "--candidates"):
+            candidate_count = int(arg)
+        elif opt in ("-n", "--ngram"):
+            ngram_size = int(arg)
+        elif opt in ("-r", "--recall"):
+            check_recall = True
 
     """
         Load raw data; clean/transform it.
@@ -67,11 +168,9 @@ def main(argv):
 
     sites_map_updated_sites = {} # sites_deduped is sites_map_updated_sites.keys()
     updated_sites_map_sites = {}
-    sites_transformed_dict = {}
-    updated_sites_transformed_dict = {}
 
-    with open(input_file, 'r') as infile:
-        file_reader = csv.reader(infile, delimiter=',', quotechar='"')
+    with open(input_file, 'r', encoding=encoding) as infile:
+        file_reader = csv.reader(infile, delimiter=delimiter, quotechar='"')
 
         for row in file_reader:
             site = row[col_idx1]
@@ -82,67 +181,60 @@ def main(argv):
             sites_map_updated_sites[site] = updated_site # NOTE: assumes that site => updated_site mapping is one-to-one
             updated_sites_map_sites[updated_site] = site
 
-            site_transformed = MapperUtils.transform_word(site)
-            updated_site_transformed = MapperUtils.transform_word(updated_site)
-            sites_transformed_dict[site_transformed] = 'site'
-            updated_sites_transformed_dict[updated_site_transformed] = 'updated site'
-
         # print("sites: ", len(sites))
         # print("updated_sites: ", len(updated_sites))
         # print("sites map updated sites: ", len(sites_map_updated_sites))
         # print("updated sites map sites: ", len(updated_sites_map_sites))
-        # print("sites transformed dict: ", len(sites_transformed_dict))
-        # print("updated sites transformed dict: ", len(updated_sites_transformed_dict))
 
     """
-        Build similarity score tables
+        Generate candidates and score them
     """
-    if verbose: print("Constructing similarity score tables...")
-
-    jaro_table = {}
-    leven_table = {}
-    lcs_table = {}
-    jaccard_table = {}
-
-    for w1 in sites_map_updated_sites.keys(): # take from unique_sites_transformed to save computation
-        for w2 in updated_sites_map_sites.keys():
-
-            wt1 = MapperUtils.transform_word(w1)
-            wt2 = MapperUtils.transform_word(w2)
-
-            if not w1 in jaro_table:
-                jaro_table[w1] = {}
-            jaro_table[w1][w2] = Similarity.jaro_score(wt1, wt2)
-
-            if not w1 in leven_table:
-                leven_table[w1] = {}
-            leven_table[w1][w2] = Similarity.levenshtein_normalized_score(wt1, wt2)
-
-            if not w1 in lcs_table:
-                lcs_table[w1] = {}
-            lcs_table[w1][w2] = Similarity.lcs_score(wt1, wt2)
-
-            if not w1 in jaccard_table:
-                jaccard_table[w1] = {}
-            jaccard_table[w1][w2] = Similarity.jaccard_similarity(wt1, wt2)
-
-    """
-        Sort the scores in the table
-    """
-    if verbose: print("Sorting similarity score tables...")
-
-    jaro_sorted = {}
-    leven_sorted = {}
-    lcs_sorted = {}
-    jaccard_sorted = {}
-    for w1, score_table in jaro_table.items():
-        jaro_sorted[w1] = sorted(score_table.items(), key=lambda x: -x[1])
-    for w1, score_table in leven_table.items():
-        leven_sorted[w1] = sorted(score_table.items(), key=lambda x: -x[1])
-    for w1, score_table in lcs_table.items():
-        lcs_sorted[w1] = sorted(score_table.items(), key=lambda x: -x[1])
-    for w1, score_table in jaccard_table.items():
-        jaccard_sorted[w1] = sorted(score_table.items(), key=lambda x: -x[1])
+    # transform each distinct word once instead of once per pair
+    sources = list(sites_map_updated_sites.keys())
+    targets = list(updated_sites_map_sites.keys())
+    transformed = {w: MapperUtils.transform_word(w) for w in set(sources) | set(targets)}
+
+    if not candidate_count:
+        if verbose: print("Scoring all %d updated sites per site..." % len(targets))
+    else:
+        if verbose: print("Indexing %d updated sites..." % len(targets))
+        index = NGramIndex([transformed[w] for w in targets], ngram_size)
+        if verbose: print("Scoring top %d candidates per site..." % candidate_count)
+
+    top_suggestions = {}
+    truth_in_candidates = 0
+    full_scans = 0
+    for w1 in sources:
+        if not candidate_count:
+            candidates = targets
+        else:
+            candidates = [targets[i] for i in index.candidates(transformed[w1], candidate_count)]
+        top_suggestions[w1] = score_candidates(transformed[w1], candidates, transformed)
+        if candidate_count and not has_suggestion_above_thresholds(top_suggestions[w1]):
+            # the candidates may have missed the updated sites that pass a threshold
+            candidates = targets
+            top_suggestions[w1] = score_candidates(transformed[w1], candidates, transformed)
+            full_scans += 1
+        truth_in_candidates += sites_map_updated_sites[w1] in candidates
+    if candidate_count and verbose:
+        print("Scored all updated sites for %d/%d sites with no candidate above the thresholds" % (full_scans, len(sources)))
+
+    if check_recall:
+        if verbose: print("Checking recall against the full cross product...")
+        found, total = 0, 0
+        for w1 in sources:
+            full_suggestions = score_candidates(transformed[w1], targets, transformed)
+            for metric_top, full_metric_top, threshold in zip(top_suggestions[w1], full_suggestions, THRESHOLDS):
+                # only the suggestions above the threshold count; one is recalled if the
+                # candidates have one as good at its rank (ties can differ)
+                blocked_scores = [s for _, s in metric_top]
+                for j, (_, s) in enumerate(full_metric_top):
+                    if s >= threshold:
+                        found += j < len(blocked_scores) and blocked_scores[j] == s
+                        total += 1
+        print("Recall of the top %d suggestions above the thresholds: %d/%d (%.4f)"
+              % (TOP_N, found, total, found / float(max(total, 1))))
+        print("Sites with the truth among the candidates: %d/%d" % (truth_in_candidates, len(sources)))
 
     """
         Get the suggestions
@@ -170,28 +262,22 @@ def main(argv):
         'jaccard suggested 3', 'score of jaccard suggested 3', 'jaccard suggested 3 correct', 'equalOrabove jaccard threshold 3',
     ]]
 
-    jaro_threshold = 0.95 # empirical value from score3.xlsx which is the output of process_sites.py
-    jaccard_threshold = 0.88
-    leven_threshold = 0.85
-    lcs_threshold = 0.85
-
     for i, site in enumerate(sites):
         truth = updated_sites[i]
         out_row = [site, truth]
 
-        sorted_score_tables = [jaro_sorted, leven_sorted, lcs_sorted, jaccard_sorted]
-        for k, score_table in enumerate(sorted_score_tables):
-            thresholds = [jaro_threshold, leven_threshold, lcs_threshold, jaccard_threshold]
-
-            for j in range(0,len(sorted_score_tables)):
-                suggested_word = score_table[site][j][0]
-                suggested_word_score = score_table[site][j][1]
+        for k, metric_top in enumerate(top_suggestions[site]):
+            for j in range(0, TOP_N):
+                if j >= len(metric_top):
+                    out_row.extend(['NULL', 'NULL', 0, 0])
+                    continue
+                suggested_word, suggested_word_score = metric_top[j]
 
                 out_row.append(suggested_word)
                 out_row.append(suggested_word_score)
 
                 out_row.append(1 if suggested_word == truth else 0)
-                out_row.append(1 if suggested_word_score >= thresholds[k] else 0)
+                out_row.append(1 if suggested_word_score >= THRESHOLDS[k] else 0)
 
         output_table.append(out_row)
 
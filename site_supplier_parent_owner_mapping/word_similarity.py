@@ -11,25 +11,43 @@ Different similarity metrics wrapped in one module. The metrics are:
 
 Note: 'Jellyfish' library is needed. For that, just install by:
 >> pip install jellyfish
+
+To score many words at once (e.g. one site against all updated sites),
+use score_batch or score_pairs, which can spread the work across processes:
+>> WordSimilarity.score_batch('rocketfuel', ['rocket fuel', 'fandango'], processes=4)
 """
 
+import multiprocessing
 import unittest
 from collections import Counter
+from functools import lru_cache
 
 from jellyfish import damerau_levenshtein_distance,jaro_distance
 
+FEATURE_CACHE_SIZE = 2 ** 16 # number of words whose char sets and counts are kept
+METRICS = ['jaccard', 'common_char_ratio', 'lcs', 'damerau_levenshtein', 'jaro_winkler']
+
+
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def word_features(w):
+    """Returns the set and the counts of the characters in w, cached for words seen again."""
+    return frozenset(w), Counter(w)
+
 
 class WordSimilarity(object):
 
     @staticmethod
     def jaccard_similarity_score(w1, w2):
-        intersection = len(set.intersection(*[set(w1), set(w2)]))
-        union = len(set.union(*[set(w1), set(w2)]))
+        chars1, chars2 = word_features(w1)[0], word_features(w2)[0]
+        intersection = len(chars1 & chars2)
+        union = len(chars1 | chars2)
         return intersection / float(union)
 
     @staticmethod
     def common_char_count_ratio(w1, w2):
-        return WordSimilarity.calculate_common_ratio(list(w1), list(w2))
+        # same as calculate_common_ratio(list(w1), list(w2)), with the counts cached
+        sum_of_least_common_chars_count = sum((word_features(w1)[1] & word_features(w2)[1]).values())
+        return sum_of_least_common_chars_count / float(max(len(w1), len(w2)))
 
     @classmethod
     def calculate_common_ratio(cls, w1, w2):
@@ -43,18 +61,20 @@ class WordSimilarity(object):
     def longest_common_substring(cls, s1, s2):
         """
         From: https://en.wikibooks.org/wiki/Algorithm_Implementation/Strings/Longest_common_substring#Python_3
+        but keeping only the previous row of the DP matrix instead of all of it.
         """
-        m = [[0] * (1 + len(s2)) for i in range(1 + len(s1))]
+        previous = [0] * (1 + len(s2))
         longest, x_longest = 0, 0
         for x in range(1, 1 + len(s1)):
+            c1 = s1[x - 1]
+            current = [0] * (1 + len(s2))
             for y in range(1, 1 + len(s2)):
-                if s1[x - 1] == s2[y - 1]:
-                    m[x][y] = m[x - 1][y - 1] + 1
-                    if m[x][y] > longest:
-                        longest = m[x][y]
+                if c1 == s2[y - 1]:
+                    length = current[y] = previous[y - 1] + 1
+                    if length > longest:
+                        longest = length
                         x_longest = x
-                else:
-                    m[x][y] = 0
+            previous = current
         return s1[x_longest - longest: x_longest]
 
     @staticmethod
@@ -75,6 +95,52 @@ class WordSimilarity(object):
     def jaro_winkler_score(w1, w2):
         return jaro_distance(w1, w2) # jellyfish's method name for Jaro-Winkler is just jaro_distance()
 
+    @staticmethod
+    def score_batch(query, candidates, metrics=METRICS, processes=1):
+        """
+        Scores the query against each of the candidates with each of the
+        metrics (names from METRICS) and returns {metric: [scores]}, with
+        the scores in the same order as the candidates.
+        """
+        return WordSimilarity.score_pairs([query] * len(candidates), candidates, metrics, processes)
+
+    @staticmethod
+    def score_pairs(words1, words2, metrics=METRICS, processes=1):
+        """
+        Scores words1[i] against words2[i] for each i with each of the
+        metrics and returns {metric: [scores]}. If processes > 1, the pairs
+        are split in chunks across a pool of that many processes.
+        """
+        unknown_metrics = set(metrics) - set(METRICS)
+        assert not unknown_metrics, 'Unknown metrics: %s' % sorted(unknown_metrics)
+        assert len(words1) == len(words2), 'words1 and words2 have different lengths'
+        pairs = list(zip(words1, words2))
+
+        if processes > 1 and len(pairs) > 1:
+            chunk_size = -(-len(pairs) // (processes * 4))
+            chunks = [(pairs[i:i + chunk_size], metrics) for i in range(0, len(pairs), chunk_size)]
+            with multiprocessing.Pool(processes) as pool:
+                scores = [s for chunk_scores in pool.map(_score_chunk, chunks) for s in chunk_scores]
+        else:
+            scores = _score_chunk((pairs, metrics))
+        return {metric: [s[k] for s in scores] for k, metric in enumerate(metrics)}
+
+
+METRIC_FUNCTIONS = {
+    'jaccard': WordSimilarity.jaccard_similarity_score,
+    'common_char_ratio': WordSimilarity.common_char_count_ratio,
+    'lcs': WordSimilarity.lcs_score,
+    'damerau_levenshtein': WordSimilarity.damerau_levenshtein_score,
+    'jaro_winkler': WordSimilarity.jaro_winkler_score,
+}
+
+
+def _score_chunk(args):
+    """Returns the scores of each pair for each metric (runs in the pool's processes)."""
+    pairs, metrics = args
+    functions = [METRIC_FUNCTIONS[m] for m in metrics]
+    return [tuple(f(w1, w2) for f in functions) for w1, w2 in pairs]
+
 
 class TestOutputSimilarityScores(unittest.TestCase):
 
@@ -104,5 +170,21 @@ class TestOutputSimilarityScores(unittest.TestCase):
         self.assertEqual(o.jaro_winkler_score(sd, se), 0.8666666666666667)
 
 
+class TestBatchSimilarityScores(unittest.TestCase):
+
+    def test_same_scores_as_single_calls(self):
+        query = 'abcc'
+        candidates = ['cdeff', 'ccdeff', 'abcc', 'Hallo', 'abcc']
+        for processes in [1, 2]:
+            scores = WordSimilarity.score_batch(query, candidates, processes=processes)
+            self.assertEqual(scores['jaccard'], [WordSimilarity.jaccard_similarity_score(query, c) for c in candidates])
+            self.assertEqual(scores['lcs'], [WordSimilarity.lcs_score(query, c) for c in candidates])
+            self.assertEqual(scores['jaro_winkler'], [WordSimilarity.jaro_winkler_score(query, c) for c in candidates])
+
+    def test_score_pairs(self):
+        scores = WordSimilarity.score_pairs(['abcc', 'Hallo'], ['ccdeff', 'Hello'], metrics=['common_char_ratio'])
+        self.assertEqual(scores, {'common_char_ratio': [1 / 3.0, 4 / 5.0]})
+
+
 if __name__ == "__main__":
     unittest.main()
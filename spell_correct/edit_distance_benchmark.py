@@ -0,0 +1,75 @@
+"""
+Micro-benchmark that compares the bit-parallel Damerau-Levenshtein
+distance ('damerau') against the original dynamic programming one
+('damerau_reference') on words from the bundled dictionaries:
+1. EditDistance.compare() on (misspelled word, candidate word) pairs.
+2. SymSpell.lookup() on misspelled words.
+It also checks that both return the same results.
+
+Run it from the spell_correct folder like below:
+>> python edit_distance_benchmark.py --words 2000
+"""
+import argparse
+import os
+import random
+import time
+
+from symspell import EditDistance, SymSpell
+
+DICTIONARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dictionaries', 'combined.txt')
+ALGORITHMS = ['damerau_reference', 'damerau']
+
+
+def misspell(word, rng, max_edits=2):
+    chars = list(word)
+    for _ in range(rng.randint(1, max_edits)):
+        i = rng.randrange(len(chars))
+        edit = rng.choice(['delete', 'insert', 'replace', 'transpose'])
+        if edit == 'delete' and len(chars) > 1:
+            del chars[i]
+        elif edit == 'insert':
+            chars.insert(i, rng.choice('abcdefghijklmnopqrstuvwxyz'))
+        elif edit == 'transpose' and i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        else:
+            chars[i] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    return ''.join(chars)
+
+
+def benchmark_compare(words, rng, candidates_per_word=50, max_distance=2):
+    pairs = [(misspell(w, rng), rng.sample(words, candidates_per_word)) for w in words]
+    results = {}
+    for algorithm in ALGORITHMS:
+        start_time = time.time()
+        results[algorithm] = [EditDistance(word, algorithm).compare_batch(candidates, max_distance)
+                              for word, candidates in pairs]
+        run_time = time.time() - start_time
+        comparisons = len(pairs) * candidates_per_word
+        print('compare  %-18s %8.2f seconds %12.0f comparisons/sec' % (algorithm, run_time, comparisons / run_time))
+    assert results['damerau'] == results['damerau_reference'], 'Distances are different'
+
+
+def benchmark_lookup(symspell, words, rng, max_distance=2):
+    misspelled = [misspell(w, rng) for w in words]
+    results = {}
+    for algorithm in ALGORITHMS:
+        symspell._distance_algorithm = algorithm
+        start_time = time.time()
+        results[algorithm] = [[str(s) for s in symspell.lookup(w, 2, max_distance)] for w in misspelled]
+        run_time = time.time() - start_time
+        print('lookup   %-18s %8.2f seconds %12.0f lookups/sec' % (algorithm, run_time, len(words) / run_time))
+    assert results['damerau'] == results['damerau_reference'], 'Suggestions are different'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--words', type=int, default=1000)
+    args = parser.parse_args()
+
+    symspell = SymSpell()
+    symspell.load_dictionary(DICTIONARY, 'utf-16')
+    rng = random.Random(0)
+    words = rng.sample(list(symspell._words.keys()), args.words)
+
+    benchmark_compare(words, rng)
+    benchmark_lookup(symspell, words, rng)
@@ -1,6 +1,11 @@
+import collections
+import json
+import multiprocessing
 import os
 import re
+import struct
 import sys
+import time
 
 import numpy as np
 
@@ -29,6 +34,15 @@ class SymSpell():
             Defaults to 1, values below zero are also mapped to 1. Consider setting a higher value if your
             corpus contains mistakes.
     """
+    # Index file layout: INDEX_MAGIC, length of the JSON header (uint32), the JSON header
+    # (padded to INDEX_ALIGNMENT bytes) and then the arrays listed in the header.
+    # INDEX_VERSION must be bumped whenever the layout or _hash() changes.
+    INDEX_MAGIC = b'SYMSPELL'
+    INDEX_VERSION = 1
+    INDEX_ALIGNMENT = 8
+
+    # Number of (phrase, lookup parameters) results memoized by lookup_batch()
+    DEFAULT_LOOKUP_CACHE_SIZE = 100000
     def __init__(self, max_dictionary_edit_distance=3, prefix_length=7, count_threshold=2):
         self._distance_algorithm = 'damerau'
         self._max_length = 0
@@ -49,6 +63,10 @@ class SymSpell():
         self._count_threshold = count_threshold
         self._compact_mask = (0xffffffff >> 8) << 2
 
+        self._index_file = None
+        self._lookup_cache = LRUCache(self.DEFAULT_LOOKUP_CACHE_SIZE)
+        self.last_batch_stats = None
+
     def _create_dictionary_entry(self, key, count):
         """Creates or updates a dictionary entry.
         Args:
@@ -74,12 +92,16 @@ class SymSpell():
             count_previous = self._words[key]
             count = count_previous + count
             self._words[key] = count
+            self._lookup_cache.clear()
+            # The saved index has the old count
+            self._index_file = None
             return False
         elif count < self._count_threshold:
             self._below_threshold_words[key] = count
             return False
 
         self._words[key] = count
+        self._index_file = None
         if len(key) > self._max_length:
             self._max_length = len(key)
 
@@ -87,6 +109,10 @@ class SymSpell():
 
         if self._deletes is None:
             self._deletes = dict()
+        elif isinstance(self._deletes, DeletesIndex):
+            # The index loaded from a file is read-only
+            self._deletes = self._deletes.to_dict()
+        self._lookup_cache.clear()
 
         for edit in edits:
             hs = self._hash(edit)
@@ -158,6 +184,105 @@ class SymSpell():
         else:
             sys.exit("Make sure output file's path is valid")
 
+    def save_index(self, index_file):
+        """Saves the built index (words, counts, deletes and parameters) to a binary file
+        that can be loaded with :meth:`load_index` instead of building the index again.
+        Note:
+            Below threshold words are not saved.
+        Args:
+            index_file (str): Path of the index file.
+        """
+        words = list(self._words.keys())
+        word_ids = {w: i for i, w in enumerate(words)}
+
+        deletes = self._deletes if self._deletes is not None else dict()
+        if isinstance(deletes, DeletesIndex):
+            deletes = deletes.to_dict()
+
+        # Deletes are stored as sorted hashes, with the suggestions of the i-th hash
+        # in delete_word_ids[delete_offsets[i]:delete_offsets[i+1]] (in their original order)
+        hashes = sorted(deletes.keys())
+        delete_offsets = np.zeros(len(hashes) + 1, dtype=np.int64)
+        delete_offsets[1:] = np.cumsum([len(deletes[hs]) for hs in hashes])
+        delete_word_ids = np.fromiter((word_ids[w] for hs in hashes for w in deletes[hs]),
+                                      dtype=np.int32, count=int(delete_offsets[-1]))
+
+        arrays = {
+            # Words never contain whitespace because they are split() from the corpus
+            'words': np.frombuffer('\n'.join(words).encode('utf-8'), dtype=np.uint8),
+            'counts': np.array([self._words[w] for w in words], dtype=np.int64),
+            'delete_hashes': np.array(hashes, dtype=np.uint32),
+            'delete_offsets': delete_offsets,
+            'delete_word_ids': delete_word_ids,
+        }
+
+        header = {
+            'version': self.INDEX_VERSION,
+            'max_dictionary_edit_distance': self._max_dictionary_edit_distance,
+            'prefix_length': self._prefix_length,
+            'count_threshold': self._count_threshold,
+            'max_length': self._max_length,
+            'arrays': {}
+        }
+        # Offsets of the arrays depend on the size of the header (which has the offsets
+        # in it), so we keep making room for the header until it fits
+        header_size = 0
+        while True:
+            offset = self._align(len(self.INDEX_MAGIC) + 4 + header_size)
+            for name, arr in arrays.items():
+                header['arrays'][name] = [arr.dtype.str, arr.shape[0], offset]
+                offset = self._align(offset + arr.nbytes)
+            header_bytes = json.dumps(header).encode('utf-8')
+            if len(header_bytes) <= header_size:
+                break
+            header_size = len(header_bytes)
+
+        with open(index_file, 'wb') as f:
+            f.write(self.INDEX_MAGIC)
+            f.write(struct.pack('<I', len(header_bytes)))
+            f.write(header_bytes)
+            for name, arr in arrays.items():
+                f.write(b'\0' * (header['arrays'][name][2] - f.tell()))
+                f.write(arr.tobytes())
+
+    def load_index(self, index_file):
+        """Loads the index saved by :meth:`save_index`. The arrays are memory-mapped
+        so this takes (almost) constant time regardless of the size of the dictionary.
+        Args:
+            index_file (str): Path of the index file.
+        Raises:
+            ValueError: If the file is not a SymSpell index, or if it was saved with a different
+                index version, `max_dictionary_edit_distance` or `prefix_length`.
+        """
+        with open(index_file, 'rb') as f:
+            if f.read(len(self.INDEX_MAGIC)) != self.INDEX_MAGIC:
+                raise ValueError('%s is not a SymSpell index file' % index_file)
+            header_len = struct.unpack('<I', f.read(4))[0]
+            header = json.loads(f.read(header_len).decode('utf-8'))
+
+        for key, expected in [('version', self.INDEX_VERSION),
+                              ('max_dictionary_edit_distance', self._max_dictionary_edit_distance),
+                              ('prefix_length', self._prefix_length)]:
+            if header[key] != expected:
+                raise ValueError('%s was built with %s=%s, but %s is expected. Please rebuild the index.'
+                                 % (index_file, key, header[key], expected))
+
+        arrays = {name: np.memmap(index_file, dtype=np.dtype(dtype), mode='r', offset=offset, shape=(length,))
+                  if length else np.zeros(0, dtype=np.dtype(dtype))
+                  for name, (dtype, length, offset) in header['arrays'].items()}
+
+        words = arrays['words'].tobytes().decode('utf-8').split('\n') if len(arrays['words']) else []
+        self._words = dict(zip(words, arrays['counts'].tolist()))
+        self._deletes = DeletesIndex(arrays['delete_hashes'], arrays['delete_offsets'],
+                                     arrays['delete_word_ids'], words)
+        self._max_length = header['max_length']
+        self._below_threshold_words = dict()
+        self._index_file = index_file
+        self._lookup_cache.clear()
+
+    def _align(self, offset):
+        return (offset + self.INDEX_ALIGNMENT - 1) // self.INDEX_ALIGNMENT * self.INDEX_ALIGNMENT
+
     def purge_below_threshold_words(self):
         """Purges words below threshold.
         Consider using this method after creating a dictionary to reduce memory usage. These words are not
@@ -223,8 +348,9 @@ class SymSpell():
                 else:
                     break
 
-            if self._hash(candidate) in self._deletes.keys():
-                dictionary_suggestions = self._deletes[self._hash(candidate)]
+            hs = self._hash(candidate)
+            if hs in self._deletes:
+                dictionary_suggestions = self._deletes[hs]
                 for suggestion in dictionary_suggestions:
                     if suggestion == phrase:
                         continue
@@ -340,8 +466,8 @@ class SymSpell():
                     else:
                         best_2 = SuggestionItem(terms_list_1[i], max_edit_distance+1, 0)
 
-                    distance = EditDistance(terms_list_1[i-1] + ' ' + terms_list_1[i], 'damerau')
-                    if suggestions_combi[0].distance + 1 < distance.damerau_levenshtein_distance(best_1.term + ' ' + best_2.term, max_edit_distance):
+                    distance = EditDistance(terms_list_1[i-1] + ' ' + terms_list_1[i], self._distance_algorithm)
+                    if suggestions_combi[0].distance + 1 < distance.compare(best_1.term + ' ' + best_2.term, max_edit_distance):
                         suggestions_combi[0].distance += 1
                         suggestions_parts[-1] = suggestions_combi[0]
                         last_combi = True
@@ -373,9 +499,9 @@ class SymSpell():
                                     continue
 
                                 split = suggestions_1[0].term + ' ' + suggestions_2[0].term
-                                edit_distance = EditDistance(terms_list_1[i], 'damerau')
+                                edit_distance = EditDistance(terms_list_1[i], self._distance_algorithm)
                                 suggestion_split = SuggestionItem(split,
-                                    edit_distance.damerau_levenshtein_distance(split, max_edit_distance),
+                                    edit_distance.compare(split, max_edit_distance),
                                     min(len(suggestions_1), len(suggestions_2)))
                                 if suggestion_split.distance >= 0:
                                     suggestions_split.append(suggestion_split)
@@ -397,10 +523,88 @@ class SymSpell():
         s = ' '.join([x.term for x in suggestions_parts])
         suggestion.count = min([x.count for x in suggestions_parts])
         suggestion.term = s
-        edit_distance = EditDistance(suggestion.term, 'damerau')
-        suggestion.distance = edit_distance.damerau_levenshtein_distance(phrase, self._max_dictionary_edit_distance)
+        edit_distance = EditDistance(suggestion.term, self._distance_algorithm)
+        suggestion.distance = edit_distance.compare(phrase, self._max_dictionary_edit_distance)
         return [suggestion]
 
+    def lookup_batch(self, phrases, verbosity=0, max_edit_distance=2, compound=False, processes=1):
+        """Corrects the spelling of many phrases (e.g., values of a raw brand column) at once.
+        Each distinct phrase is looked up only once and the results are memoized (in a bounded LRU
+        cache) for the next calls. Statistics of the call are saved in :attr:`last_batch_stats`.
+        Note:
+            Values that are not strings (e.g., NaN in a pandas Series) get None as the result.
+            The suggestions returned are shared with the cache, so please don't modify them.
+        Args:
+            phrases (iterable of str or pandas.Series): Phrases to correct.
+            verbosity (int, 0, 1 or 2): Same as in :meth:`lookup`. Ignored if :param:`compound` is True.
+            max_edit_distance (int): Maximum edit distance to consider.
+            compound (bool, optional): Use :meth:`lookup_compound` instead of :meth:`lookup`.
+                Defaults to False.
+            processes (int, optional): Number of processes to split the phrases not in the cache across.
+                If the index was loaded with :meth:`load_index`, each process memory-maps the same
+                index file; otherwise the dictionary is copied to each of them. Defaults to 1.
+        Returns:
+            list of (list of :obj:`SuggestionItem`): Suggested corrections for each phrase in the same
+                order as the input, or pandas.Series with the same index if the input is a Series.
+        Raises:
+            AssertionError: If :param:`max_edit_distance` is larger than maximum edit distance specified
+                at initialization.
+        """
+        assert max_edit_distance <= self._max_dictionary_edit_distance, 'Distance too big'
+        start_time = time.time()
+        is_series = hasattr(phrases, 'map') and hasattr(phrases, 'index')
+        if not is_series:
+            phrases = list(phrases)
+
+        lookup_params = (verbosity, max_edit_distance, compound)
+        results = dict()
+        phrases_to_look_up = list()
+        cache_hits = 0
+        for phrase in dict.fromkeys(phrases):
+            if not isinstance(phrase, str):
+                results[phrase] = None
+                continue
+            suggestions = self._lookup_cache.get((phrase,) + lookup_params)
+            if suggestions is None:
+                phrases_to_look_up.append(phrase)
+            else:
+                results[phrase] = suggestions
+                cache_hits += 1
+
+        if processes > 1 and len(phrases_to_look_up) > 1:
+            chunk_size = -(-len(phrases_to_look_up) // (processes * 4))
+            chunks = [phrases_to_look_up[i:i + chunk_size]
+                      for i in range(0, len(phrases_to_look_up), chunk_size)]
+            initargs = (self._index_file, self._max_dictionary_edit_distance, self._prefix_length) \
+                if self._index_file else (self,)
+            with multiprocessing.Pool(processes, initializer=_init_lookup_worker, initargs=initargs) as pool:
+                looked_up = [s for chunk_suggestions in
+                             pool.map(_lookup_in_worker, [(chunk,) + lookup_params for chunk in chunks])
+                             for s in chunk_suggestions]
+        else:
+            looked_up = self._lookup_phrases(phrases_to_look_up, *lookup_params)
+
+        for phrase, suggestions in zip(phrases_to_look_up, looked_up):
+            self._lookup_cache.put((phrase,) + lookup_params, suggestions)
+            results[phrase] = suggestions
+
+        if is_series:
+            aligned_results = phrases.map(results)
+        else:
+            aligned_results = [results[phrase] for phrase in phrases]
+
+        seconds = time.time() - start_time
+        self.last_batch_stats = BatchLookupStats(
+            phrases=len(phrases), unique_phrases=len(results), cache_hits=cache_hits,
+            looked_up=len(phrases_to_look_up), processes=processes, seconds=seconds,
+            phrases_per_second=len(phrases) / seconds if seconds > 0 else float('inf'))
+        return aligned_results
+
+    def _lookup_phrases(self, phrases, verbosity, max_edit_distance, compound):
+        if compound:
+            return [self.lookup_compound(phrase, max_edit_distance) for phrase in phrases]
+        return [self.lookup(phrase, verbosity, max_edit_distance) for phrase in phrases]
+
     def _delete_in_suggestion_prefix(self, delete, delete_len, suggestion, suggestion_len):
         """Helper method to check if :param:`delete` is prefix of :param:`suggestion`.
         Args:
@@ -479,21 +683,209 @@ class SymSpell():
         seq = text.split(split)
         return [i for i in seq if i]
 
+BatchLookupStats = collections.namedtuple(
+    'BatchLookupStats',
+    ['phrases', 'unique_phrases', 'cache_hits', 'looked_up', 'processes', 'seconds', 'phrases_per_second'])
+
+# SymSpell used by each worker process of SymSpell.lookup_batch()
+_worker_symspell = None
+
+def _init_lookup_worker(symspell_or_index_file, max_dictionary_edit_distance=None, prefix_length=None):
+    global _worker_symspell
+    if isinstance(symspell_or_index_file, SymSpell):
+        _worker_symspell = symspell_or_index_file
+    else:
+        _worker_symspell = SymSpell(max_dictionary_edit_distance, prefix_length)
+        _worker_symspell.load_index(symspell_or_index_file)
+
+def _lookup_in_worker(args):
+    return _worker_symspell._lookup_phrases(*args)
+
+class LRUCache():
+    """Dictionary that forgets its least recently used items beyond :param:`max_size` items.
+    Args:
+        max_size (int): Maximum number of items to keep.
+    """
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __getstate__(self):
+        # Cached results are not sent along when SymSpell is copied to worker processes
+        return {'_max_size': self._max_size, '_items': collections.OrderedDict()}
+
+class DeletesIndex():
+    """Read-only replacement of the `_deletes` dictionary (delete hash -> list of suggestions)
+    backed by the (memory-mapped) arrays of an index file saved by :meth:`SymSpell.save_index`.
+    Args:
+        hashes (numpy.ndarray): Sorted delete hashes.
+        offsets (numpy.ndarray): Suggestions of hashes[i] are word_ids[offsets[i]:offsets[i+1]].
+        word_ids (numpy.ndarray): Indexes of the suggestions in :param:`words`.
+        words (list of str): Words in the dictionary.
+    """
+    def __init__(self, hashes, offsets, word_ids, words):
+        self._hashes = hashes
+        self._offsets = offsets
+        self._word_ids = word_ids
+        self._words = words
+
+    def _find(self, hs):
+        i = int(np.searchsorted(self._hashes, hs))
+        if i < self._hashes.shape[0] and self._hashes[i] == hs:
+            return i
+        return -1
+
+    def __contains__(self, hs):
+        return self._find(hs) >= 0
+
+    def __getitem__(self, hs):
+        i = self._find(hs)
+        if i < 0:
+            raise KeyError(hs)
+        return [self._words[w] for w in self._word_ids[self._offsets[i]:self._offsets[i+1]].tolist()]
+
+    def __len__(self):
+        return self._hashes.shape[0]
+
+    def get(self, hs, default=None):
+        return self[hs] if hs in self else default
+
+    def keys(self):
+        return self._hashes.tolist()
+
+    def to_dict(self):
+        return {hs: self[hs] for hs in self._hashes.tolist()}
+
 class EditDistance():
+    """Damerau-Levenshtein (optimal string alignment) distance between a base string and other strings.
+    Args:
+        base_string (str): String to compare other strings against.
+        distance_algorithm (str): 'damerau' for the bit-parallel implementation, or
+            'damerau_reference' for the original (much slower) dynamic programming one.
+    """
     def __init__(self, base_string, distance_algorithm):
         self._base_string = base_string
         self._distance_algorithm = distance_algorithm
         if self._base_string == '':
             self._base_string = None
             return
-        if self._distance_algorithm == 'damerau':
-            self._v0 = np.zeros(len(self._base_string), dtype=np.int32)
-            self._v2 = np.zeros(len(self._base_string), dtype=np.int32)
+        self._v0 = np.zeros(len(self._base_string), dtype=np.int32)
+        self._v2 = np.zeros(len(self._base_string), dtype=np.int32)
+
+        # Bit masks of the positions of each character in the base string
+        self._peq = dict()
+        for i, ch in enumerate(self._base_string):
+            self._peq[ch] = self._peq.get(ch, 0) | (1 << i)
 
     def compare(self, string_2, max_distance):
+        """Returns the distance between the base string and :param:`string_2`, or -1 if it is
+        larger than :param:`max_distance`."""
         if self._distance_algorithm == 'damerau':
+            return self.damerau_levenshtein_distance_bit_parallel(string_2, max_distance)
+        elif self._distance_algorithm == 'damerau_reference':
             return self.damerau_levenshtein_distance(string_2, max_distance)
 
+    def compare_batch(self, strings, max_distance):
+        """Same as :meth:`compare` for each string in :param:`strings`. The bit masks of the base
+        string are computed only once (in the constructor) for all of them."""
+        return [self.compare(string_2, max_distance) for string_2 in strings]
+
+    def damerau_levenshtein_distance_bit_parallel(self, string_2, max_distance):
+        """Bit-parallel version of :meth:`damerau_levenshtein_distance` that returns the same values
+        (including the cases in which the distance is returned even if it is larger than
+        :param:`max_distance`). Each bit of Python's arbitrary-length ints represents a character
+        of the base string, so each character of :param:`string_2` is processed in a few int operations.
+        REF: Hyyro, H. (2003). A bit-vector algorithm for computing Levenshtein and Damerau edit distances.
+        """
+        if self._base_string is None:
+            if string_2 is None:
+                return 0
+            else:
+                return len(string_2)
+
+        if string_2 is None or string_2 == '':
+            return len(self._base_string)
+
+        string_1 = self._base_string
+        len_1 = len(string_1)
+        len_2 = len(string_2)
+
+        # Ignore common suffix and prefix like damerau_levenshtein_distance()
+        suffix = 0
+        while suffix < len_1 and suffix < len_2 and string_1[len_1 - suffix - 1] == string_2[len_2 - suffix - 1]:
+            suffix += 1
+        prefix = 0
+        while prefix < len_1 - suffix and prefix < len_2 - suffix and string_1[prefix] == string_2[prefix]:
+            prefix += 1
+        slen = min(len_1, len_2) - suffix - prefix
+        tlen = max(len_1, len_2) - suffix - prefix
+        if slen == 0:
+            return tlen
+
+        if max_distance < 0 or max_distance > tlen:
+            max_distance = tlen
+        elif tlen - slen > max_distance:
+            return -1
+
+        peq = self._peq
+        if prefix or suffix:
+            # Shift out the bits of the common prefix and suffix of the base string
+            m = len_1 - prefix - suffix
+            full = (1 << m) - 1
+            peq = {ch: (bits >> prefix) & full for ch, bits in peq.items()}
+        else:
+            m = len_1
+            full = (1 << m) - 1
+
+        last = 1 << (m - 1)
+        vp = full
+        vn = 0
+        d0 = 0
+        pm_prev = 0
+        distance = m
+        n = len_2 - suffix
+        for j in range(prefix, n):
+            pm = peq.get(string_2[j], 0)
+            tr = (((~d0 & pm) << 1) & pm_prev)
+            d0 = ((((pm & vp) + vp) ^ vp) | pm | vn | tr) & full
+            hp = vn | (~(d0 | vp) & full)
+            hn = d0 & vp
+            if hp & last:
+                distance += 1
+            elif hn & last:
+                distance -= 1
+            # The distance can go down by at most one for each remaining character
+            if distance - (n - j - 1) > max_distance:
+                return -1
+            hp = ((hp << 1) | 1) & full
+            hn = (hn << 1) & full
+            vp = hn | (~(d0 | hp) & full)
+            vn = hp & d0
+            pm_prev = pm
+
+        if distance <= max_distance:
+            return distance
+        else:
+            return -1
+
     def damerau_levenshtein_distance(self, string_2, max_distance):
         if self._base_string is None:
             if string_2 is None:
@@ -639,10 +1031,6 @@ class SuggestionItem():
         self._term = term
 
 
-import time
-import json
-import pdb
-
 if __name__ == "__main__":
     cur_dir = os.path.dirname(os.path.abspath(__file__))
     dict_dir = 'dictionaries'
@@ -650,6 +1038,7 @@ if __name__ == "__main__":
     combined_dict = 'combined.txt'
     mappings = 'datamart_mappings_utf16.txt'
     map_dict = 'mapdict.txt'
+    map_index = 'mapdict.idx'
     encoding = 'utf-16'
 
     symspell = SymSpell()
@@ -681,21 +1070,37 @@ if __name__ == "__main__":
     # print('-----\n')
 
 
-    # Note: Only load our mappings and create dictionary file out of them
-    start_time = time.time()
-    print("Creating dictionary from:", os.path.join(cur_dir, dict_dir, mappings))
-    symspell.create_dictionary(os.path.join(cur_dir, dict_dir, mappings), encoding)
-    run_time = time.time() - start_time
-    print('%.2f seconds to create the dictionary' % run_time)
-    # 78530 words in datamart_mappings_utf16.txt
-    k = list(symspell._words.keys())
-    print(len(k))
-
-    start_time = time.time()
-    print("Writing merged mapping file as:", os.path.join(cur_dir, dict_dir, map_dict))
-    symspell.write_dictionary(os.path.join(cur_dir, dict_dir, map_dict))
-    run_time = time.time() - start_time
-    print('%.2f seconds to load the dictionary' % run_time)
+    # Note: Only load our mappings and create dictionary file out of them.
+    # The index built from them is saved so that next time we can just load it
+    # (delete the index file to rebuild it after the mappings are updated).
+    index_file = os.path.join(cur_dir, dict_dir, map_index)
+    if os.path.exists(index_file):
+        start_time = time.time()
+        print("Loading index from:", index_file)
+        symspell.load_index(index_file)
+        run_time = time.time() - start_time
+        print('%.2f seconds to load the index' % run_time)
+    else:
+        start_time = time.time()
+        print("Creating dictionary from:", os.path.join(cur_dir, dict_dir, mappings))
+        symspell.create_dictionary(os.path.join(cur_dir, dict_dir, mappings), encoding)
+        run_time = time.time() - start_time
+        print('%.2f seconds to create the dictionary' % run_time)
+        # 78530 words in datamart_mappings_utf16.txt
+        k = list(symspell._words.keys())
+        print(len(k))
+
+        start_time = time.time()
+        print("Writing merged mapping file as:", os.path.join(cur_dir, dict_dir, map_dict))
+        symspell.write_dictionary(os.path.join(cur_dir, dict_dir, map_dict))
+        run_time = time.time() - start_time
+        print('%.2f seconds to load the dictionary' % run_time)
+
+        start_time = time.time()
+        print("Saving index as:", index_file)
+        symspell.save_index(index_file)
+        run_time = time.time() - start_time
+        print('%.2f seconds to save the index' % run_time)
     print('-----\n')
 
 